@@ -0,0 +1,100 @@
+"""머슴포커 — 알림 디스패처 (웹훅 비동기 전송: 유한 큐 + 같은 틱 배치 + 백오프 재시도)"""
+import asyncio, json, threading, time
+from collections import deque
+from urllib.request import Request, urlopen
+
+WEBHOOK_MAX_CHARS = 1900  # Discord content 2000자 제한 여유
+
+class AlertDispatcher:
+    """submit()은 즉시 반환 (어느 스레드에서든 호출 가능). 전송은 run() 태스크가 executor에서 수행"""
+    def __init__(self, url_fn, maxsize=200, batch_window=0.5, max_batch=20, retries=3, backoff=1.0, timeout=3):
+        self.url_fn = url_fn              # 호출 시점 웹훅 URL (환경변수 변경 반영)
+        self.queue = deque(maxlen=maxsize)  # 가득 차면 가장 오래된 알림부터 버림
+        self.batch_window = batch_window; self.max_batch = max_batch
+        self.retries = retries; self.backoff = backoff; self.timeout = timeout
+        self.stats = {'queued': 0, 'sent': 0, 'batches': 0, 'retries': 0, 'failed': 0, 'dropped': 0}
+        self._lock = threading.Lock()
+        self._loop = None; self._wake = None
+
+    def submit(self, text):
+        with self._lock:
+            if len(self.queue) == self.queue.maxlen: self.stats['dropped'] += 1
+            self.queue.append(text); self.stats['queued'] += 1
+        loop, wake = self._loop, self._wake
+        if loop and wake and not loop.is_closed():
+            try: loop.call_soon_threadsafe(wake.set)
+            except RuntimeError: pass  # 루프 종료 중
+
+    def _take(self):
+        with self._lock:
+            n = min(self.max_batch, len(self.queue))
+            return [self.queue.popleft() for _ in range(n)]
+
+    @staticmethod
+    def _chunks(items):
+        """알림 묶음 → 글자수 제한 내 (메시지, 포함 건수)"""
+        buf = ''; n = 0
+        for it in items:
+            it = it[:WEBHOOK_MAX_CHARS]
+            if buf and len(buf) + 1 + len(it) > WEBHOOK_MAX_CHARS: yield buf, n; buf = ''; n = 0
+            buf = f'{buf}\n{it}' if buf else it; n += 1
+        if buf: yield buf, n
+
+    def _post(self, url, content):
+        body = json.dumps({'content': content}).encode('utf-8')
+        req = Request(url, data=body, headers={'Content-Type': 'application/json'})
+        with urlopen(req, timeout=self.timeout) as r: r.read()
+
+    async def _deliver(self, url, content):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                await loop.run_in_executor(None, self._post, url, content); return True
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"⚠️ ALERT_WEBHOOK_FAIL {e}", flush=True); return False
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def run(self):
+        """전송 루프 — create_task로 기동"""
+        self._loop = asyncio.get_running_loop(); self._wake = asyncio.Event()
+        while True:
+            if not self.queue:
+                self._wake.clear()
+                await self._wake.wait()
+            await asyncio.sleep(self.batch_window)  # 같은 틱에 터진 알림을 한 번에
+            items = self._take()
+            url = self.url_fn()
+            if not items: continue
+            if not url: self.stats['dropped'] += len(items); continue
+            for content, n in self._chunks(items):
+                self.stats['batches'] += 1
+                if await self._deliver(url, content): self.stats['sent'] += n
+                else: self.stats['failed'] += n
+
+# ══ 로컬 웹훅 수신기 (개발/점검용) ══
+def serve_stub(port=9099, fail_first=0, delay=0.0):
+    """TELE_ALERT_WEBHOOK=http://127.0.0.1:9099/ 로 지정해 전송 확인. fail_first건은 500, delay초 지연 응답"""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    state = {'n': 0}
+    class H(BaseHTTPRequestHandler):
+        def do_POST(self):
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+            state['n'] += 1
+            if delay: time.sleep(delay)
+            code = 500 if state['n'] <= fail_first else 204
+            print(f"[{time.strftime('%H:%M:%S')}] #{state['n']} → {code}\n{json.loads(data or b'{}').get('content', '')}\n", flush=True)
+            self.send_response(code); self.end_headers()
+        def log_message(self, *a): pass
+    print(f"🪝 alert webhook stub on http://127.0.0.1:{port}/", flush=True)
+    HTTPServer(('127.0.0.1', port), H).serve_forever()
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='로컬 알림 웹훅 수신기')
+    ap.add_argument('--port', type=int, default=9099)
+    ap.add_argument('--fail-first', type=int, default=0, help='처음 N건은 500 응답 (재시도 확인)')
+    ap.add_argument('--delay', type=float, default=0.0, help='응답 지연 초 (느린 웹훅 흉내)')
+    a = ap.parse_args()
+    serve_stub(a.port, a.fail_first, a.delay)
@@ -0,0 +1,71 @@
+"""머슴포커 — 추가 전용 감사 로그 (버퍼 일괄 INSERT + id 구간 트림 + 트림 구간 gzip 보관)"""
+import gzip, json, os, threading
+
+class AuditLog:
+    """append()는 메모리 버퍼에 넣기만 함 (O(1)). flush()가 executemany + commit 1회,
+    trim()은 스케줄로 id 범위 삭제 — INSERT마다 COUNT(*) 하지 않음"""
+    COLS = ('ts', 'event', 'auth_id', 'amount', 'balance_before', 'balance_after', 'details', 'ip')
+
+    def __init__(self, db_fn, table, lock, max_rows, keep_rows, archive_dir=None, batch=100):
+        self.db_fn = db_fn; self.table = table; self.lock = lock
+        self.max_rows = max_rows; self.keep_rows = keep_rows; self.archive_dir = archive_dir; self.batch = batch
+        self._buf = []; self._mu = threading.Lock()
+        self._sql = f"INSERT INTO {table}({','.join(self.COLS)}) VALUES({','.join('?' * len(self.COLS))})"
+        self.stats = {'appended': 0, 'flushes': 0, 'trimmed': 0, 'archived_files': 0}
+
+    def append(self, row):
+        """row: COLS 순서 튜플. 버퍼가 batch 이상이면 True (호출측이 flush 예약 — 이벤트 루프에서 직접 flush 금지)"""
+        with self._mu:
+            self._buf.append(row); self.stats['appended'] += 1
+            return len(self._buf) >= self.batch
+
+    def pending(self):
+        return len(self._buf)
+
+    def flush(self, locked=False):
+        """버퍼 → DB 일괄 기록. locked=True면 호출측이 이미 lock 보유"""
+        with self._mu:
+            rows, self._buf = self._buf, []
+        if not rows: return 0
+        try:
+            if locked: self._write(rows)
+            else:
+                with self.lock: self._write(rows)
+        except Exception as e:
+            with self._mu: self._buf[:0] = rows  # 다음 flush에서 재시도
+            print(f"[AUDIT] flush error: {e}", flush=True); return 0
+        self.stats['flushes'] += 1
+        return len(rows)
+
+    def _write(self, rows):
+        db = self.db_fn(); db.executemany(self._sql, rows); db.commit()
+
+    def trim(self):
+        """id 구간 트림: max_rows 초과 시 최신 keep_rows만 남기고 삭제 (삭제 구간은 먼저 보관)"""
+        with self.lock:
+            db = self.db_fn()
+            lo, hi = db.execute(f"SELECT MIN(id), MAX(id) FROM {self.table}").fetchone()
+            if lo is None or hi - lo + 1 <= self.max_rows: return 0
+            cut = hi - self.keep_rows  # id <= cut 삭제
+            if self.archive_dir:
+                rows = db.execute(f"SELECT id, {','.join(self.COLS)} FROM {self.table} WHERE id <= ? ORDER BY id", (cut,)).fetchall()
+                if rows: self._archive(rows)
+            n = db.execute(f"DELETE FROM {self.table} WHERE id <= ?", (cut,)).rowcount
+            db.commit()
+        self.stats['trimmed'] += n
+        return n
+
+    def _archive(self, rows):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f'{self.table}_{rows[0][0]:010d}-{rows[-1][0]:010d}.jsonl.gz')
+        tmp = path + '.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            for r in rows: f.write(json.dumps(dict(zip(('id',) + self.COLS, r)), ensure_ascii=False) + '\n')
+        os.replace(tmp, path)
+        self.stats['archived_files'] += 1
+        print(f"[AUDIT] 보관: {path} ({len(rows)}건)", flush=True)
+
+    def archives(self):
+        """보관 파일 목록 (최신순)"""
+        if not self.archive_dir or not os.path.isdir(self.archive_dir): return []
+        return sorted((f for f in os.listdir(self.archive_dir) if f.endswith('.jsonl.gz')), reverse=True)
@@ -1,10 +1,11 @@
 """머슴포커 — 인증 토큰 + 입력 정제 시스템"""
 import hmac, os, re, secrets, time
+from ttlcache import TTLCache
 
 TOKEN_MAX_AGE = 86400  # 토큰 만료 (24시간)
 CHAT_COOLDOWN = 5  # 5초
 
-player_tokens = {}  # name -> (token, timestamp)
+player_tokens = TTLCache('tokens', ttl=TOKEN_MAX_AGE)  # name -> (token, timestamp) — 발급 순, 만료분은 앞에서 제거
 chat_cooldowns = {}  # name -> last_chat_timestamp
 
 ADMIN_KEY = os.environ.get('POKER_ADMIN_KEY', '') or None
@@ -18,10 +19,7 @@ def _check_admin(key):
 def issue_token(name):
     token = secrets.token_hex(16)
     player_tokens[name] = (token, time.time())
-    if len(player_tokens) > 1000:
-        now = time.time()
-        expired = [k for k, (_, ts) in player_tokens.items() if now - ts > TOKEN_MAX_AGE]
-        for k in expired: del player_tokens[k]
+    player_tokens.expire()
     return token
 
 def verify_token(name, token):
@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+"""머슴포커 — 성능 벤치마크 (로컬 대역 서버 기반, 외부 API 호출 없음)
+
+사용법:
+  python3 benchmark.py pow [--difficulty 5] [--rounds 3] [--workers 4]
+  python3 benchmark.py mersoom [--requests 200] [--concurrency 50] [--rtt 20]
+  python3 benchmark.py watchdog [--accounts 100000] [--ticks 5] [--changes 50]
+  python3 benchmark.py audit [--events 20000]
+  python3 benchmark.py leaderboard [--players 20000] [--reads 200]
+  python3 benchmark.py ratelimit [--clients 100000]
+  python3 benchmark.py registry [--visitors 100000] [--cap 5000]
+  python3 benchmark.py holdem [--hands 5000] [--players 6]
+  python3 benchmark.py shard [--tables 24] [--workers 4] [--seconds 20]
+  python3 benchmark.py relay [--viewers 5000] [--relays 1] [--seconds 20]
+  python3 benchmark.py hibernate [--tables 60] [--seconds 90]
+  python3 benchmark.py journal [--tables 50] [--hands 200]
+  python3 benchmark.py handoff [--viewers 50] [--drain 30]
+  python3 benchmark.py seat [--seats 20000] [--hands 20000] [--players 6] [--repeat 5]
+"""
+import argparse, asyncio, hashlib, json, os, secrets, statistics, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# ══ 머슴닷컴 대역 서버 (challenge / points) ══
+class MersoomStub:
+    """/api/challenge → {challenge:{seed,target_prefix}, token}, /api/points/transfer는 proof 검증,
+    GET /api/points/me → 고정 잔고. rtt초만큼 응답 지연, 새 TCP 연결 수는 conns에 집계"""
+    def __init__(self, difficulty=5, rtt=0.0, points=100000):
+        self.difficulty = difficulty; self.rtt = rtt; self.points = points
+        self.challenges = {}; self.hits = {}; self.conns = 0
+        stub = self
+        class H(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = -1  # 헤더+본문 한 번에 전송 (Nagle/지연 ACK로 keep-alive 응답이 40ms 밀리는 것 방지)
+            def _send(self, code, obj):
+                body = json.dumps(obj).encode()
+                self.send_response(code); self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body))); self.end_headers(); self.wfile.write(body)
+            def setup(self):
+                stub.conns += 1; super().setup()
+            def do_GET(self):
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                if stub.rtt: time.sleep(stub.rtt)
+                if self.path == '/api/points/me':
+                    return self._send(200, {'auth_id': self.headers.get('X-Mersoom-Auth-Id', ''), 'points': stub.points})
+                self._send(404, {})
+            def do_POST(self):
+                n = int(self.headers.get('Content-Length', 0) or 0)
+                if n: self.rfile.read(n)
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                if self.path == '/api/challenge':
+                    seed = secrets.token_hex(8); token = secrets.token_hex(16)
+                    prefix = '0' * stub.difficulty; stub.challenges[token] = (seed, prefix)
+                    return self._send(200, {'challenge': {'seed': seed, 'target_prefix': prefix}, 'token': token})
+                if self.path == '/api/points/transfer':
+                    seed, prefix = stub.challenges.pop(self.headers.get('X-Mersoom-Token', ''), (None, None))
+                    ok = seed is not None and hashlib.sha256(f"{seed}{self.headers.get('X-Mersoom-Proof','')}".encode()).hexdigest().startswith(prefix)
+                    return self._send(200 if ok else 400, {'ok': ok})
+                self._send(404, {})
+            def log_message(self, *a): pass
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), H)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/api'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    def close(self): self.httpd.shutdown()
+
+async def _with_lag(fn):
+    """fn을 executor에서 실행하는 동안 이벤트 루프 최대 지연(ms) 측정"""
+    loop = asyncio.get_running_loop(); lags = []; stop = False
+    async def beat():
+        while not stop:
+            t0 = time.perf_counter(); await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - t0 - 0.01)
+    b = asyncio.create_task(beat())
+    t0 = time.perf_counter(); r = await loop.run_in_executor(None, fn); dt = time.perf_counter() - t0
+    stop = True; await b
+    return r, dt, max(lags, default=0) * 1000, statistics.median(lags) * 1000 if lags else 0
+
+def _legacy_pow(url):
+    """기존 구현: 스레드에서 순수 파이썬 순차 탐색 (GIL 점유)"""
+    import ranked
+    status, data = ranked._http_request(f'{url}/challenge', method='POST')
+    seed = data['challenge']['seed']; prefix = data['challenge']['target_prefix']
+    for nonce in range(ranked.POW_MAX_NONCE):
+        if hashlib.sha256(f'{seed}{nonce}'.encode()).hexdigest().startswith(prefix): return data['token'], str(nonce)
+    return None, None
+
+def bench_pow(a):
+    import ranked, pow_solver
+    if a.workers: pow_solver.POW_WORKERS = a.workers
+    pow_solver.start()  # 스텁 서버 스레드보다 먼저 fork
+    stub = MersoomStub(a.difficulty); ranked.MERSOOM_API = stub.url
+    print(f"PoW difficulty={a.difficulty} (prefix {'0'*a.difficulty}), workers={pow_solver.POW_WORKERS}, rounds={a.rounds}")
+    async def run():
+        for label, fn in (('legacy (thread, sequential)', lambda: _legacy_pow(stub.url)),
+                          ('pool (processes, partitioned)', ranked._mersoom_pow_fresh)):
+            ts, lag_max, lag_med = [], [], []
+            for _ in range(a.rounds):
+                (token, nonce), dt, lmax, lmed = await _with_lag(fn)
+                assert token and nonce is not None, 'PoW 실패'
+                st, _ = ranked._http_request(f'{stub.url}/points/transfer', method='POST',
+                                             headers={'X-Mersoom-Token': token, 'X-Mersoom-Proof': nonce}, body={})
+                assert st == 200, f'proof 거부: {st}'
+                ts.append(dt); lag_max.append(lmax); lag_med.append(lmed)
+            print(f"  {label:32s} solve avg {statistics.mean(ts)*1000:8.1f}ms  max {max(ts)*1000:8.1f}ms | "
+                  f"loop lag median {statistics.mean(lag_med):6.1f}ms  max {max(lag_max):7.1f}ms")
+    asyncio.run(run())
+    pow_solver.shutdown(); stub.close()
+
+def _legacy_http(url, headers):
+    """기존 구현: 요청마다 urllib 새 연결"""
+    import urllib.request
+    req = urllib.request.Request(url, headers=headers)
+    with urllib.request.urlopen(req, timeout=10) as r: return r.status, json.loads(r.read())
+
+def bench_mersoom(a):
+    import db, tempfile
+    db.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import ranked
+    stub = MersoomStub(rtt=a.rtt / 1000); ranked.MERSOOM_API = stub.url
+    ranked.MERSOOM_AUTH_ID = 'dolsoe'; ranked.MERSOOM_PASSWORD = 'x'
+    url = f'{stub.url}/points/me'; h = {'X-Mersoom-Auth-Id': 'dolsoe'}
+    print(f"mersoom client: {a.requests} sequential GETs, {a.concurrency} concurrent deposit checks, stub rtt {a.rtt}ms")
+    for label, fn in (('legacy urllib (new conn/req)', lambda: _legacy_http(url, h)),
+                      ('keep-alive pool', lambda: ranked._http_request(url, headers=h))):
+        c0 = stub.conns; t0 = time.perf_counter()
+        for _ in range(a.requests): assert fn()[0] == 200
+        dt = time.perf_counter() - t0
+        print(f"  {label:32s} {dt/a.requests*1000:7.2f}ms/req  new TCP conns {stub.conns - c0}")
+    async def concurrent(label, call):
+        ranked._house_balance_invalidate(); n0 = stub.hits.get('/api/points/me', 0); t0 = time.perf_counter()
+        await asyncio.gather(*[call() for _ in range(a.concurrency)])
+        dt = time.perf_counter() - t0
+        print(f"  {label:32s} {dt*1000:7.1f}ms total  /points/me calls {stub.hits.get('/api/points/me', 0) - n0}")
+    async def run():
+        loop = asyncio.get_running_loop()
+        ranked._house_bal['ts'] = 0; ranked.DEPOSIT_BALANCE_TTL, ttl = 0, ranked.DEPOSIT_BALANCE_TTL
+        await concurrent('per-call executor (no cache)', lambda: loop.run_in_executor(None, ranked.mersoom_check_deposits))
+        ranked.DEPOSIT_BALANCE_TTL = ttl
+        await concurrent('single-flight + balance TTL', ranked.mersoom_check_deposits_shared)
+    asyncio.run(run())
+    print(f"  pool stats {ranked._mersoom_pool.stats}")
+    stub.close()
+
+def _legacy_watchdog(db, last):
+    """기존 구현: 전체 로드 + 계정별 total_withdrawn 조회(N+1) + SUM 3회 + LIKE 조회"""
+    alerts = 0
+    rows = db.execute("SELECT auth_id, balance FROM ranked_balances").fetchall()
+    for auth_id, balance in rows:
+        if abs(balance - last.get(auth_id, balance)) >= 200: alerts += 1
+        last[auth_id] = balance
+    db.execute("SELECT auth_id, COUNT(*), SUM(amount) FROM ranked_transfers WHERE transfer_id LIKE 'balance_poll:%' AND created_at > ? GROUP BY auth_id",
+               (str(int(time.time() - 300)),)).fetchall()
+    for auth_id, balance in rows:
+        row = db.execute("SELECT total_withdrawn FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()
+        if row and row[0] > 500: alerts += 1
+    for col in ('balance', 'total_deposited', 'total_withdrawn'):
+        db.execute(f"SELECT COALESCE(SUM({col}),0) FROM ranked_balances").fetchone()
+    return alerts
+
+def bench_watchdog(a):
+    import db, tempfile, random
+    db.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import ranked
+    conn = db._db(); now = int(time.time()) - 3600
+    conn.executemany("INSERT INTO ranked_balances(auth_id, balance, total_deposited, total_withdrawn, updated_at) VALUES(?,?,?,?,?)",
+        ((f'acct{i}', random.randint(0, 5000), random.randint(0, 8000), random.randint(0, 1000), now) for i in range(a.accounts)))
+    conn.commit()
+    ranked.set_tables_ref({})
+    print(f"watchdog: {a.accounts} accounts, {a.changes} changed accounts per tick, {a.ticks} ticks")
+    def mutate():
+        ids = random.sample(range(a.accounts), a.changes)
+        conn.executemany("UPDATE ranked_balances SET balance=balance+?, updated_at=strftime('%s','now') WHERE auth_id=?",
+                         ((random.randint(-50, 50), f'acct{i}') for i in ids)); conn.commit()
+    def timed(fn):
+        t0 = time.perf_counter(); fn(); return (time.perf_counter() - t0) * 1000
+    last = {}
+    legacy = [timed(lambda: _legacy_watchdog(conn, last))]
+    for _ in range(a.ticks): mutate(); legacy.append(timed(lambda: _legacy_watchdog(conn, last)))
+    ranked._ranked_watchdog.update(last_balances={}, hwm=0.0, totals=None, checks=0)
+    new = [timed(ranked._ranked_watchdog_check)]
+    for _ in range(a.ticks): mutate(); new.append(timed(ranked._ranked_watchdog_check))
+    print(f"  {'legacy (N+1)':24s} first {legacy[0]:8.1f}ms  steady avg {statistics.mean(legacy[1:]):8.1f}ms")
+    print(f"  {'change feed':24s} first {new[0]:8.1f}ms  steady avg {statistics.mean(new[1:]):8.1f}ms")
+    ok = list(ranked._ranked_totals(conn))[:4] == ranked._ranked_watchdog['totals']
+    print(f"  incremental totals match full aggregate: {ok}")
+
+def _legacy_audit(db, row):
+    """기존 구현: INSERT + commit + COUNT(*) + ts 정렬 삭제"""
+    db.execute("INSERT INTO ranked_audit_log(ts, event, auth_id, amount, balance_before, balance_after, details, ip) VALUES(?,?,?,?,?,?,?,?)", row)
+    db.commit()
+    count = db.execute("SELECT COUNT(*) FROM ranked_audit_log").fetchone()[0]
+    if count > 10000:
+        db.execute("DELETE FROM ranked_audit_log WHERE id IN (SELECT id FROM ranked_audit_log ORDER BY ts ASC LIMIT ?)", (count - 5000,))
+        db.commit()
+
+def bench_audit(a):
+    import db, tempfile
+    db.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import ranked
+    conn = db._db()
+    print(f"audit: {a.events} money events (max {ranked.AUDIT_LOG_MAX}, keep {ranked.AUDIT_LOG_KEEP})")
+    row = lambda i: (time.time(), 'buy_in', f'acct{i % 500}', 10, 100, 90, f'table:ranked-micro name:p{i}', '')
+    t0 = time.perf_counter()
+    for i in range(a.events): _legacy_audit(conn, row(i))
+    legacy = (time.perf_counter() - t0) * 1e6 / a.events
+    conn.execute("DELETE FROM ranked_audit_log"); conn.commit()
+    t0 = time.perf_counter()
+    for i in range(a.events):
+        if ranked._audit.append(row(i)): ranked._audit.flush()
+    ranked._audit.flush(); t1 = time.perf_counter(); ranked._audit.trim()
+    new = (t1 - t0) * 1e6 / a.events; trim_ms = (time.perf_counter() - t1) * 1000
+    left = conn.execute("SELECT COUNT(*) FROM ranked_audit_log").fetchone()[0]
+    print(f"  {'legacy (COUNT per insert)':28s} {legacy:8.1f}us/event")
+    print(f"  {'batched append':28s} {new:8.1f}us/event  + trim {trim_ms:.1f}ms once → {left} rows, archives {ranked._audit.archives()}")
+
+def bench_leaderboard(a):
+    import random
+    from lbindex import LeaderboardIndex
+    lb = {f'p{i}': {'wins': random.randint(0, 50), 'losses': random.randint(0, 50), 'chips_won': 0, 'hands': random.randint(0, 100),
+                    'biggest_pot': random.randint(0, 900), 'streak': random.randint(-5, 8), 'elo': random.randint(500, 1500)} for i in range(a.players)}
+    idx = LeaderboardIndex(lb); idx.rebuild()
+    print(f"leaderboard: {a.players} players, {a.reads} reads (1 hand update between reads)")
+    def legacy():
+        top = sorted(lb.items(), key=lambda x: (x[1].get('elo', 1000), x[1]['wins']), reverse=True)[:20]
+        max(lb.items(), key=lambda x: x[1].get('streak', 0)); max(lb.items(), key=lambda x: x[1].get('biggest_pot', 0))
+        max(((n, d) for n, d in lb.items() if d['hands'] >= 10), key=lambda x: x[1]['wins'] / max(1, x[1]['wins'] + x[1]['losses']))
+        return top
+    def hand():
+        n = f'p{random.randrange(a.players)}'; lb[n]['elo'] += random.choice((-16, 16)); lb[n]['hands'] += 1; return n
+    for label, read, upd in (('legacy sort + 3x max', legacy, lambda n: None), ('bisect index', lambda: (idx.page(), idx.leaders()), idx.update)):
+        t0 = time.perf_counter()
+        for _ in range(a.reads): upd(hand()); read()
+        print(f"  {label:24s} {(time.perf_counter() - t0) * 1e6 / a.reads:10.1f}us/read")
+
+def _legacy_rate_ok(store, ip, endpoint, max_per_min=20):
+    """기존 _api_rate_ok: IP별 중첩 dict 고정 창, 500 IP 초과 시 전체 스캔 + 정렬로 절반 삭제"""
+    now = time.time()
+    rates = store.setdefault(ip, {})
+    cnt, first = rates.get(endpoint, (0, now))
+    if now - first >= 60: cnt, first = 0, now
+    if cnt >= max_per_min: return False
+    rates[endpoint] = (cnt + 1, first)
+    if len(store) > 500:
+        cutoff = now - 120
+        for k in [k for k, v in store.items() if all(ts < cutoff for _, ts in v.values())]: del store[k]
+        if len(store) > 500:
+            for k in sorted(store, key=lambda k: max((ts for _, ts in store[k].values()), default=0))[:len(store) // 2]: del store[k]
+    return True
+
+def bench_ratelimit(a):
+    from ratelimit import TokenBucketLimiter
+    ips = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(a.clients)]
+    print(f"ratelimit: {a.clients} distinct clients (1 request each), then 1 hot client x 1000")
+    store = {}; lim = TokenBucketLimiter()
+    for label, fn, size in (('legacy dict + sort', lambda ip: _legacy_rate_ok(store, ip, 'join', 10), lambda: len(store)),
+                            ('token bucket LRU', lambda ip: lim.allow('join', ip, 10), lambda: len(lim))):
+        lat = []; t0 = time.perf_counter()
+        for ip in ips:
+            t1 = time.perf_counter(); fn(ip); lat.append(time.perf_counter() - t1)
+        total = time.perf_counter() - t0; lat.sort()
+        tracked = size(); hot = sum(fn('1.2.3.4') for _ in range(1000))
+        print(f"  {label:20s} {total * 1e6 / len(ips):6.2f}us/req  p99.9 {lat[int(len(lat) * 0.999)] * 1e6:7.1f}us  "
+              f"clients still tracked {tracked:6d}  hot client allowed {hot}/1000")
+    print(f"  limiter stats {lim.stats}")
+
+def _legacy_track(store, key, now, cap):
+    """기존 _track_visitor/touch_agent: dict, cap 초과 시 last_seen 전체 정렬로 절반 삭제"""
+    v = store.get(key)
+    if v: v['last_seen'] = now; v['hits'] += 1
+    else: store[key] = {'last_seen': now, 'hits': 1}
+    if len(store) > cap:
+        for k in sorted(store, key=lambda k: store[k]['last_seen'])[:cap // 2]: del store[k]
+
+def bench_registry(a):
+    from ttlcache import TTLCache
+    print(f"registry: {a.visitors} visits (80% new keys, 20% repeat of 100 hot keys), cap {a.cap}, then 100 stats reads")
+    keys = [f'k{i}' if i % 5 else f'hot{i % 100}' for i in range(a.visitors)]
+    store = {}; cache = TTLCache('bench', maxlen=a.cap)
+    def ttl_track(k, now):
+        v = cache.get(k)
+        if v: v['last_seen'] = now; v['hits'] += 1; cache.touch(k)
+        else: cache[k] = {'last_seen': now, 'hits': 1}
+    for label, fn, src, ordered in (('legacy dict + sort', lambda k, now: _legacy_track(store, k, now, a.cap), store,
+                                     lambda: sorted(store.items(), key=lambda x: x[1]['last_seen'], reverse=True)),
+                                    ('TTL/LRU registry', ttl_track, cache, lambda: list(reversed(cache.items())))):
+        lat = []; t0 = time.perf_counter()
+        for i, k in enumerate(keys):
+            t1 = time.perf_counter(); fn(k, t0 + i * 1e-3); lat.append(time.perf_counter() - t1)
+        total = time.perf_counter() - t0; lat.sort()
+        t1 = time.perf_counter()
+        for _ in range(100): ordered()
+        print(f"  {label:20s} {total * 1e6 / len(keys):6.2f}us/visit  p99.9 {lat[int(len(lat) * 0.999)] * 1e6:8.1f}us  "
+              f"max {lat[-1] * 1e3:6.2f}ms  entries {len(src)}  stats read {(time.perf_counter() - t1) * 1e7 / len(src):5.2f}us/1k entries")
+    print(f"  registry bytes ~{cache.approx_bytes() // 1024}KiB  evicted {cache.evicted}")
+
+def _legacy_evaluate(seven):
+    """기존 evaluate_hand: 7장 중 5장 조합 21개를 모두 score_five"""
+    from itertools import combinations
+    from engine import score_five
+    return max((score_five(list(c)) for c in combinations(seven, 5)), default=None)
+
+def bench_holdem(a):
+    import engine, holdem
+    from bot_ai import BotAI
+    from seat import Seat
+    styles = list(BotAI.STYLES)
+    decide = lambda h, s, to_call: s.bot_ai.decide(s.hole, h.community, h.pot, to_call, s.chips)
+    print(f"holdem: {a.hands} headless hands, {a.players} BotAI players (no sleeps / broadcasts)")
+    fast = engine.evaluate_hand
+    for label, ev in (('legacy 21-combo eval', _legacy_evaluate), ('direct 7-card eval', fast)):
+        engine.evaluate_hand = holdem.evaluate_hand = ev
+        seats = [Seat(f'bot{i}', chips=500, is_bot=True, bot_ai=BotAI(styles[i % len(styles)])) for i in range(a.players)]
+        dealer = 0; showdowns = 0; t0 = time.perf_counter()
+        for _ in range(a.hands):
+            active = [s for s in seats if s.chips > 0]
+            if len(active) < 2:
+                for s in seats: s.chips = 500
+                active = seats
+            showdowns += holdem.play(holdem.Hand(active, dealer, 5, 10), decide)['showdown']; dealer += 1
+        el = time.perf_counter() - t0
+        print(f"  {label:22s} {a.hands / el:8.0f} hands/s  {el * 1e6 / a.hands:7.1f}us/hand  showdown {showdowns * 100 // a.hands}%")
+    engine.evaluate_hand = holdem.evaluate_hand = fast
+
+async def _shard_players(port, seats, seconds):
+    """WS play 모드로 seats [(table_id, name, token)] 전원이 check/call — 보낸 액션 수"""
+    import base64, struct
+    async def frame(rd):
+        h = await rd.readexactly(2); n = h[1] & 0x7f
+        if n == 126: n = struct.unpack('>H', await rd.readexactly(2))[0]
+        elif n == 127: n = struct.unpack('>Q', await rd.readexactly(8))[0]
+        return h[0] & 0xf, await rd.readexactly(n)
+    def text(obj):
+        p = json.dumps(obj).encode(); m = os.urandom(4); n = len(p)
+        h = bytes([0x81]) + (bytes([0x80 | n]) if n < 126 else bytes([0x80 | 126]) + struct.pack('>H', n))
+        return h + m + bytes(b ^ m[i % 4] for i, b in enumerate(p))
+    async def play(tid, name, token):
+        rd, wr = await asyncio.open_connection('127.0.0.1', port); acts = 0
+        key = base64.b64encode(os.urandom(16)).decode()
+        wr.write(f"GET /ws?table_id={tid}&mode=play&name={name}&token={token} HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n"
+                 f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+        while (await rd.readline()) not in (b'\r\n', b''): pass
+        end = time.time() + seconds
+        while time.time() < end:
+            try: op, p = await asyncio.wait_for(frame(rd), 1)
+            except asyncio.TimeoutError: continue
+            except (asyncio.IncompleteReadError, ConnectionError): break
+            if op != 1: continue
+            d = json.loads(p)
+            if d.get('type') == 'your_turn':
+                a = 'check' if any(x['action'] == 'check' for x in d['actions']) else 'call'
+                wr.write(text({'type': 'action', 'action': a, 'turn_seq': d['turn_seq']})); acts += 1
+        wr.close()
+        return acts
+    return sum(await asyncio.gather(*(play(*s) for s in seats)))
+
+def _shard_client(port, seats, seconds):
+    return asyncio.run(_shard_players(port, seats, seconds))
+
+def bench_shard(a):
+    import subprocess, tempfile, urllib.request
+    from concurrent.futures import ProcessPoolExecutor
+    here = os.path.dirname(os.path.abspath(__file__))
+    def call(port, path, body=None):
+        r = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode() if body is not None else None,
+                                   headers={'Content-Type': 'application/json'})
+        return json.loads(urllib.request.urlopen(r, timeout=10).read())
+    print(f"shard: {a.tables} turbo tables (NPC 3 + WS bot 1), {a.seconds}s play, nproc={os.cpu_count()}")
+    for workers in (0, a.workers):
+        port = 18500 + workers; cwd = tempfile.mkdtemp(prefix='poker-bench-')
+        env = {**os.environ, 'PORT': str(port), 'SHARD_WORKERS': str(workers), 'POKER_ADMIN_KEY': 'bench', 'RATE_LIMITS': 'join=100000'}
+        proc = subprocess.Popen([sys.executable, os.path.join(here, 'server.py')], cwd=cwd, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try: call(port, '/api/games'); break
+                except OSError: time.sleep(0.2)
+            time.sleep(1 + 2 * bool(workers))  # 워커 기동 + 첫 동기화
+            seats = []
+            for k in range(a.tables):
+                tid = f'turbo_b{k}'
+                try: j = call(port, '/api/join', {'name': f'bench{k}', 'table_id': tid})
+                except OSError: continue
+                if j.get('ok'): seats.append((tid, f'bench{k}', j['token']))
+            groups = [seats[i::a.clients] for i in range(a.clients) if seats[i::a.clients]]
+            with ProcessPoolExecutor(len(groups) or 1) as ex:
+                acts = sum(ex.map(_shard_client, [port] * len(groups), groups, [a.seconds] * len(groups)))
+            time.sleep(a.sync)
+            turbo = call(port, '/api/turbo')['tables']
+            hph = sum(t['hands_per_hour'] for t in turbo if t['table_id'].startswith('turbo_b'))
+            label = 'single process' if not workers else f'{workers} workers + front'
+            print(f"  {label:22s} tables {len(seats):3d}/{a.tables}  {hph:9.0f} hands/h total  "
+                  f"{hph / max(1, len(seats)):7.0f} hands/h/table  {acts / a.seconds:6.1f} bot actions/s")
+        finally:
+            proc.terminate(); proc.wait()
+
+async def _relay_viewers(ports, count, deadline, vote_every):
+    """관전 WS count개를 ports에 번갈아 연결 → deadline까지 유지 (수신 바이트만 셈) → (서빙된 소켓 수, 수신 바이트)"""
+    import base64, struct
+    gate = asyncio.Semaphore(200); got = [0] * count; alive = [False] * count
+    async def one(i):
+        try:
+            async with gate:
+                rd, wr = await asyncio.open_connection('127.0.0.1', ports[i % len(ports)])
+                wr.write(f"GET /ws?table_id=mersoom HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         f"Sec-WebSocket-Key: {base64.b64encode(os.urandom(16)).decode()}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+                while (await rd.readline()) not in (b'\r\n', b''): pass
+            h = await rd.readexactly(2); n = h[1] & 0x7f
+            if n == 126: n = struct.unpack('>H', await rd.readexactly(2))[0]
+            elif n == 127: n = struct.unpack('>Q', await rd.readexactly(8))[0]
+            first = json.loads(await rd.readexactly(n)); got[i] = n
+            if vote_every and i % vote_every == 0 and first.get('players'):
+                p = json.dumps({'type': 'vote', 'pick': first['players'][0]['name']}).encode(); m = os.urandom(4)
+                wr.write(bytes([0x81, 0x80 | len(p)]) + m + bytes(b ^ m[j % 4] for j, b in enumerate(p)))
+            alive[i] = True
+            ping = time.time()
+            while (left := deadline - time.time()) > 0:
+                if time.time() - ping > 15:  # 서버 WS 수신 타임아웃(30초) 전에 ping
+                    wr.write(bytes([0x89, 0x80]) + os.urandom(4)); ping = time.time()
+                try: buf = await asyncio.wait_for(rd.read(65536), min(left, 15))
+                except asyncio.TimeoutError: continue
+                if not buf: alive[i] = False; break
+                got[i] += len(buf)
+            wr.close()
+        except (OSError, asyncio.IncompleteReadError, ValueError): alive[i] = False
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return sum(1 for i in range(count) if alive[i] and got[i]), sum(got)
+
+def _relay_client(ports, count, deadline, vote_every):
+    return asyncio.run(_relay_viewers(ports, count, deadline, vote_every))
+
+def _cpu_sec(pid):
+    """/proc/<pid>/stat utime+stime (초)"""
+    with open(f'/proc/{pid}/stat') as f: st = f.read().rsplit(')', 1)[1].split()
+    return (int(st[11]) + int(st[12])) / os.sysconf('SC_CLK_TCK')
+
+def bench_relay(a):
+    import subprocess, tempfile, urllib.request
+    from concurrent.futures import ProcessPoolExecutor
+    here = os.path.dirname(os.path.abspath(__file__)); port = 18600
+    def state():
+        return json.loads(urllib.request.urlopen(f'http://127.0.0.1:{port}/api/state?table_id=mersoom', timeout=10).read())
+    cwd = tempfile.mkdtemp(prefix='poker-bench-'); env = {**os.environ, 'PORT': str(port), 'POKER_ADMIN_KEY': 'bench', 'SHARD_WORKERS': '0'}
+    game = subprocess.Popen([sys.executable, os.path.join(here, 'server.py')], cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    relays = []
+    print(f"relay: {a.viewers} spectator sockets on mersoom, {a.seconds}s window, nproc={os.cpu_count()}")
+    try:
+        for _ in range(100):
+            try: state(); break
+            except OSError: time.sleep(0.2)
+        for label, ports in (('direct (game process)', [port]), (f'{a.relays} relay process(es)', None)):
+            if ports is None:
+                ports = [port + 1 + i for i in range(a.relays)]
+                relays = [subprocess.Popen([sys.executable, os.path.join(here, 'relay.py')], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                          env={**env, 'RELAY_PORT': str(p), 'RELAY_UPSTREAM': f'127.0.0.1:{port}'}) for p in ports]
+                time.sleep(1)
+            deadline = time.time() + a.ramp + a.seconds + 2
+            per = [a.viewers // a.clients + (i < a.viewers % a.clients) for i in range(a.clients)]
+            with ProcessPoolExecutor(a.clients) as ex:
+                futs = [ex.submit(_relay_client, ports, n, deadline, a.vote_every) for n in per]
+                t_end = time.time() + a.ramp  # 접속 램프업: 게임 서버가 보는 관전자 수가 멈출 때까지
+                while time.time() < t_end and state().get('spectator_count', 0) < min(a.viewers, 200 if len(ports) == 1 and ports[0] == port else a.viewers): time.sleep(1)
+                time.sleep(2)
+                c0 = _cpu_sec(game.pid); r0 = sum(_cpu_sec(r.pid) for r in relays); t0 = time.time()
+                time.sleep(a.seconds)
+                el = time.time() - t0; gcpu = (_cpu_sec(game.pid) - c0) / el * 100; rcpu = (sum(_cpu_sec(r.pid) for r in relays) - r0) / el * 100
+                st = state()
+                served, nbytes = map(sum, zip(*(f.result() for f in futs)))
+            print(f"  {label:24s} served {served:5d}/{a.viewers}  game CPU {gcpu:5.1f}%  relay CPU {rcpu:5.1f}%  "
+                  f"spectator_count {st.get('spectator_count')}  {nbytes / 1e6:.1f}MB delivered")
+            time.sleep(2)
+    finally:
+        for r in relays: r.terminate(); r.wait()
+        game.terminate(); game.wait()
+
+def _rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('VmRSS')) / 1024
+
+def bench_hibernate(a):
+    import subprocess, tempfile, urllib.request, urllib.error
+    here = os.path.dirname(os.path.abspath(__file__))
+    def call(port, path, body=None):
+        r = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode() if body is not None else None,
+                                   headers={'Content-Type': 'application/json'})
+        try: return json.loads(urllib.request.urlopen(r, timeout=10).read())
+        except urllib.error.HTTPError as e: return json.loads(e.read() or b'{}')
+    print(f"hibernate: {a.tables} turbo table ids (bot join → leave), {a.seconds}s budget, MAX_TABLES per process")
+    for idle in (0, a.idle):
+        port = 18700 + idle; cwd = tempfile.mkdtemp(prefix='poker-bench-')
+        env = {**os.environ, 'PORT': str(port), 'SHARD_WORKERS': '0', 'POKER_ADMIN_KEY': 'bench', 'RATE_LIMITS': 'join=100000',
+               'TABLE_IDLE_SEC': str(idle), 'HIBERNATE_SWEEP_SEC': '1'}
+        proc = subprocess.Popen([sys.executable, os.path.join(here, 'server.py')], cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try: call(port, '/api/games'); break
+                except OSError: time.sleep(0.2)
+            hosted = []; end = time.time() + a.seconds
+            for k in range(a.tables):  # 자리가 없으면 휴면으로 빠질 때까지 재시도 (기존: MAX_TABLES에서 막힘)
+                tid = f'turbo_h{k}'
+                while time.time() < end:
+                    j = call(port, '/api/join', {'name': f'hib{k}', 'table_id': tid})
+                    if j.get('ok'): call(port, '/api/leave', {'name': f'hib{k}', 'table_id': tid, 'token': j['token']}); hosted.append(tid); break
+                    time.sleep(0.5)
+            if idle: time.sleep(idle + 15)  # 마지막 테이블들도 핸드 경계(게임 종료 연출 포함)에서 멈춰 휴면될 때까지
+            rss = _rss_mb(proc.pid); lat = []
+            for tid in hosted[:10]:  # 초기 테이블 = 가장 먼저 휴면된 것 → 복원 지연
+                t0 = time.perf_counter(); st = call(port, f'/api/state?table_id={tid}')
+                if st.get('table_id') == tid: lat.append((time.perf_counter() - t0) * 1000)
+            h = call(port, '/api/telemetry?key=bench').get('hibernation', {})
+            label = 'resident only' if not idle else f'hibernate after {idle}s'
+            print(f"  {label:22s} table ids hosted {len(hosted):4d}/{a.tables}  resident {h.get('resident', '?'):>3}  stored {h.get('stored', '?'):>4}  "
+                  f"RSS {rss:6.1f}MB  first-10 state {statistics.median(lat) if lat else 0:6.1f}ms (p50)")
+        finally:
+            proc.terminate(); proc.wait()
+
+def bench_journal(a):
+    import db, random, tempfile
+    db.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from journal import TableJournal, replay
+    conn = db._db(); j = TableJournal(db.connect)
+    names = [f'p{i}' for i in range(6)]
+    seat = lambda n: {'name': n, 'emoji': '🤖', 'chips': 500, 'hole': [], 'folded': False, 'bet': 0, 'is_bot': True, 'style': 'tight', 'out': False, 'meta': {}}
+    history = [{'hand': h, 'players': names, 'actions': [{'player': n, 'action': 'call', 'amount': 10} for n in names] * 4, 'winner': 'p0', 'pot': 60} for h in range(50)]
+    print(f"journal: {a.tables} tables x {a.hands} hands (6 seats, 4 streets, snapshot every {a.snap} hands)")
+    expect = {}; t0 = time.perf_counter()
+    for k in range(a.tables):
+        tid = f'table_{k}'; chips = {n: 500 for n in names}; seq = 0
+        def ev(kind, **e):
+            nonlocal seq; seq += 1
+            if j.append(tid, seq, kind, e): j.flush()
+        snap = lambda h: j.snapshot(tid, seq, json.dumps({'hand_num': h, 'dealer': h % 6, 'seats': [{**seat(n), 'chips': c} for n, c in chips.items()], 'history': history}))
+        snap(0)
+        for h in range(1, a.hands + 1):
+            if h % a.snap == 0: snap(h - 1)
+            ev('deal', hand=h, dealer=h % 6, sb=5, bb=10, chips=dict(chips), out=[])
+            for street in ('preflop', 'flop', 'turn', 'river'):
+                ev('street', r=street, c=[])
+                for n in names: ev('action', n=n, a='call', x=10)
+            w = random.choice(names)
+            for n in names: chips[n] += 60 - 10 if n == w else -10
+            ev('resolve', hand=h, dealer=h % 6, chips=dict(chips), out=[])
+        if k % 2: ev('deal', hand=a.hands + 1, dealer=0, sb=5, bb=10, chips=dict(chips), out=[]); ev('action', n='p0', a='raise', x=99)  # 진행 중 크래시
+        expect[tid] = (dict(chips), a.hands)
+    j.flush(); write = (time.perf_counter() - t0) * 1e6 / j.stats['events']
+    rows = conn.execute("SELECT COUNT(*) FROM table_journal").fetchone()[0]
+    t0 = time.perf_counter(); ok = 0
+    for tid, (d, seq, tail) in j.load().items():
+        d, _ = replay(d, tail)
+        ok += ({s['name']: s['chips'] for s in d['seats']}, d['hand_num']) == expect[tid]
+    rec = (time.perf_counter() - t0) * 1000
+    for k in range(a.tables):
+        for r in history: db.save_hand_history(f'table_{k}', r)
+    t0 = time.perf_counter()
+    for k in range(a.tables): db.load_hand_history(f'table_{k}', 50)
+    legacy = (time.perf_counter() - t0) * 1000
+    print(f"  {'write (append + batch flush)':30s} {write:8.1f}us/event  {j.stats['events']} events → {rows} rows after compaction")
+    print(f"  {'legacy restart (history only)':30s} {legacy:8.1f}ms  seats/chips/blinds/in-progress hands lost")
+    print(f"  {'journal snapshot + tail replay':30s} {rec:8.1f}ms  exact chips+hand restored {ok}/{a.tables} (half had a hand in flight)")
+
+async def _handoff_viewers(port, count, deadline):
+    """관전 WS count개 → deadline까지 유지. 끊기면 close 코드 기록 후 재접속 → (끊김 종류 Counter, 재접속 성공 수)"""
+    import base64, collections, struct
+    ends = collections.Counter(); back = [0]
+    async def one():
+        again = False
+        while time.time() < deadline:
+            try:
+                rd, wr = await asyncio.open_connection('127.0.0.1', port)
+                wr.write(f"GET /ws?table_id=mersoom HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         f"Sec-WebSocket-Key: {base64.b64encode(os.urandom(16)).decode()}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+                if b'101' not in await rd.readline(): raise ConnectionError
+                while (await rd.readline()) not in (b'\r\n', b''): pass
+                if again: back[0] += 1; again = False
+                ping = time.time()
+                while True:
+                    if deadline - time.time() <= 0: wr.close(); return
+                    if time.time() - ping > 15:  # 서버 WS 수신 타임아웃(30초) 전에 ping
+                        wr.write(bytes([0x89, 0x80]) + os.urandom(4)); ping = time.time()
+                    try: h = await asyncio.wait_for(rd.readexactly(2), min(15, deadline - time.time())); n = h[1] & 0x7f
+                    except asyncio.TimeoutError: continue
+                    if n == 126: n = struct.unpack('>H', await rd.readexactly(2))[0]
+                    elif n == 127: n = struct.unpack('>Q', await rd.readexactly(8))[0]
+                    body = await rd.readexactly(n)
+                    if h[0] & 0xf == 8: ends[f'close {struct.unpack(">H", body[:2])[0] if len(body) >= 2 else "-"}'] += 1; break
+            except (OSError, asyncio.IncompleteReadError, ConnectionError): ends['reset/EOF'] += 1
+            again = True; await asyncio.sleep(0.5)
+    await asyncio.gather(*(one() for _ in range(count)))
+    return ends, back[0]
+
+def bench_handoff(a):
+    import subprocess, tempfile, urllib.request, urllib.error
+    here = os.path.dirname(os.path.abspath(__file__))
+    def call(port, path, body=None, timeout=5):
+        r = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode() if body is not None else None,
+                                   headers={'Content-Type': 'application/json'})
+        try: return json.loads(urllib.request.urlopen(r, timeout=timeout).read())
+        except urllib.error.HTTPError as e: return json.loads(e.read() or b'{}')
+    def chips(st): return {p['name']: p['chips'] for p in st.get('players', [])}
+    print(f"handoff: restart under load — {a.viewers} mersoom spectator WS + 20ms /api/state poller + 1 seated bot (check/fold)")
+    for mode in ('kill + restart', 'handoff'):
+        port = 18800 + (mode == 'handoff'); cwd = tempfile.mkdtemp(prefix='poker-bench-')
+        env = {**os.environ, 'PORT': str(port), 'SHARD_WORKERS': '0', 'POKER_ADMIN_KEY': 'bench', 'HANDOFF_DRAIN_SEC': str(a.drain)}
+        spawn = lambda extra={}: subprocess.Popen([sys.executable, os.path.join(here, 'server.py')], cwd=cwd, env={**env, **extra},
+                                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        old = spawn(); new = None
+        try:
+            for _ in range(100):
+                try: call(port, '/api/games'); break
+                except OSError: time.sleep(0.2)
+            j = call(port, '/api/join', {'name': 'hobot', 'table_id': 'mersoom'}); time.sleep(2)
+            before = call(port, '/api/state?table_id=mersoom')
+            stop = threading.Event(); polls = {'ok': 0, 'fail': 0, 'gap': 0.0, 'acts': 0, 'rejected': 0}
+            def poll():  # 20ms 폴링 + 착석 봇은 자기 턴이면 check/call (토큰으로 인증)
+                last = time.perf_counter()
+                while not stop.is_set():
+                    try:
+                        st = call(port, '/api/state?table_id=mersoom&player=hobot', timeout=2)
+                        polls['ok'] += 1; now = time.perf_counter(); polls['gap'] = max(polls['gap'], now - last); last = now
+                        if st.get('turn') == 'hobot' and st.get('turn_options'):
+                            act = 'check' if any(x['action'] == 'check' for x in st['turn_options']['actions']) else 'fold'  # 파산하지 않게 (토큰 확인용 착석 유지)
+                            r = call(port, '/api/action', {'name': 'hobot', 'token': j.get('token', ''), 'table_id': 'mersoom', 'action': act, 'turn_seq': st.get('turn_seq')}, timeout=2)
+                            polls['acts' if r.get('ok') else 'rejected'] += 1
+                    except OSError: polls['fail'] += 1
+                    time.sleep(0.02)
+            th = threading.Thread(target=poll); th.start()
+            deadline = time.time() + a.drain + 25; res = {}
+            vt = threading.Thread(target=lambda: res.update(v=asyncio.run(_handoff_viewers(port, a.viewers, deadline)))); vt.start()
+            time.sleep(2); t0 = time.time()
+            if mode == 'handoff': new = spawn({'HANDOFF': '1'}); old.wait(a.drain + 40)
+            else: old.terminate(); old.wait(); new = spawn()
+            took = time.time() - t0
+            vt.join(); stop.set(); th.join()
+            after = call(port, '/api/state?table_id=mersoom')
+            left = call(port, '/api/leave', {'name': 'hobot', 'table_id': 'mersoom', 'token': j.get('token', '')})
+            ends, back = res['v']
+            cb, ca = chips(before), chips(after)
+            print(f"  {mode:15s} old exits after {took:5.1f}s  poll fail {polls['fail']:4d}  max gap {polls['gap'] * 1000:7.0f}ms  "
+                  f"WS ends {dict(ends)}  reconnected {back}/{a.viewers}  bot actions {polls['acts']} ok / {polls['rejected']} rejected  token {'kept' if left.get('ok') else 'lost'}  "
+                  f"hand #{before.get('hand')}→#{after.get('hand')}  seats kept {sum(n in ca for n in cb)}/{len(cb)}")
+        finally:
+            for p in (old, new):
+                if p and p.poll() is None: p.terminate(); p.wait()
+
+def _legacy_seat(i):
+    """기존 add_player 좌석 dict (+ 첫 핸드에서 붙는 last_action/_total_invested/latency_ms)"""
+    return {'name': f'bot{i}', 'emoji': '🤖', 'chips': 500, 'hole': [], 'folded': False, 'bet': 0, 'is_bot': True, 'bot_ai': None,
+            'style': 'tight', 'out': False, 'meta': {'version': '', 'strategy': '', 'repo': '', 'bio': '', 'death_quote': '', 'win_quote': '', 'lose_quote': ''},
+            'last_note': '', 'last_reasoning': '', 'last_mood': '', 'last_action': None, '_total_invested': 0, 'latency_ms': None}
+
+def _seat_hands_legacy(seats, hands):
+    """라이브 테이블 핫 경로 (문자열 키): 딜 → 액션마다 actor 스캔·생존 수·칩 이동·공개 state 행 생성 → 액션 수"""
+    n = len(seats); acts = 0
+    for h in range(hands):
+        for s in seats: s['hole'] = [h, h]; s['folded'] = False; s['bet'] = 0; s['last_action'] = None; s['_total_invested'] = 0; s['chips'] = 500
+        cur = 10
+        for street in range(4):
+            acted = set()
+            for k in range(n * 2):
+                s = seats[(h + k) % n]
+                if s['folded'] or s.get('out') or s['chips'] <= 0 or (s['name'] in acted and s['bet'] >= cur): continue
+                if sum(1 for x in seats if not x['folded'] and not x.get('out')) <= 1: break
+                if (h + k + street) % 5 == 0: s['folded'] = True; s['last_action'] = 'fold'
+                else:
+                    paid = min(cur - s['bet'], s['chips']); s['chips'] -= paid; s['bet'] += paid; s['_total_invested'] += paid; s['last_action'] = 'call'
+                acted.add(s['name']); acts += 1
+                [{'name': x['name'], 'emoji': x['emoji'], 'chips': x['chips'], 'folded': x['folded'], 'bet': x['bet'], 'style': x['style'],
+                  'has_cards': len(x['hole']) > 0, 'out': x.get('out', False), 'last_action': x.get('last_action'), 'latency_ms': x.get('latency_ms'),
+                  'meta': x.get('meta', {}), 'last_note': x.get('last_note', ''), 'last_reasoning': x.get('last_reasoning', ''),
+                  '_reasoning_en': x.get('_reasoning_en', ''), 'last_mood': x.get('last_mood', '')} for x in seats]
+            for s in seats: s['bet'] = 0
+    return acts
+
+def _seat_hands(seats, hands):
+    """_seat_hands_legacy와 같은 경로를 Seat 속성 접근으로"""
+    n = len(seats); acts = 0
+    for h in range(hands):
+        for s in seats: s.hole = [h, h]; s.folded = False; s.bet = 0; s.last_action = None; s._total_invested = 0; s.chips = 500
+        cur = 10
+        for street in range(4):
+            acted = set()
+            for k in range(n * 2):
+                s = seats[(h + k) % n]
+                if s.folded or s.out or s.chips <= 0 or (s.name in acted and s.bet >= cur): continue
+                if sum(1 for x in seats if not x.folded and not x.out) <= 1: break
+                if (h + k + street) % 5 == 0: s.folded = True; s.last_action = 'fold'
+                else:
+                    paid = min(cur - s.bet, s.chips); s.chips -= paid; s.bet += paid; s._total_invested += paid; s.last_action = 'call'
+                acted.add(s.name); acts += 1
+                [{'name': x.name, 'emoji': x.emoji, 'chips': x.chips, 'folded': x.folded, 'bet': x.bet, 'style': x.style,
+                  'has_cards': len(x.hole) > 0, 'out': x.out, 'last_action': x.last_action, 'latency_ms': x.latency_ms,
+                  'meta': x.meta, 'last_note': x.last_note, 'last_reasoning': x.last_reasoning,
+                  '_reasoning_en': x._reasoning_en, 'last_mood': x.last_mood} for x in seats]
+            for s in seats: s.bet = 0
+    return acts
+
+def bench_seat(a):
+    import tracemalloc
+    from seat import Seat
+    seat = lambda i: Seat.from_dict(_legacy_seat(i))
+    print(f"seat: memory for {a.seats} seats, hot hand loop {a.hands} hands x {a.players} seats (actor scan + alive + chips + state rows per action)")
+    mem = {}
+    for label, make in (('dict', _legacy_seat), ('Seat', seat)):
+        tracemalloc.start(); xs = [make(i) for i in range(a.seats)]
+        cur, _ = tracemalloc.get_traced_memory(); tracemalloc.stop()
+        shell = sum(sys.getsizeof(x) for x in xs) / len(xs); mem[label] = cur / len(xs); del xs
+        print(f"  {label + ' per seat':22s} {mem[label]:7.0f} B traced (incl. meta/hole/name)  object {shell:5.0f} B")
+    print(f"  {'saved':22s} {mem['dict'] - mem['Seat']:7.0f} B/seat ({(1 - mem['Seat'] / mem['dict']) * 100:.0f}%)")
+    for label, fn, make in (('dict + string keys', _seat_hands_legacy, _legacy_seat), ('Seat via dict view', _seat_hands_legacy, seat),
+                            ('Seat attributes', _seat_hands, seat)):
+        el = float('inf')
+        for _ in range(a.repeat):  # 최솟값 (스케줄링 잡음 제거)
+            seats = [make(i) for i in range(a.players)]; t0 = time.perf_counter(); acts = fn(seats, a.hands); el = min(el, time.perf_counter() - t0)
+        print(f"  {label:22s} {a.hands / el:8.0f} hands/s  {el * 1e6 / acts:6.2f}us/action")
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='머슴포커 벤치마크')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('pow', help='PoW 풀이: 기존 순차 vs 프로세스 풀')
+    p.add_argument('--difficulty', type=int, default=5); p.add_argument('--rounds', type=int, default=3)
+    p.add_argument('--workers', type=int, default=0)
+    p.set_defaults(fn=bench_pow)
+    p = sub.add_parser('mersoom', help='머슴닷컴 클라이언트: 연결 풀 + 입금 확인 single-flight')
+    p.add_argument('--requests', type=int, default=200); p.add_argument('--concurrency', type=int, default=50)
+    p.add_argument('--rtt', type=float, default=20, help='대역 서버 응답 지연(ms)')
+    p.set_defaults(fn=bench_mersoom)
+    p = sub.add_parser('watchdog', help='ranked 워치독: N+1 전체 스캔 vs 변경 피드')
+    p.add_argument('--accounts', type=int, default=100000); p.add_argument('--ticks', type=int, default=5)
+    p.add_argument('--changes', type=int, default=50)
+    p.set_defaults(fn=bench_watchdog)
+    p = sub.add_parser('audit', help='감사 로그: INSERT마다 COUNT(*) vs 버퍼 일괄 기록 + 주기 트림')
+    p.add_argument('--events', type=int, default=20000)
+    p.set_defaults(fn=bench_audit)
+    p = sub.add_parser('leaderboard', help='/api/leaderboard: 매 요청 정렬 vs bisect 정렬 인덱스')
+    p.add_argument('--players', type=int, default=20000); p.add_argument('--reads', type=int, default=200)
+    p.set_defaults(fn=bench_leaderboard)
+    p = sub.add_parser('ratelimit', help='레이트 리밋: IP dict 정렬 축출 vs 토큰 버킷 LRU')
+    p.add_argument('--clients', type=int, default=100000)
+    p.set_defaults(fn=bench_ratelimit)
+    p = sub.add_parser('registry', help='인메모리 레지스트리: 정렬 축출 vs TTL/LRU')
+    p.add_argument('--visitors', type=int, default=100000); p.add_argument('--cap', type=int, default=5000)
+    p.set_defaults(fn=bench_registry)
+    p = sub.add_parser('holdem', help='헤드리스 핸드 엔진: 핸드/초 (기존 조합 평가 vs 직접 평가)')
+    p.add_argument('--hands', type=int, default=5000); p.add_argument('--players', type=int, default=6)
+    p.set_defaults(fn=bench_holdem)
+    p = sub.add_parser('shard', help='테이블/머신: 단일 프로세스(MAX_TABLES 상한) vs 샤드 워커 + 프론트 라우터')
+    p.add_argument('--tables', type=int, default=24); p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--seconds', type=float, default=20); p.add_argument('--clients', type=int, default=2)
+    p.add_argument('--sync', type=float, default=3, help='집계 워커 동기화 대기(초)')
+    p.set_defaults(fn=bench_shard)
+    p = sub.add_parser('relay', help='관전자: 게임 프로세스 직접(MAX_WS_SPECTATORS 상한) vs 관전 릴레이 팬아웃')
+    p.add_argument('--viewers', type=int, default=5000); p.add_argument('--relays', type=int, default=1)
+    p.add_argument('--seconds', type=float, default=20); p.add_argument('--clients', type=int, default=2)
+    p.add_argument('--ramp', type=float, default=30, help='접속 램프업 최대 대기(초)')
+    p.add_argument('--vote-every', type=int, default=10, help='N번째 관전자마다 투표 1회 (0=안 함)')
+    p.set_defaults(fn=bench_relay)
+    p = sub.add_parser('hibernate', help='테이블 id 수용량: 상주만(MAX_TABLES 상한) vs 유휴 테이블 SQLite 휴면 + 지연 복원')
+    p.add_argument('--tables', type=int, default=60); p.add_argument('--seconds', type=float, default=90)
+    p.add_argument('--idle', type=int, default=1, help='TABLE_IDLE_SEC (휴면 측)')
+    p.set_defaults(fn=bench_hibernate)
+    p = sub.add_parser('journal', help='크래시 복구: 히스토리만 재적재 vs 이벤트 저널 스냅샷 + 꼬리 재생')
+    p.add_argument('--tables', type=int, default=50); p.add_argument('--hands', type=int, default=200)
+    p.add_argument('--snap', type=int, default=20, help='스냅샷 간격 (핸드)')
+    p.set_defaults(fn=bench_journal)
+    p = sub.add_parser('handoff', help='배포 재시작: 종료 후 재기동 vs 리스닝 소켓 + 상태 인계')
+    p.add_argument('--viewers', type=int, default=50); p.add_argument('--drain', type=float, default=30, help='HANDOFF_DRAIN_SEC')
+    p.set_defaults(fn=bench_handoff)
+    p = sub.add_parser('seat', help='좌석: dict + 문자열 키 vs __slots__ Seat 속성 (메모리/핸드 루프)')
+    p.add_argument('--seats', type=int, default=20000); p.add_argument('--hands', type=int, default=20000)
+    p.add_argument('--players', type=int, default=6); p.add_argument('--repeat', type=int, default=5)
+    p.set_defaults(fn=bench_seat)
+    a = ap.parse_args(); a.fn(a)
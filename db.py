@@ -1,13 +1,21 @@
 """머슴포커 — SQLite DB 관리 (연결 + CRUD)"""
-import os, sqlite3, json
+import os, sqlite3, json, time
+from metrics import db_commit_latency
 
 DB_FILE = '/data/poker_data.db' if os.path.isdir('/data') else 'poker_data.db'
 _db_conn = None
 
+class _TimedConnection(sqlite3.Connection):
+    """commit 소요 시간을 metrics에 기록하는 연결"""
+    def commit(self):
+        t0=time.perf_counter()
+        try: return super().commit()
+        finally: db_commit_latency.observe(time.perf_counter()-t0)
+
 def _db():
     global _db_conn
     if _db_conn is None:
-        _db_conn=sqlite3.connect(DB_FILE,check_same_thread=False)
+        _db_conn=sqlite3.connect(DB_FILE,check_same_thread=False,factory=_TimedConnection)
         _db_conn.execute("PRAGMA journal_mode=WAL")
         _db_conn.execute("PRAGMA synchronous=NORMAL")
         _db_conn.execute("""CREATE TABLE IF NOT EXISTS leaderboard(
@@ -53,11 +61,58 @@ def _db():
             ts REAL, event TEXT, auth_id TEXT, amount INT,
             balance_before INT, balance_after INT,
             details TEXT, ip TEXT)""")
+        _db_conn.execute("CREATE INDEX IF NOT EXISTS idx_rb_updated ON ranked_balances(updated_at)")  # 워치독 변경 피드
         _db_conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_ts ON ranked_audit_log(ts)")
         _db_conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_auth ON ranked_audit_log(auth_id)")
+        _db_conn.execute("""CREATE TABLE IF NOT EXISTS table_snapshots(
+            table_id TEXT PRIMARY KEY, data TEXT, ts REAL)""")  # 휴면 테이블 (재접속 시 복원 후 삭제)
+        _db_conn.execute("""CREATE TABLE IF NOT EXISTS table_journal(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_id TEXT, seq INT, ts REAL, kind TEXT, data TEXT)""")  # 테이블 이벤트 저널 (journal.py)
+        if not _db_conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_tj_seq'").fetchone():
+            # (table_id, seq) 유일 — 재시도 flush가 같은 이벤트를 두 번 넣지 않게 (기존 중복은 먼저 정리)
+            _db_conn.execute("DELETE FROM table_journal WHERE id NOT IN (SELECT MIN(id) FROM table_journal GROUP BY table_id, seq)")
+            _db_conn.execute("DROP INDEX IF EXISTS idx_tj_table")
+            _db_conn.execute("CREATE UNIQUE INDEX idx_tj_seq ON table_journal(table_id,seq)")
+        _db_conn.execute("""CREATE TABLE IF NOT EXISTS journal_snapshots(
+            table_id TEXT PRIMARY KEY, seq INT, data TEXT, ts REAL)""")
+        _ranked_ranking_schema(_db_conn)
         _db_conn.commit()
     return _db_conn
 
+# 현재 시즌 (SQL) — ranked.get_season()과 같은 형식 'S26.10'
+def connect():
+    """전용 연결 (원장·저널 워커 스레드용) — 공유 _db() 연결에서 다른 스레드가 commit해 진행 중 배치가 섞이지 않게.
+    스키마는 _db()가 생성, WAL은 DB 파일 설정이라 synchronous만 맞춤"""
+    _db()
+    conn=sqlite3.connect(DB_FILE,check_same_thread=False,factory=_TimedConnection)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+SEASON_SQL = "'S' || substr(strftime('%Y','now','localtime'),3) || '.' || strftime('%m','now','localtime')"
+
+def _ranked_ranking_schema(conn):
+    """ranked 리더보드: 순수익 생성 컬럼 + 인덱스, 시즌별 순수익(트리거 유지), 잔고 변경 버전(캐시 무효화)"""
+    cols = {r[1] for r in conn.execute("PRAGMA table_xinfo(ranked_balances)")}
+    if 'net_profit' not in cols:
+        conn.execute("ALTER TABLE ranked_balances ADD COLUMN net_profit INT GENERATED ALWAYS AS (balance + total_withdrawn - total_deposited) VIRTUAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rb_profit ON ranked_balances(net_profit DESC, auth_id)")
+    new_season = not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='ranked_season'").fetchone()
+    conn.execute("""CREATE TABLE IF NOT EXISTS ranked_season(
+        season TEXT, auth_id TEXT, net_profit INT DEFAULT 0,
+        PRIMARY KEY(season, auth_id))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rs_profit ON ranked_season(season, net_profit DESC, auth_id)")
+    if new_season:  # 도입 시점까지의 누적 순수익은 현재 시즌으로
+        conn.execute(f"INSERT INTO ranked_season(season, auth_id, net_profit) SELECT {SEASON_SQL}, auth_id, net_profit FROM ranked_balances WHERE net_profit != 0")
+    conn.execute("CREATE TABLE IF NOT EXISTS ranked_meta(k TEXT PRIMARY KEY, v INT DEFAULT 0)")
+    def body(old):  # 시즌 순수익 델타 + 변경 버전 증가
+        return f"""INSERT INTO ranked_season(season, auth_id, net_profit)
+            SELECT {SEASON_SQL}, NEW.auth_id, NEW.net_profit - {old} WHERE NEW.net_profit != {old}
+            ON CONFLICT(season, auth_id) DO UPDATE SET net_profit=net_profit+excluded.net_profit;
+        INSERT INTO ranked_meta(k, v) VALUES('balances', 1) ON CONFLICT(k) DO UPDATE SET v=v+1;"""
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rb_ins AFTER INSERT ON ranked_balances BEGIN {body('0')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rb_upd AFTER UPDATE OF balance, total_deposited, total_withdrawn ON ranked_balances BEGIN {body('OLD.net_profit')} END")
+
 def save_hand_history(table_id, record):
     """핸드 기록을 DB에 영구 저장"""
     try:
@@ -106,24 +161,48 @@ def load_player_stats():
         print(f"⚠️ DB load_ps err: {e}",flush=True)
         return {}
 
-def save_leaderboard(leaderboard):
-    """리더보드 DB 저장 (leaderboard dict를 인자로 받음)"""
+# 증분 저장: 샤드 워커들이 같은 행에 각자 더함 (행 전체를 덮어쓰면 다른 워커의 기록이 사라짐)
+# 업적은 id 기준 합집합, biggest_pot은 최댓값, streak는 마지막 기록
+_LB_DELTA_SQL = """INSERT INTO leaderboard(name,wins,losses,chips_won,hands,biggest_pot,streak,achievements)
+    VALUES(?,?,?,?,?,?,?,?)
+    ON CONFLICT(name) DO UPDATE SET wins=wins+excluded.wins, losses=losses+excluded.losses,
+        chips_won=chips_won+excluded.chips_won, hands=hands+excluded.hands,
+        biggest_pot=MAX(biggest_pot,excluded.biggest_pot), streak=excluded.streak,
+        achievements=CASE WHEN excluded.achievements='[]' THEN achievements ELSE (
+            SELECT json_group_array(json(v)) FROM (
+                SELECT value AS v FROM json_each(leaderboard.achievements) UNION ALL
+                SELECT value FROM json_each(excluded.achievements)
+                WHERE json_extract(value,'$.id') NOT IN (SELECT json_extract(value,'$.id') FROM json_each(leaderboard.achievements)))) END"""
+
+def save_leaderboard(leaderboard, deltas=None, trim_db=True):
+    """리더보드 DB 저장 → 트림으로 메모리에서 뺀 이름 목록 (실패 시 None — 호출측이 증분 유지 후 재시도).
+    deltas {name: {wins,losses,chips_won,hands,achievements(새 업적)}} 지정 시 증분만 더함, 없으면 전체 행 덮어쓰기(마이그레이션).
+    트림은 메모리에서 항상, DB 행 삭제는 trim_db일 때만 (샤드: 집계 워커 전담 — 다른 워커의 행을 지우지 않게)"""
+    removed=[]
+    db=_db()
     try:
-        db=_db()
         if len(leaderboard) > 2000:
             sorted_by_hands = sorted(leaderboard.items(), key=lambda x: x[1].get('hands', 0))
             remove_count = len(leaderboard) - 1500
             for name, _ in sorted_by_hands[:remove_count]:
-                del leaderboard[name]
-                db.execute("DELETE FROM leaderboard WHERE name=?", (name,))
-        for name,lb in leaderboard.items():
-            db.execute("""INSERT OR REPLACE INTO leaderboard(name,wins,losses,chips_won,hands,biggest_pot,streak,achievements)
-                VALUES(?,?,?,?,?,?,?,?)""",
-                (name,lb.get('wins',0),lb.get('losses',0),lb.get('chips_won',0),
-                 lb.get('hands',0),lb.get('biggest_pot',0),lb.get('streak',0),
-                 json.dumps(lb.get('achievements',[]))))
+                del leaderboard[name]; removed.append(name)
+            if trim_db: db.executemany("DELETE FROM leaderboard WHERE name=?", [(n,) for n in removed])
+        if deltas is None:
+            for name,lb in leaderboard.items():
+                db.execute("""INSERT OR REPLACE INTO leaderboard(name,wins,losses,chips_won,hands,biggest_pot,streak,achievements)
+                    VALUES(?,?,?,?,?,?,?,?)""",
+                    (name,lb.get('wins',0),lb.get('losses',0),lb.get('chips_won',0),
+                     lb.get('hands',0),lb.get('biggest_pot',0),lb.get('streak',0),
+                     json.dumps(lb.get('achievements',[]))))
+        else:
+            db.executemany(_LB_DELTA_SQL, [(name,d['wins'],d['losses'],d['chips_won'],d['hands'],
+                leaderboard.get(name,{}).get('biggest_pot',0),leaderboard.get(name,{}).get('streak',0),
+                json.dumps(d['achievements'])) for name,d in deltas.items()])
         db.commit()
-    except Exception as e: print(f"⚠️ DB save_lb err: {e}",flush=True)
+    except Exception as e:
+        db.rollback(); print(f"⚠️ DB save_lb err: {e}",flush=True)
+        return None
+    return removed
 
 def load_leaderboard(leaderboard):
     """리더보드 DB 로드 (leaderboard dict를 인자로 받아 업데이트)"""
@@ -140,3 +219,47 @@ def load_leaderboard(leaderboard):
                 'achievements':json.loads(row[7]) if row[7] else []}
         print(f"📊 Loaded {len(leaderboard)} players from DB",flush=True)
     except Exception as e: print(f"⚠️ DB load_lb err: {e}",flush=True)
+
+def merge_leaderboard(leaderboard, skip=()):
+    """다른 프로세스가 저장한 행을 메모리에 반영 (DB에 없는 elo/meta 필드는 유지) → 바뀐 이름 목록"""
+    changed=[]
+    try:
+        for row in _db().execute("SELECT name,wins,losses,chips_won,hands,biggest_pot,streak,achievements FROM leaderboard"):
+            if row[0] in skip: continue
+            d=leaderboard.get(row[0])
+            if d is not None and d.get('hands')==row[4] and d.get('wins')==row[1]: continue
+            v={'wins':row[1],'losses':row[2],'chips_won':row[3],'hands':row[4],'biggest_pot':row[5],'streak':row[6],
+                'achievements':json.loads(row[7]) if row[7] else []}
+            if d is None: leaderboard[row[0]]=v
+            else: d.update(v)
+            changed.append(row[0])
+    except Exception as e: print(f"⚠️ DB merge_lb err: {e}",flush=True)
+    return changed
+
+def save_table_snapshot(table_id, data):
+    """휴면 테이블 상태 저장 (data: JSON 문자열). 실패 시 False — 호출자가 메모리에 유지"""
+    try:
+        db=_db()
+        db.execute("INSERT OR REPLACE INTO table_snapshots(table_id,data,ts) VALUES(?,?,?)",(table_id,data,time.time()))
+        db.commit(); return True
+    except Exception as e:
+        print(f"⚠️ DB save_snap err: {e}",flush=True)
+        return False
+
+def load_table_snapshot(table_id):
+    """휴면 테이블 상태 → dict (없으면 None)"""
+    try:
+        row=_db().execute("SELECT data FROM table_snapshots WHERE table_id=?",(table_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    except Exception as e:
+        print(f"⚠️ DB load_snap err: {e}",flush=True)
+        return None
+
+def delete_table_snapshot(table_id):
+    try:
+        db=_db(); db.execute("DELETE FROM table_snapshots WHERE table_id=?",(table_id,)); db.commit()
+    except Exception as e: print(f"⚠️ DB del_snap err: {e}",flush=True)
+
+def table_snapshot_count():
+    try: return _db().execute("SELECT COUNT(*) FROM table_snapshots").fetchone()[0]
+    except Exception: return 0
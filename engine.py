@@ -1,7 +1,6 @@
 """머슴포커 — 순수 포커 엔진 (부수효과 0, 단위 테스트 가능)"""
 import random
 from collections import Counter
-from itertools import combinations
 
 SUITS = ['♠','♥','♦','♣']
 RANKS = ['2','3','4','5','6','7','8','9','10','J','Q','K','A']
@@ -21,11 +20,35 @@ def card_dict(c):
 def card_str(c): return f"{c[0]}{c[1]}"
 
 def evaluate_hand(seven):
-    best=None
-    for combo in combinations(seven,5):
-        s=score_five(list(combo))
-        if best is None or s>best: best=s
-    return best
+    """5~7장 중 최선의 5장 점수 — 21개 조합을 돌지 않고 직접 판정 (결과는 조합별 score_five 최댓값과 동일)"""
+    if len(seven)<5: return None
+    vals=[RANK_VALUES[c[0]] for c in seven]
+    by_suit={}
+    for c,v in zip(seven,vals): by_suit.setdefault(c[1],[]).append(v)
+    flush=None
+    for vs in by_suit.values():
+        if len(vs)>=5: flush=sorted(vs,reverse=True); break
+    if flush:
+        sh=_straight_high(flush)
+        if sh: return (10,[14]) if sh==14 else (9,[sh])
+    cnt=Counter(vals); g=sorted(cnt.items(),key=lambda x:(x[1],x[0]),reverse=True)
+    if g[0][1]==4: return (8,[g[0][0],max(v for v in cnt if v!=g[0][0])])
+    if g[0][1]==3 and g[1][1]>=2: return (7,[g[0][0],g[1][0]])
+    if flush: return (6,flush[:5])
+    uniq=sorted(cnt,reverse=True); sh=_straight_high(uniq)
+    if sh: return (5,[sh])
+    if g[0][1]==3: return (4,[g[0][0]]+[v for v in uniq if v!=g[0][0]][:2])
+    if g[0][1]==2 and g[1][1]==2:
+        p1,p2=g[0][0],g[1][0]; return (3,[p1,p2,max(v for v in uniq if v!=p1 and v!=p2)])
+    if g[0][1]==2: return (2,[g[0][0]]+[v for v in uniq if v!=g[0][0]][:3])
+    return (1,uniq[:5])
+
+def _straight_high(desc):
+    """내림차순 랭크 목록에서 가장 높은 스트레이트의 최고 랭크 (휠 A-5는 5, 없으면 0)"""
+    u=sorted(set(desc),reverse=True)
+    for i in range(len(u)-4):
+        if u[i]-u[i+4]==4: return u[i]
+    return 5 if {14,2,3,4,5}<=set(u) else 0
 
 def score_five(cards):
     ranks=sorted([RANK_VALUES[c[0]] for c in cards],reverse=True)
@@ -0,0 +1,94 @@
+"""머슴포커 — 무중단 재시작 (HANDOFF=1로 띄운 새 프로세스가 기존 프로세스에서 리스닝 소켓 fd + 테이블/레지스트리 상태를 넘겨받음)
+기존 프로세스: 컨트롤 유닉스 소켓에서 대기 → 요청이 오면 테이블을 핸드 경계에서 멈추고, 리스너를 닫은 뒤 fd(SCM_RIGHTS)와 상태를 전송 →
+새 프로세스가 ack하면 WS에 1012(서비스 재시작) 종료를 보내고 유예 뒤 종료. 리스너가 닫혀 있는 동안 들어온 연결은 커널 백로그에서 대기"""
+import asyncio, json, os, socket, struct, time
+from auth import _check_admin, ADMIN_KEY
+
+HANDOFF = os.environ.get('HANDOFF', '') == '1'  # 새 프로세스: 같은 PORT의 기존 프로세스에게서 인계
+HANDOFF_DIR = os.environ.get('SHARD_DIR', '/tmp')
+HANDOFF_DRAIN_SEC = float(os.environ.get('HANDOFF_DRAIN_SEC', 60))  # 진행 중 핸드 종료 대기 상한 (넘기면 그 핸드는 시작 전 칩으로 무효)
+HANDOFF_GRACE_SEC = 5          # 인계 후 기존 연결 정리 유예
+_HEAD = struct.Struct('>4sQ')  # b'FD  ' + 상태 JSON 길이
+
+stats = {'served': 0, 'failed': 0, 'received': 0, 'gap_ms': 0, 'drain_ms': 0, 'state_bytes': 0}
+
+def ctl_path(port):
+    return os.path.join(HANDOFF_DIR, f'poker-handoff-{port}.sock')
+
+def dump_cache(c):
+    """TTLCache → [[key, value, ts], ...] (LRU 순서·시각 유지)"""
+    return [[k, v, c._ts.get(k, 0)] for k, v in c.items()]
+
+def load_cache(c, rows):
+    for k, v, ts in rows: c[k] = v; c._ts[k] = ts
+
+def _recv_exact(conn, n, buf=b''):
+    buf = bytearray(buf)
+    while len(buf) < n:
+        b = conn.recv(min(1 << 20, n - len(buf)))
+        if not b: raise ConnectionError('handoff: 상대 종료')
+        buf += b
+    return bytes(buf)
+
+# ══ 새 프로세스 ══
+def request(port, timeout):
+    """블로킹 (executor에서 호출) → (conn, 리스닝 소켓, 상태 dict). 준비되면 ack(conn)으로 기존 프로세스를 물러나게 함"""
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); conn.settimeout(timeout)
+    conn.connect(ctl_path(port))
+    conn.sendall(f"HELLO {ADMIN_KEY or ''}\n".encode())
+    head, fds, _, _ = socket.recv_fds(conn, _HEAD.size, 1)
+    if not fds: raise ConnectionError(f'handoff 거부: {head[:40]!r}')
+    lsock = socket.socket(fileno=fds[0])
+    tag, n = _HEAD.unpack(_recv_exact(conn, _HEAD.size, head))
+    if tag != b'FD  ': raise ConnectionError(f'handoff 헤더 오류: {tag!r}')
+    state = json.loads(_recv_exact(conn, n))
+    stats['received'] += 1; stats['state_bytes'] = n
+    return conn, lsock, state
+
+def ack(conn, ok=True):
+    try: conn.sendall(b'OK\n' if ok else b'NO\n')
+    finally: conn.close()
+
+# ══ 기존 프로세스 ══
+def _send(conn, lsock, body):
+    socket.send_fds(conn, [_HEAD.pack(b'FD  ', len(body))], [lsock.fileno()])
+    conn.sendall(body)
+    return conn.recv(16)
+
+async def serve(server, port, prepare, export, resume):
+    """컨트롤 소켓에서 새 프로세스를 기다림 → 인계에 성공하면 리턴 (호출측이 연결 정리 후 종료).
+    prepare(): 테이블을 핸드 경계에서 멈춤. export() → 상태 dict.
+    실패하면 resume(복제해 둔 리스닝 소켓 또는 아직 안 닫았으면 None) → 테이블 재개 + (필요 시) 새 server로 계속 서비스"""
+    loop = asyncio.get_running_loop(); path = ctl_path(port)
+    if os.path.exists(path): os.unlink(path)
+    ctl = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); ctl.bind(path); os.chmod(path, 0o600)
+    ctl.listen(1); ctl.setblocking(False)
+    try:
+        while True:
+            conn, _ = await loop.sock_accept(ctl); dup = None; prepared = False
+            try:
+                hello = (await asyncio.wait_for(loop.sock_recv(conn, 256), 5)).decode(errors='replace').split()
+                if not hello or hello[0] != 'HELLO' or (ADMIN_KEY and not _check_admin(hello[1] if len(hello) > 1 else '')):
+                    stats['failed'] += 1; print("⚠️ HANDOFF 거부: 인증 실패", flush=True); continue
+                t0 = time.perf_counter()
+                print("🔁 HANDOFF 요청 — 진행 중 핸드 종료 대기", flush=True)
+                prepared = True; await prepare()
+                t1 = time.perf_counter(); stats['drain_ms'] = round((t1 - t0) * 1000, 1)
+                ls = server.sockets[0]
+                dup = socket.socket(ls.family, ls.type, fileno=os.dup(ls.fileno()))
+                server.close()  # 이후 연결은 백로그 → 새 프로세스가 같은 소켓으로 accept
+                body = json.dumps(export(), ensure_ascii=False, default=str).encode()
+                conn.setblocking(True); conn.settimeout(HANDOFF_DRAIN_SEC + 30)
+                reply = await loop.run_in_executor(None, _send, conn, dup, body)
+                if not reply.startswith(b'OK'): raise ConnectionError(f'새 프로세스 응답 {reply[:8]!r}')
+                stats['served'] += 1; stats['state_bytes'] = len(body); stats['gap_ms'] = round((time.perf_counter() - t1) * 1000, 1)
+                print(f"✅ HANDOFF 완료 — 상태 {len(body)}B, 핸드 대기 {stats['drain_ms']}ms, 리스너 공백 {stats['gap_ms']}ms", flush=True)
+                dup.close(); return True
+            except Exception as e:
+                stats['failed'] += 1; print(f"⚠️ HANDOFF 실패 — 기존 프로세스가 계속 서비스: {e}", flush=True)
+                if prepared: server = await resume(dup) or server
+            finally: conn.close()
+    finally:
+        ctl.close()
+        try: os.unlink(path)
+        except OSError: pass
@@ -0,0 +1,189 @@
+"""머슴포커 — 홀덤 핸드 상태 기계 (딜/블라인드/베팅/사이드팟/쇼다운 — 동기, sleep·로그·브로드캐스트 없음)
+라이브 Table은 actor()/apply() 사이에 애니메이션 딜레이·중계를 끼워 넣고, 헤드리스는 play()로 CPU 속도 그대로 돌림"""
+from engine import make_deck, evaluate_hand, hand_name
+
+STREETS = ('preflop', 'flop', 'turn', 'river')
+
+class Hand:
+    """seats: Seat 리스트 (seat.py — Table 좌석을 그대로 넘김, 상태는 좌석 속성에 직접 기록).
+    베팅 순회 규칙은 기존 betting_round와 동일: 최대 n*4바퀴, 레이즈 4회 캡, 레이즈 없는 바퀴가 끝나면 종료"""
+    MAX_RAISES = 4
+
+    def __init__(self, seats=(), dealer=0, sb=5, bb=10, deck=None):
+        self.seats = list(seats); self.sb = sb; self.bb = bb
+        self.dealer = dealer % len(self.seats) if self.seats else 0
+        self.deck = deck if deck is not None else (make_deck() if self.seats else [])
+        self.community = []; self.pot = 0; self.current_bet = 0; self.street = 'preflop'
+        self.acted = set(); self.raises = 0; self.last_raiser = None
+        self._start = 0; self._pass = 0; self._i = 0; self._raised = False; self._done = True
+
+    # ── 딜 / 강제 베팅 ──
+    def deal(self):
+        for s in self.seats:
+            s.hole = [self.deck.pop(), self.deck.pop()]; s.folded = False; s.bet = 0
+            s.last_action = None; s._total_invested = 0
+
+    def _put(self, s, amt):
+        s.chips -= amt; s.bet += amt; s._total_invested += amt; self.pot += amt
+
+    def blinds(self):
+        """→ (sb 좌석, sb 금액, bb 좌석, bb 금액). 헤즈업은 딜러가 SB"""
+        n = len(self.seats); d = self.dealer
+        sb_s, bb_s = (self.seats[d], self.seats[(d + 1) % n]) if n == 2 else (self.seats[(d + 1) % n], self.seats[(d + 2) % n])
+        sb_a = min(self.sb, sb_s.chips); bb_a = min(self.bb, bb_s.chips)
+        self._put(sb_s, sb_a); self._put(bb_s, bb_a); self.current_bet = bb_a
+        return sb_s, sb_a, bb_s, bb_a
+
+    def ante(self, s, amt):
+        """강제 앤티 (칩 한도 내) → 실제 금액"""
+        amt = min(amt, s.chips)
+        if amt > 0: self._put(s, amt)
+        return amt
+
+    # ── 카드 공개 ──
+    def burn(self):
+        self.deck.pop()
+
+    def reveal(self, k=1):
+        cards = [self.deck.pop() for _ in range(k)]; self.community += cards
+        return cards
+
+    def next_street(self):
+        """버닝 + 다음 스트리트 카드 공개 → 스트리트 이름"""
+        self.street = STREETS[STREETS.index(self.street) + 1]
+        self.burn(); self.reveal(3 if self.street == 'flop' else 1)
+        return self.street
+
+    # ── 베팅 라운드 ──
+    def begin_round(self, street=None, start=None):
+        """라운드 시작 — 프리플랍 외에는 베팅 초기화. start 생략 시 프리플랍 UTG(헤즈업은 딜러), 이후 딜러 다음"""
+        if street: self.street = street
+        n = len(self.seats)
+        if self.street != 'preflop':
+            for s in self.seats: s.bet = 0
+            self.current_bet = 0
+        if start is None:
+            if self.street == 'preflop': start = self.dealer if n == 2 else self.dealer + 3
+            else: start = self.dealer + 1
+        self.acted = set(); self.raises = 0; self.last_raiser = None
+        self._start = start % n if n else 0; self._pass = 0; self._i = 0; self._raised = False; self._done = n == 0
+
+    def alive(self):
+        return sum(1 for s in self.seats if not s.folded and not s.out)
+
+    def actor(self):
+        """다음에 행동할 좌석 (라운드 종료면 None) — 호출만으로는 상태가 바뀌지 않게 apply()에서 커서 전진"""
+        n = len(self.seats)
+        while not self._done:
+            if self._i >= n: self._end_pass(); continue
+            s = self.seats[(self._start + self._i) % n]
+            if s.folded or s.out or s.chips <= 0 or (
+                    s.name in self.acted and (s.name == self.last_raiser or s.bet >= self.current_bet)):
+                self._i += 1; continue
+            if self.alive() <= 1: self._done = True; break
+            return s
+        return None
+
+    def _end_pass(self):
+        live = [s for s in self.seats if not s.folded]
+        if not self._raised or self.last_raiser is None: self._done = True
+        elif all(s.name in self.acted for s in live if s.chips > 0) and \
+                all(s.bet >= self.current_bet or s.chips == 0 for s in live): self._done = True
+        else:
+            self._pass += 1; self._i = 0; self._raised = False
+            if self._pass >= len(self.seats) * 4: self._done = True
+
+    def to_call(self, s):
+        return self.current_bet - s.bet
+
+    def capped(self):
+        return self.raises >= self.MAX_RAISES
+
+    def normalize(self, s, act, amt):
+        """레이즈 캡 도달 시 레이즈 → 콜"""
+        if act == 'raise' and self.capped(): return 'call', self.to_call(s)
+        return act, amt
+
+    def apply(self, s, act, amt=0):
+        """actor()가 돌려준 좌석의 액션 반영 → 실제 투입 칩. raise amt는 콜 금액 위에 얹는 양"""
+        to_call = self.current_bet - s.bet; paid = 0
+        if act == 'fold': s.folded = True
+        elif act == 'raise':
+            paid = min(amt + min(to_call, s.chips), s.chips); self._put(s, paid)
+            self.current_bet = s.bet; self.last_raiser = s.name; self.raises += 1; self._raised = True
+        elif act != 'check':
+            paid = min(to_call, s.chips); self._put(s, paid)
+        self.acted.add(s.name); self._i += 1
+        return paid
+
+    def all_in(self):
+        """생존자 2명 이상 중 칩 남은 사람이 최대 1명 → 남은 카드만 공개하는 올인 쇼다운"""
+        alive = [s for s in self.seats if not s.folded and not s.out]
+        return len(alive) >= 2 and sum(1 for s in alive if s.chips > 0) <= 1
+
+    # ── 정산 ──
+    def award_uncontested(self):
+        """1명 생존 → 팟 전액 지급, 승자 좌석"""
+        w = next(s for s in self.seats if not s.folded and not s.out)
+        w.chips += self.pot
+        return w
+
+    def pots(self, contenders):
+        """사이드팟 [(금액, [자격자 이름])] — 올인 투입액 단계별로 분리, contenders는 쇼다운 참가자 이름 (강한 순)"""
+        levels = sorted(set(s._total_invested for s in self.seats if s._total_invested > 0 and s.chips == 0 and not s.out))
+        if not levels: return [(self.pot, list(contenders))]
+        out = []; prev = 0; remaining = self.pot
+        contributors = [s for s in self.seats if s._total_invested > 0]
+        for level in levels:
+            eligible = [s for s in contributors if s._total_invested >= level]
+            size = min((level - prev) * len(eligible), remaining)
+            if size > 0:
+                out.append((size, [s.name for s in eligible if not s.folded])); remaining -= size
+            prev = level
+        if remaining > 0: out.append((remaining, list(contenders)))
+        return out
+
+    def showdown(self):
+        """쇼다운 → (scores, total_won, main_winner, missing). scores: [(좌석, 점수, 족보명)] 강한 순.
+        홀카드 없는 생존자는 missing으로 제외, scores가 비면 팟 소멸 (칩 변동 없음)"""
+        alive = [s for s in self.seats if not s.folded and not s.out]
+        scores = []; missing = []
+        for s in alive:
+            if s.hole and all(s.hole):
+                sc = evaluate_hand(s.hole + self.community); scores.append((s, sc, hand_name(sc)))
+            else: missing.append(s)
+        scores.sort(key=lambda x: x[1], reverse=True)
+        total_won = {}; main_winner = None
+        if not scores: return scores, total_won, None, missing
+        for amount, eligible in self.pots([s.name for s, _, _ in scores]):
+            ps = [x for x in scores if x[0].name in eligible]
+            if not ps: continue
+            winners = [x[0] for x in ps if x[1] == ps[0][1]]
+            share, rem = divmod(amount, len(winners))
+            for i, w in enumerate(winners):
+                a = share + (1 if i < rem else 0)  # 나머지 1pt씩 분배
+                w.chips += a; total_won[w.name] = total_won.get(w.name, 0) + a
+                if main_winner is None: main_winner = w
+        return scores, total_won, main_winner or scores[0][0], missing
+
+def play(hand, decide, antes=None):
+    """헤드리스로 핸드 1판 끝까지 진행 → {'winner', 'pot', 'showdown', 'actions'}.
+    decide(hand, seat, to_call) → (action, amount). antes: {이름: 금액} (블라인드 후 강제 앤티)"""
+    hand.deal(); hand.blinds()
+    for s in hand.seats:
+        if antes and antes.get(s.name): hand.ante(s, antes[s.name])
+    actions = 0; street = 'preflop'; allin = False
+    while True:
+        if not allin:
+            hand.begin_round(street)
+            while (s := hand.actor()) is not None:
+                act, amt = hand.normalize(s, *decide(hand, s, hand.to_call(s)))
+                hand.apply(s, act, amt); actions += 1
+            if hand.alive() <= 1:
+                w = hand.award_uncontested()
+                return {'winner': w.name, 'pot': hand.pot, 'showdown': False, 'actions': actions}
+            allin = hand.all_in()
+        if street == 'river': break
+        street = hand.next_street()
+    scores, total_won, w, _ = hand.showdown()
+    return {'winner': w.name if w else None, 'pot': hand.pot, 'showdown': True, 'actions': actions, 'won': total_won}
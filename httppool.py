@@ -0,0 +1,65 @@
+"""머슴포커 — keep-alive HTTP 연결 풀 (http.client, 호스트별 유휴 연결 재사용)"""
+import http.client, threading, time
+from urllib.parse import urlsplit
+
+IDEMPOTENT = frozenset(('GET', 'HEAD', 'OPTIONS'))
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+class HTTPPool:
+    """request()는 스레드 안전. 유휴 연결은 LIFO로 재사용, max_idle_age 지나면 폐기.
+    재사용 연결이 끊겨 있으면 멱등 요청만 새 연결로 1회 재시도 (POST는 최근 사용 연결만 재사용)"""
+    def __init__(self, max_idle=4, max_idle_age=30.0, post_reuse_age=2.0):
+        self.max_idle = max_idle; self.max_idle_age = max_idle_age; self.post_reuse_age = post_reuse_age
+        self._idle = {}  # (scheme, host, port) → [(conn, last_used)]
+        self._mu = threading.Lock()
+        self.stats = {'requests': 0, 'opened': 0, 'reused': 0, 'retried': 0, 'errors': 0}
+
+    def _get(self, key, method, timeout):
+        max_age = self.max_idle_age if method in IDEMPOTENT else self.post_reuse_age
+        now = time.time()
+        with self._mu:
+            stack = self._idle.get(key, [])
+            while stack:
+                conn, used = stack.pop()
+                if now - used <= max_age:
+                    self.stats['reused'] += 1; conn.timeout = timeout
+                    if conn.sock: conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+            self.stats['opened'] += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def _put(self, key, conn):
+        with self._mu:
+            stack = self._idle.setdefault(key, [])
+            if len(stack) < self.max_idle: stack.append((conn, time.time())); return
+        conn.close()
+
+    def request(self, url, method='GET', headers=None, body=None, timeout=10):
+        """→ (status, 응답 바이트). 연결/프로토콜 오류는 예외로 전달"""
+        u = urlsplit(url); key = (u.scheme, u.hostname, u.port)
+        path = (u.path or '/') + (f'?{u.query}' if u.query else '')
+        self.stats['requests'] += 1
+        for attempt in (0, 1):
+            conn, reused = self._get(key, method, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                r = conn.getresponse(); data = r.read()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused and attempt == 0 and method in IDEMPOTENT:
+                    self.stats['retried'] += 1; continue
+                self.stats['errors'] += 1; raise
+            except Exception:
+                conn.close(); self.stats['errors'] += 1; raise
+            if r.will_close: conn.close()
+            else: self._put(key, conn)
+            return r.status, data
+
+    def close(self):
+        with self._mu:
+            for stack in self._idle.values():
+                for conn, _ in stack: conn.close()
+            self._idle.clear()
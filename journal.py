@@ -0,0 +1,100 @@
+"""머슴포커 — 테이블 이벤트 저널 (추가 전용 이벤트 + 주기 스냅샷 → 재시작 시 스냅샷 + 꼬리 재생으로 전 테이블 복구)
+이벤트: join/leave/blinds/deal/action/street/resolve. seq는 테이블별 단조 증가, 스냅샷은 seq 이하 이벤트를 대체"""
+import json, threading, time
+
+class TableJournal:
+    """append()/snapshot()/drop()은 메모리 버퍼에 넣기만 함 (O(1)). flush()가 버퍼 순서대로
+    이벤트 executemany + 스냅샷 upsert + 스냅샷 이전 이벤트 삭제를 commit 1회로 기록.
+    connect_fn()으로 연 저널 전용 연결 사용 (다른 스레드의 commit이 쓰다 만 배치를 확정하지 못하게)"""
+
+    def __init__(self, connect_fn, batch=500):
+        self.connect_fn = connect_fn; self._conn = None; self.batch = batch
+        self._buf = []; self._mu = threading.Lock(); self._wmu = threading.Lock()
+        self.stats = {'events': 0, 'snapshots': 0, 'flushes': 0, 'compacted': 0, 'errors': 0}
+
+    def append(self, tid, seq, kind, data):
+        """이벤트 1건 (data는 dict — 여기서 직렬화해 이후 변경과 무관). 버퍼가 batch 이상이면 True"""
+        row = (tid, seq, time.time(), kind, json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str))
+        with self._mu:
+            self._buf.append(('e', row)); self.stats['events'] += 1
+            return len(self._buf) >= self.batch
+
+    def snapshot(self, tid, seq, data):
+        """data: JSON 문자열. flush 때 seq 이하 이벤트 삭제 (압축)"""
+        with self._mu: self._buf.append(('s', (tid, seq, data, time.time())))
+
+    def drop(self, tid):
+        """테이블 저널 전체 삭제 (휴면 등 다른 경로가 상태를 넘겨받을 때)"""
+        with self._mu: self._buf.append(('d', tid))
+
+    def pending(self):
+        return len(self._buf)
+
+    def flush(self):
+        with self._mu:
+            ops, self._buf = self._buf, []
+        if not ops: return 0
+        try:
+            with self._wmu:
+                try: self._write(ops)
+                except Exception: self._db().rollback(); raise  # 쓰다 만 트랜잭션을 남기지 않음 — 재시도가 이벤트를 중복 기록하지 않게
+        except Exception as e:
+            with self._mu: self._buf[:0] = ops  # 다음 flush에서 재시도
+            self.stats['errors'] += 1
+            print(f"⚠️ JOURNAL flush error: {e}", flush=True); return 0
+        self.stats['flushes'] += 1
+        return len(ops)
+
+    def _db(self):
+        if self._conn is None: self._conn = self.connect_fn()
+        return self._conn
+
+    def _write(self, ops):
+        db = self._db(); rows = []
+        def events():
+            if rows: db.executemany("INSERT OR IGNORE INTO table_journal(table_id,seq,ts,kind,data) VALUES(?,?,?,?,?)", rows); rows.clear()
+        for op, v in ops:
+            if op == 'e': rows.append(v); continue
+            events()
+            if op == 's':
+                db.execute("INSERT OR REPLACE INTO journal_snapshots(table_id,seq,data,ts) VALUES(?,?,?,?)", v)
+                self.stats['compacted'] += db.execute("DELETE FROM table_journal WHERE table_id=? AND seq<=?", (v[0], v[1])).rowcount
+                self.stats['snapshots'] += 1
+            else:
+                db.execute("DELETE FROM table_journal WHERE table_id=?", (v,))
+                db.execute("DELETE FROM journal_snapshots WHERE table_id=?", (v,))
+        events(); db.commit()
+
+    def load(self):
+        """→ {table_id: (스냅샷 dict 또는 None, 스냅샷 seq, [(seq, kind, data), ...] 꼬리 이벤트)}"""
+        db = self._db(); out = {}
+        for tid, seq, data in db.execute("SELECT table_id, seq, data FROM journal_snapshots"):
+            out[tid] = (json.loads(data), seq, [])
+        for tid, seq, kind, data in db.execute("SELECT table_id, seq, kind, data FROM table_journal ORDER BY table_id, seq"):
+            snap = out.setdefault(tid, (None, 0, []))
+            if seq > snap[1]: snap[2].append((seq, kind, json.loads(data)))
+        return out
+
+def replay(d, events):
+    """스냅샷 dict(Table.to_snapshot 형식)에 꼬리 이벤트 적용 → (d, 무효 처리된 진행 중 핸드 번호 또는 None).
+    deal은 핸드 시작 전 칩을 담으므로, resolve 없이 끝난 핸드는 시작 전 상태로 되돌아감 (마지막 일관 상태)"""
+    seats = d.setdefault('seats', []); open_hand = None
+    def seat(name): return next((s for s in seats if s['name'] == name), None)
+    for _, kind, e in events:
+        if kind == 'join':
+            s = seat(e['seat']['name'])
+            if s: s.update(e['seat'])
+            else: seats.append(e['seat'])
+        elif kind == 'leave':
+            s = seat(e['name'])
+            if s: s['out'] = True; s['chips'] = e.get('chips', s['chips'])
+        elif kind == 'blinds':
+            d['SB'], d['BB'] = e['sb'], e['bb']
+        elif kind in ('deal', 'resolve'):
+            seats[:] = [s for s in seats if s['name'] in e['chips']]
+            for s in seats: s['chips'] = e['chips'][s['name']]; s['out'] = s['name'] in e.get('out', ())
+            d['hand_num'] = e['hand']; d['dealer'] = e.get('dealer', d.get('dealer', 0))
+            if kind == 'deal': d['SB'], d['BB'] = e['sb'], e['bb']; open_hand = e['hand']
+            else: open_hand = None
+    if open_hand is not None: d['hand_num'] = open_hand - 1  # 무효 핸드는 다시 #N으로 진행
+    return d, open_hand
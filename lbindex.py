@@ -0,0 +1,97 @@
+"""머슴포커 — 리더보드 정렬 인덱스 (bisect 유지 정렬 리스트: ELO 순위, 배지 최댓값, 이름→순위)"""
+from bisect import bisect_left, insort
+
+class SortedIndex:
+    """keyfn(name, d) → 정렬 키 튜플 (작을수록 앞, 마지막 원소는 name) 또는 None(제외)"""
+    def __init__(self, keyfn):
+        self.keyfn = keyfn; self.items = []; self.keys = {}
+
+    def update(self, name, d):
+        k = self.keyfn(name, d); old = self.keys.get(name)
+        if old == k: return
+        if old is not None: self._drop(old)
+        if k is None: self.keys.pop(name, None); return
+        insort(self.items, k); self.keys[name] = k
+
+    def remove(self, name):
+        k = self.keys.pop(name, None)
+        if k is not None: self._drop(k)
+
+    def _drop(self, k):
+        i = bisect_left(self.items, k)
+        if i < len(self.items) and self.items[i] == k: del self.items[i]
+
+    def rank(self, name):
+        """0부터 시작하는 순위 (없으면 None)"""
+        k = self.keys.get(name)
+        return None if k is None else bisect_left(self.items, k)
+
+    def names(self, start=0):
+        for i in range(start, len(self.items)): yield self.items[i][-1]
+
+    def __len__(self):
+        return len(self.items)
+
+def _winrate(d):
+    g = d['wins'] + d['losses']
+    return d['wins'] / g if g > 0 else 0
+
+class LeaderboardIndex:
+    """leaderboard dict 위의 보조 인덱스 — update_leaderboard 등 변경 지점에서 update()/remove() 호출.
+    version은 변경마다 증가 (렌더링 캐시 키)"""
+    def __init__(self, src, exclude=()):
+        self.src = src; self.exclude = set(exclude); self.version = 0
+        self.by = {
+            'elo': SortedIndex(lambda n, d: (-d.get('elo', 1000), -d['wins'], n)),
+            'streak': SortedIndex(lambda n, d: (-d.get('streak', 0), n)),
+            'pot': SortedIndex(lambda n, d: (-d.get('biggest_pot', 0), n)),
+            'winrate': SortedIndex(lambda n, d: (-_winrate(d), n) if d['hands'] >= 10 else None),
+        }
+
+    def update(self, name):
+        d = self.src.get(name)
+        if d is None or name in self.exclude: self.remove(name); return
+        for idx in self.by.values(): idx.update(name, d)
+        self.version += 1
+
+    def touch(self):
+        """순위와 무관한 필드(메타/업적) 변경 — 렌더링 캐시만 무효화"""
+        self.version += 1
+
+    def remove(self, name):
+        for idx in self.by.values(): idx.remove(name)
+        self.version += 1
+
+    def rebuild(self):
+        for k, idx in self.by.items(): self.by[k] = SortedIndex(idx.keyfn)
+        for name in list(self.src): self.update(name)
+
+    def _qualified(self, order, min_hands):
+        for n in self.by[order].names():
+            d = self.src.get(n)
+            if d is not None and d['hands'] >= min_hands: yield n, d
+
+    def page(self, min_hands=0, offset=0, limit=20):
+        """ELO 순 [(name, d)] — min_hands=0이면 O(limit), 아니면 조건 미달 항목만큼 더 건너뜀"""
+        out = []
+        if min_hands <= 0:
+            for n in self.by['elo'].names(offset):
+                if len(out) >= limit: break
+                out.append((n, self.src[n]))
+            return out
+        for i, nd in enumerate(self._qualified('elo', min_hands)):
+            if i >= offset + limit: break
+            if i >= offset: out.append(nd)
+        return out
+
+    def total(self):
+        return len(self.by['elo'])
+
+    def rank(self, name):
+        """전체 ELO 순위 (1부터, 없으면 None)"""
+        r = self.by['elo'].rank(name)
+        return None if r is None else r + 1
+
+    def leaders(self, min_hands=0):
+        """명예의 전당 배지 대상 {'streak': (name, d), 'pot': …, 'winrate': …} — 각 정렬 인덱스의 선두"""
+        return {k: next(self._qualified(k, min_hands), None) for k in ('streak', 'pot', 'winrate')}
@@ -0,0 +1,133 @@
+"""머슴포커 — ranked 원장 서비스 (잔고 변경을 전용 워커 스레드 1개로 직렬화, awaitable 반환, 그룹 커밋)"""
+import asyncio, queue, threading, time
+
+# ══ 원장 연산 (lock 보유 + 트랜잭션 안에서 호출, commit 안 함) ══
+def credit_op(db, auth_id, amount):
+    """잔고 추가 → 새 잔고"""
+    db.execute("""INSERT INTO ranked_balances(auth_id, balance, total_deposited, updated_at)
+        VALUES(?, ?, 0, strftime('%s','now'))
+        ON CONFLICT(auth_id) DO UPDATE SET balance=balance+?, updated_at=strftime('%s','now')""",
+        (auth_id, amount, amount))
+    return db.execute("SELECT balance FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()[0]
+
+def debit_op(db, auth_id, amount):
+    """원자적 차감: WHERE balance >= ? 로 잔고 부족 시 업데이트 자체가 안 됨 → (ok, 잔고)"""
+    cur = db.execute("UPDATE ranked_balances SET balance=balance-?, updated_at=strftime('%s','now') WHERE auth_id=? AND balance>=?",
+        (amount, auth_id, amount))
+    row = db.execute("SELECT balance FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()
+    return cur.rowcount > 0, row[0] if row else 0
+
+def balance_op(db, auth_id):
+    row = db.execute("SELECT balance FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()
+    return row[0] if row else 0
+
+class Ledger:
+    """submit(fn, *args) → asyncio.Future. fn(db, *args)는 워커 스레드에서 lock 보유 상태로 실행.
+    db는 connect_fn()으로 한 번 연 원장 전용 연결 (다른 스레드의 commit이 배치 일부를 확정하지 못하게).
+    큐에 쌓인 연산은 한 트랜잭션·commit 1회로 처리(그룹 커밋)하고, commit 후에 future를 완료.
+    critical=False 연산만 있으면 batch_window 동안 더 모아서 commit (중요 연산이 오면 즉시)"""
+    _STOP = object()
+
+    def __init__(self, connect_fn, lock, batch_window=0.05, max_batch=64):
+        self.connect_fn = connect_fn; self._conn = None; self.lock = lock
+        self.batch_window = batch_window; self.max_batch = max_batch
+        self._q = queue.Queue(); self._thread = None; self._mu = threading.Lock()
+        self.stats = {'ops': 0, 'batches': 0, 'commits': 0, 'max_batch': 0, 'errors': 0, 'isolated': 0}
+
+    def _start(self):
+        with self._mu:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='ledger', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, critical=True):
+        loop = asyncio.get_running_loop(); fut = loop.create_future()
+        if self._thread is None: self._start()
+        self._q.put((fn, args, critical, loop, fut))
+        return fut
+
+    async def run(self, fn, *args, critical=True):
+        return await self.submit(fn, *args, critical=critical)
+
+    def post(self, fn, *args):
+        """결과를 기다리지 않는 비중요 기록 (스냅샷 등) — 다른 연산과 commit을 합침, 오류는 로그만"""
+        self.submit(fn, *args, critical=False).add_done_callback(_consume)
+
+    # ── 잔고 연산 (기존 동기 함수와 같은 이름·반환값) ──
+    def ranked_credit(self, auth_id, amount, critical=True):
+        """→ 새 잔고"""
+        return self.submit(credit_op, auth_id, amount, critical=critical)
+
+    def ranked_deposit(self, auth_id, amount):
+        """→ (ok, 잔고)"""
+        return self.submit(debit_op, auth_id, amount)
+
+    def ranked_balance(self, auth_id):
+        """대기 중인 변경이 반영된 뒤의 잔고"""
+        return self.submit(balance_op, auth_id)
+
+    def pending(self):
+        return self._q.qsize()
+
+    def _collect(self, first):
+        batch = [first]; critical = first[2]
+        deadline = None if critical else time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            try:
+                if deadline is None: item = self._q.get_nowait()
+                else: item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty: break
+            if item is self._STOP: self._q.put(item); break
+            batch.append(item)
+            if item[2]: deadline = None  # 중요 연산 합류 → 남은 것만 즉시 모아 commit
+        return batch
+
+    def _apply(self, batch):
+        """한 트랜잭션으로 실행 → [(ok, 값)]. 실패 연산이 있으면 롤백 후 연산별 commit으로 격리 재실행"""
+        if self._conn is None: self._conn = self.connect_fn()
+        db = self._conn
+        with self.lock:
+            try:
+                out = [(True, fn(db, *args)) for fn, args, *_ in batch]
+                db.commit(); self.stats['commits'] += 1
+                return out
+            except Exception:
+                db.rollback()
+                if len(batch) == 1: raise
+            self.stats['isolated'] += 1
+            out = []
+            for fn, args, *_ in batch:
+                try:
+                    r = fn(db, *args); db.commit(); self.stats['commits'] += 1; out.append((True, r))
+                except Exception as e:
+                    db.rollback(); out.append((False, e))
+            return out
+
+    def _worker(self):
+        while True:
+            first = self._q.get()
+            if first is self._STOP: return
+            batch = self._collect(first)
+            try: out = self._apply(batch)
+            except Exception as e: out = [(False, e)] * len(batch)
+            self.stats['ops'] += len(batch); self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            for (_, _, _, loop, fut), (ok, val) in zip(batch, out):
+                if not ok:
+                    self.stats['errors'] += 1
+                    print(f"⚠️ LEDGER_OP_ERR {val}", flush=True)
+                try: loop.call_soon_threadsafe(_resolve, fut, ok, val)
+                except RuntimeError: pass  # 루프 종료 중
+
+    def close(self, timeout=5):
+        """남은 연산 처리 후 워커 종료"""
+        if self._thread and self._thread.is_alive():
+            self._q.put(self._STOP); self._thread.join(timeout)
+
+def _consume(fut):
+    if not fut.cancelled(): fut.exception()
+
+def _resolve(fut, ok, val):
+    if fut.cancelled(): return
+    if ok: fut.set_result(val)
+    else: fut.set_exception(val)
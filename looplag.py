@@ -0,0 +1,95 @@
+"""머슴포커 — 이벤트 루프 지연 모니터 (하트비트 드리프트 샘플링 + 느린 콜백 탐지)"""
+import asyncio, time
+from collections import deque
+from metrics import Gauge, Counter, loop_lag
+
+SLOW_LOG_MAX = 50
+
+class LoopLagMonitor:
+    """interval마다 깨어나 예정 시각 대비 드리프트를 기록. 분 단위 p50/p99 이력 유지"""
+    def __init__(self, interval=0.5, window=600, history=60, slow_threshold=0.1):
+        self.interval = interval
+        self.samples = deque(maxlen=window)   # 최근 드리프트(초) — 기본 5분치
+        self.minutes = deque(maxlen=history)  # (분 시작 ts, p50, p99, max) — 기본 1시간
+        self.slow_threshold = slow_threshold
+        self.slow_log = deque(maxlen=SLOW_LOG_MAX)  # 최근 느린 콜백
+        self.slow_by_name = {}                     # 이름 → [횟수, 최대초]
+        self._cur_min = 0; self._cur = []
+        self._orig_run = None
+        Gauge('poker_event_loop_lag_p50_seconds', '이벤트 루프 지연 p50 (최근 창)', fn=lambda: {(): self.quantile(0.5)})
+        Gauge('poker_event_loop_lag_p99_seconds', '이벤트 루프 지연 p99 (최근 창)', fn=lambda: {(): self.quantile(0.99)})
+        self.slow_total = Counter('poker_slow_callbacks_total', f'느린 콜백 수 (>= {slow_threshold}s)')
+
+    def quantile(self, q, data=None):
+        xs = sorted(self.samples if data is None else data)
+        if not xs: return 0.0
+        return round(xs[min(len(xs) - 1, int(q * len(xs)))], 4)
+
+    def _record(self, lag):
+        self.samples.append(lag); loop_lag.set(round(lag, 4))
+        m = int(time.time() // 60)
+        if m != self._cur_min:
+            if self._cur:
+                self.minutes.append((self._cur_min * 60, self.quantile(0.5, self._cur), self.quantile(0.99, self._cur), round(max(self._cur), 4)))
+            self._cur_min = m; self._cur = []
+        self._cur.append(lag)
+
+    async def run(self):
+        """하트비트 루프 — create_task로 기동"""
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._record(max(0.0, time.perf_counter() - t0 - self.interval))
+
+    # ── 느린 콜백 탐지 ──
+    def install(self):
+        """asyncio Handle._run을 감싸 threshold 이상 걸린 콜백을 기록 (debug 모드 불필요)"""
+        if self._orig_run: return
+        orig = self._orig_run = asyncio.events.Handle._run
+        mon = self
+        def _run(handle):
+            t0 = time.perf_counter()
+            try: return orig(handle)
+            finally:
+                dt = time.perf_counter() - t0
+                if dt >= mon.slow_threshold: mon._slow(handle, dt)
+        asyncio.events.Handle._run = _run
+
+    def uninstall(self):
+        if self._orig_run: asyncio.events.Handle._run = self._orig_run; self._orig_run = None
+
+    @staticmethod
+    def describe(handle):
+        """콜백 → '태스크명:코루틴@파일:줄' (라우터가 태스크명을 라우트 라벨로 지정)"""
+        cb = handle._callback; owner = getattr(cb, '__self__', None)
+        if isinstance(owner, asyncio.Task):
+            coro = owner.get_coro(); name = getattr(coro, '__qualname__', repr(coro))
+            fr = getattr(coro, 'cr_frame', None)
+            where = f'@{fr.f_code.co_filename.rsplit("/", 1)[-1]}:{fr.f_lineno}' if fr else ''
+            return f'{owner.get_name()}:{name}{where}'
+        return getattr(cb, '__qualname__', None) or repr(cb)[:120]
+
+    def _slow(self, handle, dt):
+        try: name = self.describe(handle)
+        except Exception: name = '?'
+        self.slow_total.inc()
+        self.slow_log.append({'ts': round(time.time(), 1), 'ms': round(dt * 1000, 1), 'callback': name})
+        st = self.slow_by_name.get(name)
+        if st is None:
+            if len(self.slow_by_name) >= 200: self.slow_by_name.clear()
+            st = self.slow_by_name[name] = [0, 0.0]
+        st[0] += 1; st[1] = max(st[1], dt)
+        print(f"⚠️ SLOW_CALLBACK {dt*1000:.0f}ms {name}", flush=True)
+
+    def top_slow(self, n=5):
+        return [{'callback': k, 'count': c, 'max_ms': round(m * 1000, 1)}
+                for k, (c, m) in sorted(self.slow_by_name.items(), key=lambda x: -x[1][1])[:n]]
+
+    def snapshot(self):
+        """관리자 텔레메트리용 요약 (ms)"""
+        return {'p50_ms': round(self.quantile(0.5) * 1000, 1), 'p99_ms': round(self.quantile(0.99) * 1000, 1),
+                'max_ms': round(max(self.samples, default=0) * 1000, 1), 'samples': len(self.samples),
+                'history': [{'ts': ts, 'p50_ms': round(a * 1000, 1), 'p99_ms': round(b * 1000, 1), 'max_ms': round(c * 1000, 1)}
+                            for ts, a, b, c in self.minutes],
+                'slow_threshold_ms': round(self.slow_threshold * 1000), 'slow_recent': list(self.slow_log)[-20:],
+                'slow_top': self.top_slow()}
@@ -0,0 +1,112 @@
+"""머슴포커 — 서버 계측 (카운터/게이지/히스토그램 → Prometheus 텍스트 포맷)"""
+import time
+
+REGISTRY = []
+# 초 단위 기본 버킷 (1ms ~ 5s)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144)
+
+def _esc(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _lbl(names, values, extra=''):
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+def _num(v):
+    return str(int(v)) if isinstance(v, int) or (isinstance(v, float) and v.is_integer()) else repr(v)
+
+class Counter:
+    """단조 증가 카운터. inc(*라벨값, n=1) — 핫패스는 dict 갱신 1회"""
+    __slots__ = ('name', 'help', 'labels', 'values')
+    kind = 'counter'
+    def __init__(self, name, help, labels=()):
+        self.name = name; self.help = help; self.labels = labels; self.values = {}
+        REGISTRY.append(self)
+    def inc(self, *lv, n=1):
+        self.values[lv] = self.values.get(lv, 0) + n
+    def remove(self, *prefix):
+        """앞쪽 라벨값이 prefix인 시리즈 삭제 (테이블 제거 시 — 라벨 카디널리티 상한)"""
+        k = len(prefix)
+        for lv in [lv for lv in self.values if lv[:k] == prefix]: del self.values[lv]
+    def render(self):
+        for lv, v in self.values.items(): yield f'{self.name}{_lbl(self.labels, lv)} {_num(v)}'
+
+class Gauge:
+    """현재값 게이지. fn 지정 시 스크레이프 시점에 {라벨값 튜플: 값} 수집"""
+    __slots__ = ('name', 'help', 'labels', 'values', 'fn')
+    kind = 'gauge'
+    def __init__(self, name, help, labels=(), fn=None):
+        self.name = name; self.help = help; self.labels = labels; self.values = {}; self.fn = fn
+        REGISTRY.append(self)
+    def set(self, v, *lv):
+        self.values[lv] = v
+    def render(self):
+        vals = self.values
+        if self.fn:
+            try: vals = self.fn()
+            except Exception as e: print(f"⚠️ METRICS_GAUGE_ERR {self.name} {e}", flush=True); vals = {}
+        for lv, v in vals.items(): yield f'{self.name}{_lbl(self.labels, lv)} {_num(v)}'
+
+class Histogram:
+    """고정 버킷 히스토그램 (라벨 조합별 누적 전 카운트 저장, 렌더 시 누적)"""
+    __slots__ = ('name', 'help', 'labels', 'buckets', 'series')
+    kind = 'histogram'
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name; self.help = help; self.labels = labels; self.buckets = buckets; self.series = {}
+        REGISTRY.append(self)
+    def observe(self, v, *lv):
+        s = self.series.get(lv)
+        if s is None: s = self.series[lv] = [[0] * (len(self.buckets) + 1), 0, 0.0, 0.0]  # counts, n, sum, max
+        b = self.buckets; i = 0
+        while i < len(b) and v > b[i]: i += 1
+        s[0][i] += 1; s[1] += 1; s[2] += v
+        if v > s[3]: s[3] = v
+    def quantile(self, q, *lv):
+        """버킷 상한 기준 근사 분위수"""
+        s = self.series.get(lv)
+        if not s or not s[1]: return 0
+        need = q * s[1]; acc = 0
+        for i, c in enumerate(s[0]):
+            acc += c
+            if acc >= need: return self.buckets[i] if i < len(self.buckets) else s[3]
+        return s[3]
+    def snapshot(self, *lv, scale=1000):
+        """JSON용 요약 (기본 ms 단위)"""
+        s = self.series.get(lv)
+        if not s or not s[1]: return {'count': 0}
+        return {'count': s[1], 'avg': round(s[2] / s[1] * scale, 2), 'max': round(s[3] * scale, 1),
+                'p50': round(self.quantile(0.5, *lv) * scale, 1), 'p95': round(self.quantile(0.95, *lv) * scale, 1),
+                'p99': round(self.quantile(0.99, *lv) * scale, 1)}
+    def render(self):
+        for lv, (counts, n, total, _) in self.series.items():
+            acc = 0
+            for b, c in zip(self.buckets, counts):
+                acc += c; le = 'le="%s"' % _num(b)
+                yield f'{self.name}_bucket{_lbl(self.labels, lv, le)} {acc}'
+            le = 'le="+Inf"'
+            yield f'{self.name}_bucket{_lbl(self.labels, lv, le)} {n}'
+            yield f'{self.name}_sum{_lbl(self.labels, lv)} {_num(round(total, 6))}'
+            yield f'{self.name}_count{_lbl(self.labels, lv)} {n}'
+
+def render():
+    """전체 레지스트리 → Prometheus text exposition (v0.0.4)"""
+    out = []
+    for m in REGISTRY:
+        out.append(f'# HELP {m.name} {m.help}'); out.append(f'# TYPE {m.name} {m.kind}')
+        out.extend(m.render())
+    return ('\n'.join(out) + '\n').encode('utf-8')
+
+# ══ 공용 메트릭 ══
+START_TIME = time.time()
+http_requests = Counter('poker_http_requests_total', 'HTTP 요청 수', ('route', 'status'))
+http_latency = Histogram('poker_http_request_duration_seconds', 'HTTP 라우트별 처리 시간', ('route',))
+ws_messages_in = Counter('poker_ws_messages_in_total', 'WS 수신 메시지 수', ('table', 'type'))
+ws_frames_out = Counter('poker_ws_frames_out_total', 'WS 송신 프레임 수')
+ws_frame_bytes = Histogram('poker_ws_frame_bytes', 'WS 송신 프레임 크기', buckets=SIZE_BUCKETS)
+broadcasts = Counter('poker_broadcasts_total', '테이블 브로드캐스트 수', ('table', 'kind'))
+broadcast_bytes = Histogram('poker_broadcast_bytes', '브로드캐스트 메시지 크기', ('kind',), buckets=SIZE_BUCKETS)
+db_commit_latency = Histogram('poker_db_commit_seconds', 'SQLite commit 소요 시간')
+loop_lag = Gauge('poker_event_loop_lag_seconds', '이벤트 루프 지연 (최근 샘플)')
+Gauge('poker_uptime_seconds', '프로세스 가동 시간', fn=lambda: {(): round(time.time() - START_TIME, 1)})
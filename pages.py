@@ -89,7 +89,7 @@ python3 sample_bot.py --name "내봇" --emoji "🤖"</code></pre>
 <span class="method post">POST</span><code>/api/join</code><br>
 <span class="param">name</span> <span class="type">string</span> — 봇 닉네임 (필수)<br>
 <span class="param">emoji</span> <span class="type">string</span> — 이모지 (기본: 🤖)<br>
-<span class="param">table_id</span> <span class="type">string</span> — 테이블 ID (기본: mersoom)
+<span class="param">table_id</span> <span class="type">string</span> — 테이블 ID (기본: mersoom). <code>turbo_</code>로 시작하면 훈련용 터보 테이블 (연출·딜레이 없음, 턴 5초, NPC 상대, 파산 시 자동 리바이, 랭킹 미반영 — WS <code>your_turn</code>으로 받고 바로 응답, 속도는 <code>GET /api/turbo</code>)
 </div>
 <pre><code>curl -X POST /api/join \
   -H "Content-Type: application/json" \
@@ -337,6 +337,7 @@ buy_in 생략 시 잔고에서 방 최대치까지 자동 차감. <b>auth_id + p
 <span class="method get">GET</span><code>/api/ranked/rooms</code> — 방 목록 (접속자 수, 상태)<br>
 <span class="method post">POST</span><code>/api/ranked/balance</code> — 잔고 조회<br>
 <span class="method get">GET</span><code>/api/ranked/leaderboard</code> — 순수익 기준 랭킹<br>
+<span class="param">season</span>(all|current|S26.01), <span class="param">limit</span>(≤100), <span class="param">cursor</span>(응답의 next_cursor로 다음 페이지)<br>
 <span class="method post">POST</span><code>/api/ranked/withdraw</code> — 출금 (머슴포인트로 환전)<br>
 <span class="param">auth_id</span>, <span class="param">password</span>, <span class="param">amount</span><br>
 <span class="method post">POST</span><code>/api/ranked/deposit-request</code> — 입금 요청 등록<br>
@@ -2483,20 +2484,35 @@ function refreshUI(){
   // re-render state if available
   if(window._lastState)render(window._lastState);
   loadTables();loadLobbyRanking();
+  if(_lobbyES)startLobbyStream();  // 스트림 언어 전환
   // update doc/ranking links with lang param
   document.querySelectorAll('a[href^="/docs"],a[href^="/ranking"]').forEach(a=>{const u=new URL(a.href);u.searchParams.set('lang',lang);a.href=u.toString()});
 }
 
 
+// Lobby SSE: 서버가 변경 시에만 통합 스냅샷 푸시 (끊기면 기존 폴링으로 폴백)
+var _lobbyES=null,_lobbySnap=null,_lobbyLive=false,_lobbyFellBack=false;
+function lobbyPoll(fn,ms){setInterval(()=>{if(!_lobbyLive)fn()},ms)}
+function lobbyRefresh(){loadTables();loadLobbyRanking();loadLobbyHighlights();loadCasinoFloor();loadLobbyAgents();loadTodayHighlight();checkJoinBadge()}
+function startLobbyStream(){
+if(!window.EventSource){lobbyRefresh();return}
+if(_lobbyES)_lobbyES.close();
+const es=_lobbyES=new EventSource(`/api/lobby/stream?lang=${lang}`);
+es.onerror=()=>{_lobbyLive=false;if(!_lobbySnap&&!_lobbyFellBack){_lobbyFellBack=true;lobbyRefresh()}};
+es.addEventListener('lobby',e=>{let s;try{s=JSON.parse(e.data)}catch(_){return}
+_lobbyLive=true;_lobbySnap=s;
+loadTables({games:s.games});loadLobbyRanking({leaderboard:s.ranking});
+loadLobbyHighlights({highlights:s.highlights});loadTodayHighlight({highlights:s.highlights});
+loadCasinoFloor(s.world);loadLobbyAgents({players:s.players});checkJoinBadge({players:s.players})})}
 var _lobbyTab='practice';
 function switchLobbyTab(tab){
 _lobbyTab=tab;
 document.querySelectorAll('.lobby-tab').forEach(b=>{b.classList.toggle('active',b.dataset.tab===tab)});
-loadTables();
+loadTables(_lobbySnap?{games:_lobbySnap.games}:undefined);
 }
-async function loadTables(){
+async function loadTables(pre){
 const tl=document.getElementById('table-list');
-try{const r=await fetch('/api/games');const d=await r.json();
+try{const d=pre||await (await fetch('/api/games')).json();
 if(!d.games||d.games.length===0){tl.innerHTML=`<div style="color:#666">${t('noTables')}</div>`;return}
 const practice=d.games.filter(g=>g.mode==='practice');
 const ranked=d.games.filter(g=>g.mode==='ranked');
@@ -2519,9 +2535,9 @@ html+=`<div class="tbl-card tbl-ranked${g.id===tableId?' active':''}${g.locked?'
 })}else{html=`<div style="color:#666">${lang==='en'?'No ranked tables':'머슴 테이블 없음'}</div>`}
 }
 tl.innerHTML=html}catch(e){tl.innerHTML=`<div style="color:#f44">${t('loadFail')}</div>`}}
-loadTables();setInterval(loadTables,5000);
-async function loadLobbyRanking(){
-try{const r=await fetch(`/api/leaderboard?lang=${lang}`);const d=await r.json();
+lobbyPoll(loadTables,5000);
+async function loadLobbyRanking(pre){
+try{const d=pre||await (await fetch(`/api/leaderboard?lang=${lang}`)).json();
 const tb=document.getElementById('lobby-lb');if(!d.leaderboard||!d.leaderboard.length){tb.innerHTML=`<tr><td colspan="7" style="text-align:center;padding:15px;color:#666">${t('noLegends')}</td></tr>`;return;}
 tb.innerHTML='';d.leaderboard.slice(0,10).forEach((p,i)=>{
 const tr=document.createElement('tr');tr.style.borderBottom='1px solid #1a1e2e';
@@ -2532,12 +2548,12 @@ const newBadge=p.hands<20?'<span style="color:#888;font-size:0.75em"> 🆕</span
 const bdg=(p.badges||[]).join(' ');
 tr.innerHTML=`<td style="padding:6px 8px;text-align:center;font-weight:bold">${medal}</td><td style="padding:6px 8px;font-weight:bold">${esc(p.name)}${newBadge} ${bdg}</td><td style="padding:6px 8px;text-align:center;color:${wrc};font-weight:bold">${wr}%</td><td style="padding:6px 8px;text-align:center;color:#5EC4A0">${p.wins}</td><td style="padding:6px 8px;text-align:center;color:#DC5656">${p.losses}</td><td style="padding:6px 8px;text-align:center;color:#888">${p.hands}</td><td style="padding:6px 8px;text-align:center;color:#E8B84A">${p.chips_won.toLocaleString()}</td>`;
 tb.appendChild(tr)})}catch(e){}}
-loadLobbyRanking();setInterval(loadLobbyRanking,30000);
+lobbyPoll(loadLobbyRanking,30000);
 
 // Lobby highlights
-async function loadLobbyHighlights(){
+async function loadLobbyHighlights(pre){
 const el=document.getElementById('lobby-highlights');if(!el)return;
-try{const r=await fetch('/api/highlights?table_id=mersoom&limit=5');const d=await r.json();
+try{const d=pre||await (await fetch('/api/highlights?table_id=mersoom&limit=5')).json();
 if(!d.highlights||!d.highlights.length){el.innerHTML=`<div style="color:var(--text-muted);text-align:center;padding:8px">🎬 아직 하이라이트 없음</div>`;return}
 el.innerHTML='';d.highlights.slice(0,5).forEach(h=>{
 const ico={bigpot:'💰',rarehand:'🃏',allin_showdown:'🔥'}[h.type]||'🎬';
@@ -2613,7 +2629,7 @@ function pickPOI(npc){
   return candidates[Math.floor(Math.random()*candidates.length)];
 }
 
-async function loadCasinoFloor(){
+async function loadCasinoFloor(pre){
   const el=document.getElementById('floor-agents');if(!el)return;
   // Render zone light pools + POI furniture sprites
   const poiLayer=document.getElementById('poi-layer');
@@ -2660,7 +2676,7 @@ async function loadCasinoFloor(){
     });
   }
   try{
-    const r=await fetch('/api/lobby/world');const d=await r.json();
+    const d=pre||await (await fetch('/api/lobby/world')).json();
     const all=[...(d.live||[]),...(d.ghosts||[])].slice(0,16);
     if(!all.length)return;
     const fc=document.getElementById('floor-count');if(fc)fc.textContent=d.total_agents||all.length;
@@ -2778,7 +2794,7 @@ function tickFloor(){
     }
   });
 }
-loadCasinoFloor();setInterval(tickFloor,2000);setInterval(loadCasinoFloor,30000);
+setInterval(tickFloor,2000);lobbyPoll(loadCasinoFloor,30000);
 
 // === POI Interaction System (v3.15) ===
 function poiInteract(poi){
@@ -3143,9 +3159,9 @@ document.getElementById('banner-body').innerHTML=_bannerPick.body;
 _tele.banner_variant=_bannerPick.id;_tele.banner_impression=1;
 
 // Lobby agent profiles
-async function loadLobbyAgents(){
+async function loadLobbyAgents(pre){
 const el=document.getElementById('lobby-agents');if(!el)return;
-try{const r=await fetch('/api/state?table_id=mersoom&spectator=lobby');const d=await r.json();
+try{const d=pre||await (await fetch('/api/state?table_id=mersoom&spectator=lobby')).json();
 if(!d.players||!d.players.length){el.innerHTML=`<div style="color:var(--text-muted);text-align:center;padding:8px">봇 없음</div>`;return}
 el.innerHTML='';d.players.forEach(p=>{
 const div=document.createElement('div');
@@ -3158,27 +3174,28 @@ const latency=p.latency_ms!=null?`<span style="color:var(--accent-blue);font-siz
 div.innerHTML=`<div style="display:flex;justify-content:space-between;align-items:center"><span><b>${status} ${esc(p.name)}</b><span style="color:var(--text-muted);font-size:0.85em">${meta}</span></span>${latency}</div><div style="font-size:0.85em;color:var(--text-secondary)">💰 ${p.chips}pt${p.style?' · '+esc(p.style):''}</div>`;
 div.onclick=()=>showProfile(p.name);
 el.appendChild(div)})}catch(e){}}
-loadLobbyAgents();setInterval(loadLobbyAgents,10000);
+lobbyPoll(loadLobbyAgents,10000);
 
 // Today's highlight badge
-async function loadTodayHighlight(){
+async function loadTodayHighlight(pre){
 const el=document.getElementById('lobby-today-highlight');if(!el)return;
-try{const r=await fetch('/api/highlights?table_id=mersoom&limit=3');const d=await r.json();
+try{const d=pre||await (await fetch('/api/highlights?table_id=mersoom&limit=3')).json();
 if(!d.highlights||!d.highlights.length){el.style.display='none';return}
 const h=d.highlights[0];const ico={bigpot:'💰',rarehand:'🃏',allin_showdown:'⚔️'}[h.type]||'🔥';
 el.innerHTML=`${ico} <b>${esc(h.winner)}</b> +${h.pot}pt — <span style="text-decoration:underline;cursor:pointer">핸드 #${h.hand} ▶</span>`;
 el.style.display='block';el.style.cursor='pointer';
 el.onclick=function(){watch();setTimeout(function(){loadHand(h.hand)},2000)}}catch(e){el.style.display='none'}}
-loadTodayHighlight();setInterval(loadTodayHighlight,30000);
+lobbyPoll(loadTodayHighlight,30000);
 
 // Join badge check (show if my bot is in a live game)
-function checkJoinBadge(){
+function checkJoinBadge(pre){
 const badge=document.getElementById('lobby-join-badge');if(!badge)return;
 const myBot=localStorage.getItem('poker_bot_name');
 if(!myBot){badge.style.display='none';return}
-fetch('/api/state?table_id=mersoom&spectator=lobby').then(r=>r.json()).then(d=>{
-if(d.players&&d.players.some(p=>p.name===myBot&&!p.out)){badge.style.display='block'}else{badge.style.display='none'}}).catch(()=>{})}
-checkJoinBadge();setInterval(checkJoinBadge,15000);
+const show=d=>{if(d.players&&d.players.some(p=>p.name===myBot&&!p.out)){badge.style.display='block'}else{badge.style.display='none'}};
+if(pre){show(pre);return}
+fetch('/api/state?table_id=mersoom&spectator=lobby').then(r=>r.json()).then(show).catch(()=>{})}
+lobbyPoll(checkJoinBadge,15000);
 
 // Lobby stats
 async function loadLobbyStats(){
@@ -3187,6 +3204,7 @@ try{const r=await fetch('/api/leaderboard');const d=await r.json();
 if(d.leaderboard){const total=d.leaderboard.reduce((s,p)=>s+p.hands,0);const bots=d.leaderboard.length;const maxPot=d.leaderboard.reduce((m,p)=>Math.max(m,p.chips_won),0);
 el.textContent=`📊 총 핸드: ${total.toLocaleString()} | 참가 봇: ${bots} | 최대 획득: ${maxPot.toLocaleString()}pt`}}catch(e){}}
 loadLobbyStats();
+startLobbyStream();
 
 function join(){myName=document.getElementById('inp-name').value.trim();if(!myName){alert(t('nickAlert'));return}isPlayer=true;startGame()}
 function dismissBroadcastOverlay(){document.getElementById('broadcast-overlay').style.display='none';localStorage.setItem('seenBroadcastOverlay','1')}
@@ -0,0 +1,97 @@
+"""머슴포커 — 머슴닷컴 PoW 병렬 풀이 (프로세스 풀 분할 탐색, 첫 해 발견 시 형제 중단, 시간 예산)"""
+import hashlib, itertools, multiprocessing as mp, os, stat, threading, time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+POW_WORKERS = max(1, int(os.environ.get('POW_WORKERS', min(4, os.cpu_count() or 1))))
+POW_BLOCK = 20_000        # 워커가 한 번에 맡는 nonce 구간 (중단 플래그 확인 주기)
+POW_BUDGET_SEC = 20.0     # 기본 시간 예산
+_DONE_SLOTS = 64          # 동시 진행 가능한 풀이 작업 수 (작업 id % 슬롯)
+
+_pool = None
+_pool_mu = threading.Lock()
+_done = None              # 공유 배열: 슬롯별 완료된 작업 id (워커는 fork로 상속)
+_job_ids = itertools.count(1)
+
+def _hash_base(seed):
+    return hashlib.sha256(str(seed).encode())
+
+def solve_range(seed, prefix, start, stop, step=1):
+    """단일 프로세스 탐색 — seed 해시 상태를 복사해 nonce만 이어 붙임"""
+    base = _hash_base(seed)
+    for nonce in range(start, stop, step):
+        h = base.copy(); h.update(str(nonce).encode())
+        if h.hexdigest().startswith(prefix): return nonce
+    return None
+
+def _worker(job, seed, prefix, wid, nworkers, max_nonce, deadline):
+    """wid번째 워커: 블록 단위로 nonce 공간을 교차 분할 (블록 k*n+wid)"""
+    base = _hash_base(seed); slot = job % _DONE_SLOTS
+    for blk in range(wid * POW_BLOCK, max_nonce, nworkers * POW_BLOCK):
+        if _done[slot] == job or time.time() > deadline: return None
+        for nonce in range(blk, min(blk + POW_BLOCK, max_nonce)):
+            h = base.copy(); h.update(str(nonce).encode())
+            if h.hexdigest().startswith(prefix):
+                _done[slot] = job
+                return nonce
+    return None
+
+def _init(done):
+    """워커 초기화: fork로 상속된 리스닝/클라이언트 소켓·SQLite 파일 fd를 닫음 (파이프·공유 배열 mmap은 유지)"""
+    global _done
+    _done = done
+    try: fds = [int(f) for f in os.listdir('/proc/self/fd')]
+    except OSError: fds = range(3, 256)
+    for fd in fds:
+        if fd < 3: continue
+        try:
+            if stat.S_ISSOCK(os.fstat(fd).st_mode) or stat.S_ISREG(os.fstat(fd).st_mode): os.close(fd)
+        except OSError: pass
+
+def start():
+    """풀 생성 + 워커 프로세스 fork — 다른 스레드가 뜨기 전 기동 시 1회 (fork는 호출 스레드만 복제하므로
+    원장/저널 스레드가 잡은 lock을 자식이 물려받으면 교착). server.py는 __main__ 가드 없이 기동하므로 spawn/forkserver 불가"""
+    global _pool, _done
+    if POW_WORKERS <= 1: return
+    with _pool_mu:
+        if _pool is not None: return
+        try:
+            ctx = mp.get_context('fork')
+            _done = ctx.Array('q', _DONE_SLOTS, lock=False)
+            _pool = ProcessPoolExecutor(max_workers=POW_WORKERS, mp_context=ctx, initializer=_init, initargs=(_done,))
+            _pool.submit(time.sleep, 0).result(timeout=10)  # 첫 submit에서 워커 전부 fork (관리 스레드보다 먼저)
+        except Exception as e: print(f"⚠️ POW_POOL_START_ERR {e}", flush=True)
+
+def _get_pool():
+    """start()로 띄운 풀 — 기동 후 지연 생성은 하지 않음 (스레드 실행 중 fork 금지)"""
+    if _pool is None: raise RuntimeError('pool not started')
+    return _pool
+
+def solve(seed, prefix, max_nonce=10_000_000, budget=POW_BUDGET_SEC, workers=None):
+    """nonce(str) 또는 None. 워커 1개거나 풀 사용 불가면 현재 스레드에서 순차 탐색"""
+    n = workers or POW_WORKERS
+    if n <= 1:
+        r = solve_range(seed, prefix, 0, max_nonce)
+        return None if r is None else str(r)
+    try: pool = _get_pool()
+    except Exception as e:
+        print(f"⚠️ POW_POOL_ERR {e} — 순차 탐색", flush=True)
+        r = solve_range(seed, prefix, 0, max_nonce)
+        return None if r is None else str(r)
+    job = next(_job_ids); deadline = time.time() + budget
+    futs = {pool.submit(_worker, job, seed, prefix, i, n, max_nonce, deadline) for i in range(n)}
+    found = None
+    try:
+        while futs and found is None:
+            done, futs = wait(futs, timeout=max(0.0, deadline - time.time()) + 1, return_when=FIRST_COMPLETED)
+            if not done: break  # 예산 초과
+            for f in done:
+                r = f.result()
+                if r is not None and (found is None or r < found): found = r
+    finally:
+        _done[job % _DONE_SLOTS] = job  # 남은 형제 워커 중단
+    return None if found is None else str(found)
+
+def shutdown():
+    global _pool
+    with _pool_mu:
+        if _pool: _pool.shutdown(wait=False, cancel_futures=True); _pool = None
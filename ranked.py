@@ -1,8 +1,12 @@
 """머슴포커 — 랭크 경제 시스템 (머슴포인트 연동, 입출금, 워치독)"""
-import asyncio, hashlib, hmac, json, os, re, time, threading, datetime
+import asyncio, atexit, hashlib, hmac, json, os, re, time, threading, datetime
 from urllib.parse import parse_qs
-from db import _db
+from db import _db, connect as db_connect, DB_FILE
 from visitors import _mask_ip
+import pow_solver, sys
+from httppool import HTTPPool
+from auditlog import AuditLog
+from ledger import Ledger, credit_op, debit_op, balance_op
 
 # ══ 머슴포인트 상수 ══
 MERSOOM_API = 'https://www.mersoom.com/api'
@@ -26,17 +30,29 @@ DEPOSIT_DELETE_SEC = 86400
 DEPOSIT_POLL_INTERVAL = 60
 WATCHDOG_INTERVAL = 60
 WATCHDOG_BALANCE_SPIKE = 200
+WATCHDOG_HIGH_WITHDRAWAL = 500   # 누적 출금 알림 기준
+WATCHDOG_RECONCILE_EVERY = 10    # N회마다 전체 집계로 증분 합계 재검증
 WATCHDOG_EVENT_MAX = 100
 WATCHDOG_EVENT_KEEP = 50
 AUDIT_LOG_MAX = 10000
 AUDIT_LOG_KEEP = 5000
+AUDIT_BATCH = 50          # 버퍼가 이만큼 차면 _audit_loop 조기 flush
+AUDIT_FLUSH_SEC = 1       # 주기 flush 간격
+AUDIT_TRIM_SEC = 600      # id 구간 트림 간격 (INSERT마다 COUNT(*) 하지 않음)
+AUDIT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), 'audit_archive')
 POW_MAX_NONCE = 10_000_000
+DEPOSIT_BALANCE_TTL = 2   # 입금 확인용 하우스 잔고 캐시 (연속 join 합치기)
+_HTTP_UA = 'Python-urllib/%d.%d' % sys.version_info[:2]
 
 # 글로벌 상태
 _verified_auth_cache = {}
 _ranked_auth_map = {}
 _ranked_lock = threading.Lock()
 _withdrawing_users = set()
+_audit = AuditLog(_db, 'ranked_audit_log', _ranked_lock, AUDIT_LOG_MAX, AUDIT_LOG_KEEP, AUDIT_ARCHIVE_DIR, AUDIT_BATCH)
+atexit.register(_audit.flush)  # 종료 시 버퍼 잔여분 기록
+ledger = Ledger(db_connect, _ranked_lock)  # 코루틴용 잔고 연산 (전용 워커 스레드·전용 연결, 그룹 커밋)
+atexit.register(ledger.close)
 
 def is_ranked_table(tid):
     return tid in RANKED_ROOMS
@@ -95,8 +111,15 @@ def _mersoom_headers(with_pow=False):
          'X-Mersoom-Password': MERSOOM_PASSWORD}
     return h
 
-def _mersoom_pow():
-    """PoW 챌린지 풀기"""
+# ── PoW: 프로세스 풀 병렬 풀이 (pow_solver.py) + 선택적 사전 풀이 ──
+POW_PRESOLVE = int(os.environ.get('MERSOOM_POW_PRESOLVE', '0'))  # 미리 풀어둘 챌린지 수 (0=끔)
+POW_PRESOLVE_TTL = int(os.environ.get('MERSOOM_POW_PRESOLVE_TTL', '60'))  # 사전 풀이 유효 시간(초)
+_pow_stash = []  # [(token, nonce, solved_at)]
+_pow_stash_mu = threading.Lock()
+_pow_refilling = threading.Event()
+
+def _mersoom_pow_fresh():
+    """챌린지 발급 + 병렬 풀이"""
     try:
         status, data = _http_request(f'{MERSOOM_API}/challenge', method='POST')
         if status != 200:
@@ -105,35 +128,86 @@ def _mersoom_pow():
         seed = data['challenge']['seed']
         prefix = data['challenge']['target_prefix']
         token = data['token']
-        nonce = 0
-        while nonce < POW_MAX_NONCE:
-            if hashlib.sha256(f'{seed}{nonce}'.encode()).hexdigest().startswith(prefix):
-                return token, str(nonce)
-            nonce += 1
+        nonce = pow_solver.solve(seed, prefix, POW_MAX_NONCE)
+        if nonce is not None: return token, nonce
+        print(f"[MERSOOM] PoW not found (max {POW_MAX_NONCE}, budget {pow_solver.POW_BUDGET_SEC}s)", flush=True)
     except Exception as e:
         print(f"[MERSOOM] PoW failed: {e}", flush=True)
     return None, None
 
+def _pow_refill():
+    """사전 풀이 스태시 보충 (백그라운드 스레드, 중복 실행 방지)"""
+    if not POW_PRESOLVE or _pow_refilling.is_set(): return
+    _pow_refilling.set()
+    def run():
+        try:
+            while True:
+                with _pow_stash_mu:
+                    now = time.time()
+                    _pow_stash[:] = [x for x in _pow_stash if now - x[2] < POW_PRESOLVE_TTL]
+                    if len(_pow_stash) >= POW_PRESOLVE: return
+                token, nonce = _mersoom_pow_fresh()
+                if not token: return
+                with _pow_stash_mu: _pow_stash.append((token, nonce, time.time()))
+        finally: _pow_refilling.clear()
+    threading.Thread(target=run, daemon=True, name='pow-presolve').start()
+
+def _pow_start():
+    """기동 시 (스레드 시작 전, 메인 스레드): 풀 프로세스 미리 fork"""
+    pow_solver.start()
+
+def _pow_warm():
+    """기동 후: 사전 풀이 채우기"""
+    _pow_refill()
+
+def _mersoom_pow():
+    """PoW 토큰/nonce — 유효한 사전 풀이가 있으면 즉시 사용, 없으면 새로 풀이"""
+    got = None
+    with _pow_stash_mu:
+        now = time.time()
+        while _pow_stash:
+            token, nonce, ts = _pow_stash.pop(0)
+            if now - ts < POW_PRESOLVE_TTL: got = (token, nonce); break
+    _pow_refill()
+    return got or _mersoom_pow_fresh()
+
+_mersoom_pool = HTTPPool()  # MERSOOM_API keep-alive 연결 재사용
+
 def _http_request(url, method='GET', headers=None, body=None, timeout=10):
-    """stdlib urllib로 HTTP 요청"""
-    import urllib.request, urllib.error
-    req = urllib.request.Request(url, method=method)
-    if headers:
-        for k, v in headers.items():
-            req.add_header(k, v)
+    """keep-alive 풀로 HTTP 요청 → (status, JSON) / 4xx·5xx는 (status, 본문 문자열) / 연결 실패는 (0, 사유)"""
+    h = {'User-Agent': _HTTP_UA}
+    if headers: h.update(headers)
     data = None
     if body is not None:
         data = json.dumps(body).encode('utf-8') if isinstance(body, dict) else body
-        if not any(k.lower() == 'content-type' for k in (headers or {})):
-            req.add_header('Content-Type', 'application/json')
+        if not any(k.lower() == 'content-type' for k in h):
+            h['Content-Type'] = 'application/json'
     try:
-        with urllib.request.urlopen(req, data=data, timeout=timeout) as resp:
-            return resp.status, json.loads(resp.read().decode('utf-8'))
-    except urllib.error.HTTPError as e:
-        return e.code, e.read().decode('utf-8', errors='replace')
+        status, raw = _mersoom_pool.request(url, method, h, data, timeout)
+        if status >= 400: return status, raw.decode('utf-8', errors='replace')
+        return status, json.loads(raw.decode('utf-8'))
     except Exception as e:
         return 0, str(e)
 
+# ── 하우스(dolsoe) 잔고: 짧은 TTL 캐시 + 동시 요청 1회로 합치기 ──
+HOUSE_BALANCE_TTL = 5  # 초
+_house_bal = {'ts': 0.0, 'data': None}
+_house_bal_mu = threading.Lock()
+
+def mersoom_house_balance(max_age=HOUSE_BALANCE_TTL):
+    """dolsoe /points/me → (status, data). max_age 내 성공 응답 재사용, 동시 호출은 lock 대기 후 캐시 적중"""
+    with _house_bal_mu:
+        if _house_bal['data'] is not None and time.time() - _house_bal['ts'] <= max_age:
+            return 200, _house_bal['data']
+        h = {'X-Mersoom-Auth-Id': MERSOOM_AUTH_ID, 'X-Mersoom-Password': MERSOOM_PASSWORD}
+        status, data = _http_request(f'{MERSOOM_API}/points/me', headers=h)
+        if status == 200 and isinstance(data, dict):
+            _house_bal['ts'] = time.time(); _house_bal['data'] = data
+        return status, data
+
+def _house_balance_invalidate():
+    with _house_bal_mu: _house_bal['data'] = None
+
 # ── 입금 요청 큐 (잔고 폴링 방식, DB 영속화) ──
 _last_mersoom_balance = None  # 마지막으로 확인한 dolsoe 잔고
 
@@ -173,15 +247,10 @@ def _deposit_request_cleanup():
         _deposit_cleanup_inner()
 
 def _ranked_audit_inner(db, event, auth_id, amount, balance_before=None, balance_after=None, details='', ip=''):
-    """감사 로그 기록 (lock 안에서 호출 — lock 미포함, db 인자 필요)"""
+    """감사 로그 기록 (lock 안에서 호출 — 버퍼에만 추가, flush는 _audit_loop가 executor에서)"""
     try:
-        db.execute("INSERT INTO ranked_audit_log(ts, event, auth_id, amount, balance_before, balance_after, details, ip) VALUES(?,?,?,?,?,?,?,?)",
-            (time.time(), event, auth_id, amount, balance_before or 0, balance_after or 0, details, _mask_ip(ip) if ip else ''))
-        db.commit()
-        count = db.execute("SELECT COUNT(*) FROM ranked_audit_log").fetchone()[0]
-        if count > AUDIT_LOG_MAX:
-            db.execute("DELETE FROM ranked_audit_log WHERE id IN (SELECT id FROM ranked_audit_log ORDER BY ts ASC LIMIT ?)", (count - AUDIT_LOG_KEEP,))
-            db.commit()
+        if _audit.append((time.time(), event, auth_id, amount, balance_before or 0, balance_after or 0, details, _mask_ip(ip) if ip else '')):
+            _audit_kick()
     except Exception as e:
         print(f"[AUDIT] inner log error: {e}", flush=True)
 
@@ -191,8 +260,7 @@ def mersoom_check_deposits():
     global _last_mersoom_balance
     try:
         # HTTP 호출은 lock 밖에서 (네트워크 I/O 중 lock 잡으면 다른 DB 작업 블로킹)
-        h = {'X-Mersoom-Auth-Id': MERSOOM_AUTH_ID, 'X-Mersoom-Password': MERSOOM_PASSWORD}
-        status, data = _http_request(f'{MERSOOM_API}/points/me', headers=h)
+        status, data = mersoom_house_balance(DEPOSIT_BALANCE_TTL)
         if status != 200:
             print(f"[MERSOOM] balance check failed: {status} {data}", flush=True)
             return
@@ -285,6 +353,7 @@ def mersoom_withdraw(to_auth_id, amount):
         status, data = _http_request(f'{MERSOOM_API}/points/transfer', method='POST', headers=h,
             body={'to_auth_id': to_auth_id, 'amount': amount, 'message': f'머슴포커 환전 ({amount}pt)'}, timeout=15)
         if status == 200:
+            _house_balance_invalidate()  # 하우스 잔고 변동 → 다음 입금 확인은 새로 조회
             # DB에 출금 기록
             with _ranked_lock:
                 db = _db()
@@ -302,68 +371,120 @@ def mersoom_withdraw(to_auth_id, amount):
         return False, 'internal_error'
 
 def ranked_deposit(auth_id, amount):
-    """ranked 잔고에서 칩 차감 (게임 입장 시) — 원자적 차감"""
+    """ranked 잔고에서 칩 차감 (게임 입장 시) — 원자적 차감. 코루틴에서는 await ledger.ranked_deposit()"""
     with _ranked_lock:
         db = _db()
-        # 원자적 차감: WHERE balance >= ? 로 잔고 부족 시 업데이트 자체가 안 됨
-        cur = db.execute("UPDATE ranked_balances SET balance=balance-?, updated_at=strftime('%s','now') WHERE auth_id=? AND balance>=?",
-            (amount, auth_id, amount))
+        ok, bal = debit_op(db, auth_id, amount)
         db.commit()
-        if cur.rowcount == 0:
-            # 차감 실패: 잔고 부족 or 계정 없음
-            row = db.execute("SELECT balance FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()
-            return False, row[0] if row else 0
-        new_bal = db.execute("SELECT balance FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()[0]
-        return True, new_bal
+        return ok, bal
 
 def ranked_credit(auth_id, amount):
-    """ranked 잔고에 칩 추가 (게임 승리/퇴장 시)"""
+    """ranked 잔고에 칩 추가 (게임 승리/퇴장 시). 코루틴에서는 await ledger.ranked_credit()"""
     with _ranked_lock:
         db = _db()
-        db.execute("""INSERT INTO ranked_balances(auth_id, balance, total_deposited, updated_at)
-            VALUES(?, ?, 0, strftime('%s','now'))
-            ON CONFLICT(auth_id) DO UPDATE SET balance=balance+?, updated_at=strftime('%s','now')""",
-            (auth_id, amount, amount))
+        credit_op(db, auth_id, amount)
         db.commit()
 
 def ranked_balance(auth_id):
     """잔고 조회"""
+    with _ranked_lock:
+        return balance_op(_db(), auth_id)
+
+def ranked_crash_recover():
+    """크래시 복구 (기동 시 1회): ranked_ingame 미정산 칩과 withdraw_pending 미완료 출금을
+    계정별로 합산해 한 트랜잭션에서 일괄 환원 → [(event, auth_id, name, amount, 잔고, detail)]"""
     with _ranked_lock:
         db = _db()
-        row = db.execute("SELECT balance FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()
-        return row[0] if row else 0
+        db.execute("CREATE TABLE IF NOT EXISTS withdraw_pending(id TEXT PRIMARY KEY, auth_id TEXT, amount INT, created_at REAL)")
+        ingame = db.execute("SELECT auth_id, name, chips, table_id FROM ranked_ingame WHERE chips > 0").fetchall()
+        pending = db.execute("SELECT auth_id, amount, id FROM withdraw_pending").fetchall()
+        items = [('crash_recovery', a, n, c, f'table:{t} name:{n}') for a, n, c, t in ingame] + \
+                [('withdraw_crash_recovery', a, a, amt, f'pending_id:{wid}') for a, amt, wid in pending if amt > 0]
+        if not items:
+            db.execute("DELETE FROM ranked_ingame"); db.commit()
+            return []
+        totals = {}
+        for _, a, _, amt, _ in items: totals[a] = totals.get(a, 0) + amt
+        before = dict(db.execute("""SELECT auth_id, balance FROM ranked_balances WHERE auth_id IN
+            (SELECT auth_id FROM ranked_ingame UNION SELECT auth_id FROM withdraw_pending)""").fetchall())
+        db.executemany("""INSERT INTO ranked_balances(auth_id, balance, total_deposited, updated_at)
+            VALUES(?, ?, 0, strftime('%s','now'))
+            ON CONFLICT(auth_id) DO UPDATE SET balance=balance+excluded.balance, updated_at=strftime('%s','now')""",
+            list(totals.items()))
+        db.execute("DELETE FROM ranked_ingame")
+        db.execute("DELETE FROM withdraw_pending")
+        out = []
+        for ev, a, n, amt, detail in items:
+            b0 = before.get(a, 0); before[a] = b0 + amt
+            _ranked_audit_inner(db, ev, a, amt, b0, b0 + amt, detail)
+            out.append((ev, a, n, amt, b0 + amt, detail))
+        db.commit()
+    _audit.flush()
+    return out
 
 def _ranked_audit(event, auth_id, amount, balance_before=None, balance_after=None, details='', ip=''):
-    """ranked 금전 이벤트 감사 로그"""
+    """ranked 금전 이벤트 감사 로그 (버퍼 추가만 — AUDIT_BATCH 차면 _audit_loop를 깨워 executor에서 일괄 INSERT)"""
     try:
         if balance_before is None:
             balance_before = ranked_balance(auth_id)
         if balance_after is None:
             balance_after = ranked_balance(auth_id)
-        db = _db()
-        db.execute("INSERT INTO ranked_audit_log(ts, event, auth_id, amount, balance_before, balance_after, details, ip) VALUES(?,?,?,?,?,?,?,?)",
-            (time.time(), event, auth_id, amount, balance_before, balance_after, details, _mask_ip(ip) if ip else ''))
-        db.commit()
-        # 로그 상한
-        count = db.execute("SELECT COUNT(*) FROM ranked_audit_log").fetchone()[0]
-        if count > AUDIT_LOG_MAX:
-            db.execute("DELETE FROM ranked_audit_log WHERE id IN (SELECT id FROM ranked_audit_log ORDER BY ts ASC LIMIT ?)", (count - AUDIT_LOG_KEEP,))
-            db.commit()
+        if _audit.append((time.time(), event, auth_id, amount, balance_before, balance_after, details, _mask_ip(ip) if ip else '')):
+            _audit_kick()
     except Exception as e:
         print(f"[AUDIT] log error: {e}", flush=True)
 
+_audit_wake = None  # (loop, asyncio.Event) — _audit_loop가 생성
+
+def _audit_kick():
+    """버퍼가 찼을 때 _audit_loop 조기 flush 요청 (어느 스레드에서나 — 이벤트 루프에서 flush하지 않음)"""
+    if _audit_wake is None: return
+    loop, ev = _audit_wake
+    try: loop.call_soon_threadsafe(ev.set)
+    except RuntimeError: pass  # 루프 종료 중 — atexit flush
+
+async def _audit_loop():
+    """감사 로그 주기 flush(버퍼가 차면 즉시) + id 구간 트림 (트림 구간은 gzip JSONL로 보관 후 삭제)"""
+    global _audit_wake
+    loop = asyncio.get_running_loop(); last_trim = time.time()
+    ev = asyncio.Event(); _audit_wake = (loop, ev)
+    while True:
+        try: await asyncio.wait_for(ev.wait(), AUDIT_FLUSH_SEC)
+        except asyncio.TimeoutError: pass
+        ev.clear()
+        try:
+            if _audit.pending(): await loop.run_in_executor(None, _audit.flush)
+            if time.time() - last_trim >= AUDIT_TRIM_SEC:
+                last_trim = time.time()
+                await loop.run_in_executor(None, _audit.trim)
+        except Exception as e:
+            print(f"[AUDIT] loop error: {e}", flush=True)
+
+_deposit_check_fut = None
+
+async def mersoom_check_deposits_shared():
+    """입금 확인 single-flight — 진행 중인 확인이 있으면 새로 시작하지 않고 그 완료를 함께 기다림"""
+    global _deposit_check_fut
+    f = _deposit_check_fut
+    if f is None or f.done():
+        f = _deposit_check_fut = asyncio.get_running_loop().run_in_executor(None, mersoom_check_deposits)
+    await asyncio.shield(f)
+
 async def _deposit_poll_loop():
     """주기적으로 머슴닷컴 입금 확인"""
     while True:
         await asyncio.sleep(DEPOSIT_POLL_INTERVAL)
         try:
-            await asyncio.get_event_loop().run_in_executor(None, mersoom_check_deposits)
+            await mersoom_check_deposits_shared()
         except Exception as e:
             print(f"[MERSOOM] poll error: {e}", flush=True)
 
 # ══ Ranked 실시간 감시 시스템 (Watchdog) ══
 _ranked_watchdog = {
-    'last_balances': {},       # auth_id -> balance (이전 스냅샷)
+    'last_balances': {},       # auth_id -> (balance, total_deposited, total_withdrawn) 마지막으로 본 값
+    'hwm': 0.0,                # 변경 피드 high-water mark (ranked_balances.updated_at)
+    'totals': None,            # [SUM(balance), SUM(total_deposited), SUM(total_withdrawn), COUNT(*)] 증분 유지
+    'checks': 0,
     'suspicious_events': [],   # 최근 의심 이벤트 (최대 100건)
     'hourly_stats': {},        # auth_id -> {deposits, withdrawals, hands, wins, net}
     'last_house_balance': None,  # dolsoe 잔고 추적
@@ -375,6 +496,17 @@ def set_tables_ref(t):
     global _tables_ref
     _tables_ref = t
 
+_alert_fn = None  # server.py에서 set_alert_fn(_emit_alert)로 주입
+
+def set_alert_fn(fn):
+    global _alert_fn
+    _alert_fn = fn
+
+def _ranked_totals(db):
+    """ranked_balances 전체 집계 1회 → (잔고 합, 입금 합, 출금 합, 계정 수, 잔고>0 계정 수)"""
+    return db.execute("""SELECT COALESCE(SUM(balance),0), COALESCE(SUM(total_deposited),0), COALESCE(SUM(total_withdrawn),0),
+        COUNT(*), COALESCE(SUM(balance > 0),0) FROM ranked_balances""").fetchone()
+
 def _ranked_watchdog_check():
     """ranked 이상 거래 탐지 (60초마다 호출)"""
     global tables
@@ -384,36 +516,43 @@ def _ranked_watchdog_check():
         now = time.time()
         alerts = []
 
-        # 1. 잔고 급변 감지: 1분 내 200pt 이상 변동
-        rows = db.execute("SELECT auth_id, balance FROM ranked_balances").fetchall()
-        for auth_id, balance in rows:
-            prev = _ranked_watchdog['last_balances'].get(auth_id, balance)
-            delta = balance - prev
+        wd = _ranked_watchdog; last = wd['last_balances']
+        first = wd['hwm'] == 0.0
+        # 변경 피드: 마지막 확인 이후 updated_at이 바뀐 계정만 (초 단위라 경계 초는 >=로 재확인 — 증분은 마지막 값 대비라 중복 무해)
+        changed = db.execute("SELECT auth_id, balance, total_deposited, total_withdrawn, updated_at FROM ranked_balances WHERE updated_at >= ?",
+            (wd['hwm'],)).fetchall()
+        totals = wd['totals']; hwm = wd['hwm']
+        for auth_id, balance, dep, wdn, ts in changed:
+            prev = last.get(auth_id)
+            p_bal, p_dep, p_wdn = prev or (balance, 0, 0)
+            # 1. 잔고 급변 감지: 1분 내 200pt 이상 변동
+            delta = balance - p_bal
             if abs(delta) >= WATCHDOG_BALANCE_SPIKE:
                 alerts.append(('WARN', 'balance_spike',
-                    f'{auth_id} 잔고 급변: {prev}→{balance} (Δ{delta:+d}pt)',
-                    {'auth_id': auth_id, 'prev': prev, 'now': balance, 'delta': delta}))
-            _ranked_watchdog['last_balances'][auth_id] = balance
-
-        # 2. 출금 폭주: 5분 내 동일 계정 3회 이상 출금
-        recent_withdrawals = db.execute(
-            "SELECT auth_id, COUNT(*) as cnt, SUM(amount) as total FROM ranked_transfers "
-            "WHERE transfer_id LIKE 'balance_poll:%' AND created_at > ? GROUP BY auth_id",
-            (str(int(now - 300)),)).fetchall()
-        # ranked_transfers에는 입금만 있음. 출금은 별도 추적 필요
-        # → total_withdrawn 변동으로 추적
-        for auth_id, balance in rows:
-            row = db.execute("SELECT total_withdrawn FROM ranked_balances WHERE auth_id=?", (auth_id,)).fetchone()
-            if row and row[0] > 500:  # 총 출금 500pt 이상
+                    f'{auth_id} 잔고 급변: {p_bal}→{balance} (Δ{delta:+d}pt)',
+                    {'auth_id': auth_id, 'prev': p_bal, 'now': balance, 'delta': delta}))
+            # 2. 누적 출금 500pt 이상 — 출금액이 바뀐 계정만 (초기 스캔은 기준점만)
+            if wdn > WATCHDOG_HIGH_WITHDRAWAL and wdn != p_wdn and not first:
                 alerts.append(('INFO', 'high_withdrawal',
-                    f'{auth_id} 누적 출금: {row[0]}pt',
-                    {'auth_id': auth_id, 'total_withdrawn': row[0]}))
+                    f'{auth_id} 누적 출금: {wdn}pt',
+                    {'auth_id': auth_id, 'total_withdrawn': wdn}))
+            if totals:
+                if prev is None: totals[3] += 1; p_bal = 0
+                totals[0] += balance - p_bal; totals[1] += dep - p_dep; totals[2] += wdn - p_wdn
+            last[auth_id] = (balance, dep, wdn)
+            if ts and ts > hwm: hwm = ts
+        wd['hwm'] = max(hwm, 1.0)
+        wd['checks'] += 1
+        if totals is None or wd['checks'] % WATCHDOG_RECONCILE_EVERY == 0:
+            fresh = list(_ranked_totals(db))[:4]
+            if totals and fresh != totals:
+                print(f"[WATCHDOG] 증분 합계 보정: {totals} → {fresh}", flush=True)
+            wd['totals'] = totals = fresh
 
         # 3. 하우스 잔고 감시 (dolsoe 머슴 포인트)
         if MERSOOM_AUTH_ID and MERSOOM_PASSWORD:
             try:
-                h = {'X-Mersoom-Auth-Id': MERSOOM_AUTH_ID, 'X-Mersoom-Password': MERSOOM_PASSWORD}
-                status, data = _http_request(f'{MERSOOM_API}/points/me', headers=h)
+                status, data = mersoom_house_balance()
                 if status == 200:
                     house_bal = int(data.get('points', 0))
                     prev_house = _ranked_watchdog['last_house_balance']
@@ -431,8 +570,8 @@ def _ranked_watchdog_check():
             t = tables.get(tid)
             if t:
                 for s in t.seats:
-                    aid = s.get('_auth_id')
-                    if aid and not s.get('out'):
+                    aid = s._auth_id
+                    if aid and not s.out:
                         if aid in auth_tables:
                             alerts.append(('CRIT', 'multi_table',
                                 f'{aid} 다중 테이블 감지: {auth_tables[aid]}, {tid}',
@@ -440,14 +579,12 @@ def _ranked_watchdog_check():
                         auth_tables[aid] = tid
 
         # 5. 총 유통량 검증: sum(balance) + sum(ingame chips) ≤ sum(total_deposited)
-        total_balance = db.execute("SELECT COALESCE(SUM(balance),0) FROM ranked_balances").fetchone()[0]
-        total_deposited = db.execute("SELECT COALESCE(SUM(total_deposited),0) FROM ranked_balances").fetchone()[0]
-        total_withdrawn = db.execute("SELECT COALESCE(SUM(total_withdrawn),0) FROM ranked_balances").fetchone()[0]
+        total_balance, total_deposited, total_withdrawn = totals[:3]
         total_ingame = 0
         for tid in RANKED_ROOMS:
             t = tables.get(tid)
             if t:
-                total_ingame += sum(s['chips'] for s in t.seats if s.get('_auth_id') and not s.get('out'))
+                total_ingame += sum(s.chips for s in t.seats if s._auth_id and not s.out)
         circulating = total_balance + total_ingame
         expected_max = total_deposited - total_withdrawn
         if circulating > expected_max + 1:  # +1 반올림 허용
@@ -467,7 +604,7 @@ def _ranked_watchdog_check():
 
         # 알림 발송
         for level, key, msg, data in alerts:
-            _emit_alert(level, f'ranked_{key}', f'💰 {msg}', data)
+            if _alert_fn: _alert_fn(level, f'ranked_{key}', f'💰 {msg}', data)
             _ranked_watchdog['suspicious_events'].append({
                 'ts': now, 'level': level, 'key': key, 'msg': msg, 'data': data
             })
@@ -483,16 +620,13 @@ def _ranked_watchdog_check():
 def _ranked_watchdog_report():
     """감시 보고서 (admin API용)"""
     db = _db()
-    total_balance = db.execute("SELECT COALESCE(SUM(balance),0) FROM ranked_balances").fetchone()[0]
-    total_deposited = db.execute("SELECT COALESCE(SUM(total_deposited),0) FROM ranked_balances").fetchone()[0]
-    total_withdrawn = db.execute("SELECT COALESCE(SUM(total_withdrawn),0) FROM ranked_balances").fetchone()[0]
-    accounts = db.execute("SELECT COUNT(*) FROM ranked_balances WHERE balance > 0").fetchone()[0]
+    total_balance, total_deposited, total_withdrawn, _, accounts = _ranked_totals(db)
     pending = db.execute("SELECT COUNT(*) FROM deposit_requests WHERE status='pending'").fetchone()[0]
     total_ingame = 0
     for tid in RANKED_ROOMS:
         t = tables.get(tid)
         if t:
-            total_ingame += sum(s['chips'] for s in t.seats if s.get('_auth_id') and not s.get('out'))
+            total_ingame += sum(s.chips for s in t.seats if s._auth_id and not s.out)
     return {
         'house_balance': _ranked_watchdog['last_house_balance'],
         'total_balance': total_balance,
@@ -523,6 +657,39 @@ def get_season():
     now = datetime.datetime.now()
     return f"S{now.year % 100}.{now.month:02d}"
 
+RANKED_LB_PAGE_MAX = 100
+_SEASON_RE = re.compile(r'^S\d{2}\.\d{2}$')
+
+def ranked_balances_version():
+    """잔고 변경 버전 (ranked_balances 트리거가 증가) — 응답 캐시 키"""
+    row = _db().execute("SELECT v FROM ranked_meta WHERE k='balances'").fetchone()
+    return row[0] if row else 0
+
+def ranked_leaderboard_page(season='all', cursor='', limit=20):
+    """순수익 순 keyset 페이지 → (항목, next_cursor). season: 'all' | 'current' | 'S26.10'
+    cursor는 직전 페이지 마지막 항목의 '순수익:auth_id' (인덱스 범위 탐색, OFFSET 없음)"""
+    limit = max(1, min(RANKED_LB_PAGE_MAX, limit))
+    if season == 'current': season = get_season()
+    if season != 'all' and not _SEASON_RE.match(season): raise ValueError('season')
+    where, args = '', []
+    if cursor:
+        c_np, _, c_auth = cursor.partition(':')
+        c_np = int(c_np)
+        where = 'AND np <= ? AND (np < ? OR x.auth_id > ?)'; args = [c_np, c_np, c_auth]
+    if season == 'all':
+        sql = f"""SELECT x.auth_id, balance, total_deposited, total_withdrawn, np FROM
+            (SELECT auth_id, balance, total_deposited, total_withdrawn, net_profit AS np FROM ranked_balances) x
+            WHERE 1 {where} ORDER BY np DESC, x.auth_id LIMIT ?"""
+    else:
+        sql = f"""SELECT x.auth_id, b.balance, b.total_deposited, b.total_withdrawn, np FROM
+            (SELECT auth_id, net_profit AS np FROM ranked_season WHERE season=?) x JOIN ranked_balances b ON b.auth_id=x.auth_id
+            WHERE 1 {where} ORDER BY np DESC, x.auth_id LIMIT ?"""
+        args = [season] + args
+    rows = _db().execute(sql, args + [limit]).fetchall()
+    lb = [{'auth_id': r[0], 'balance': r[1], 'deposited': r[2], 'withdrawn': r[3], 'net_profit': r[4]} for r in rows]
+    nxt = f'{rows[-1][4]}:{rows[-1][0]}' if len(rows) == limit else None
+    return lb, nxt
+
 def get_season_info():
     now = datetime.datetime.now()
     # 이번 달 남은 일수
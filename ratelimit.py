@@ -0,0 +1,57 @@
+"""머슴포커 — 토큰 버킷 레이트 리미터 ((scope, key)별 버킷, LRU 순 OrderedDict로 O(1) 만료/축출)"""
+import os, time
+from collections import OrderedDict
+
+def parse_budgets(spec):
+    """'join=20,chat=30' → {'join': 20, 'chat': 30} (잘못된 항목은 무시)"""
+    out = {}
+    for part in (spec or '').split(','):
+        k, _, v = part.partition('=')
+        try:
+            if k.strip() and int(v) > 0: out[k.strip()] = int(v)
+        except ValueError: pass
+    return out
+
+class TokenBucketLimiter:
+    """allow(scope, key, rate) — scope별 분당 rate개 토큰 (버스트 상한 = rate, 연속 보충).
+    budgets(환경변수 RATE_LIMITS)에 scope가 있으면 호출측 rate보다 우선.
+    버킷은 마지막 사용 순서로 유지: 접근 시 move_to_end, 축출은 앞에서 popitem — 모두 O(1).
+    per초 이상 안 쓴 버킷은 가득 찬 상태와 같으므로 삭제해도 판정이 바뀌지 않음"""
+    def __init__(self, budgets=None, default=20, per=60.0, max_keys=100_000, clock=time.monotonic):
+        self.budgets = dict(budgets or {}); self.default = default; self.per = per
+        self.max_keys = max_keys; self.clock = clock
+        self._b = OrderedDict()  # (scope, key) → [tokens, last_ts]
+        self.stats = {'allowed': 0, 'denied': 0, 'expired': 0, 'evicted': 0}
+
+    def allow(self, scope, key, rate=None, cost=1):
+        rate = self.budgets.get(scope) or rate or self.default
+        k = (scope, key); now = self.clock(); b = self._b.get(k)
+        if b is None:
+            b = self._b[k] = [float(rate), now]
+        else:
+            b[0] = min(rate, b[0] + (now - b[1]) * rate / self.per); b[1] = now
+            self._b.move_to_end(k)
+        ok = b[0] >= cost
+        if ok: b[0] -= cost
+        self.stats['allowed' if ok else 'denied'] += 1
+        self._expire(now)
+        return ok
+
+    def _expire(self, now):
+        """앞(가장 오래 안 쓴 것)부터 만료/초과분만 제거 — 버킷당 한 번만 삭제되므로 분할 상환 O(1)"""
+        b = self._b
+        while b:
+            k, (_, ts) = next(iter(b.items()))
+            if now - ts >= self.per: self.stats['expired'] += 1
+            elif len(b) > self.max_keys: self.stats['evicted'] += 1
+            else: break
+            b.popitem(last=False)
+
+    def __len__(self):
+        return len(self._b)
+
+    def snapshot(self):
+        return {**self.stats, 'keys': len(self._b), 'budgets': self.budgets}
+
+# 서버 공용 리미터 (RATE_LIMITS="join=20,chat=30"으로 라우트별 예산 덮어쓰기)
+limiter = TokenBucketLimiter(parse_budgets(os.environ.get('RATE_LIMITS', '')))
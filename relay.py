@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""머슴포커 — 관전 릴레이 (게임 프로세스에서 테이블별 딜레이된 관전 프레임을 링크 1개로 받아 수천 관전 WS로 팬아웃,
+관전자 투표는 릴레이에서 집계해 주기적으로 역전달). 게임 프로세스는 테이블당 관전 소켓 1개 비용만 부담
+
+실행: POKER_ADMIN_KEY=… RELAY_UPSTREAM=127.0.0.1:8080 RELAY_PORT=8090 python3 relay.py
+관전 클라이언트는 게임 서버 대신 ws://릴레이/ws?table_id=…로 접속 (play 모드는 게임 서버 직접)"""
+import asyncio, base64, hashlib, json, os, struct, time
+from collections import deque
+from urllib.parse import parse_qs, quote, urlparse
+
+RELAY_PORT = int(os.environ.get('RELAY_PORT', 8090))
+RELAY_UPSTREAM = os.environ.get('RELAY_UPSTREAM', '127.0.0.1:8080')  # host:port 또는 유닉스 소켓 경로 (/로 시작)
+RELAY_KEY = os.environ.get('POKER_ADMIN_KEY', '')
+RELAY_MAX_VIEWERS = int(os.environ.get('RELAY_MAX_VIEWERS', 20000))  # 릴레이 전체 관전자 상한
+RELAY_SLOW_BYTES = 256 * 1024   # 관전자 송신 버퍼가 이만큼 밀리면 끊음 (느린 소비자가 메모리를 잡지 않게)
+RELAY_LINGER = 30               # 마지막 관전자가 나간 뒤 업스트림 링크 유지 (초)
+RELAY_FLUSH = 1.0               # 투표 집계/관전자 수 역전달 주기 (초)
+RELAY_PING = 15                 # 업스트림 ping 주기 (초) — 게임 서버는 30초 무수신 WS를 끊음
+REACTION_PER_SEC = 5            # 테이블당 업스트림으로 올리는 리액션 상한 (로컬 팬아웃은 제한 없음)
+WS_IDLE_TIMEOUT = 300           # 관전자 무활동 타임아웃 (5분)
+UPSTREAM_MAX_FRAME = 1 << 20    # 업스트림 관전 state 프레임 상한
+
+# ══ WebSocket 프레이밍 ══
+def ws_frame(text, mask=False):
+    """텍스트 프레임 — 팬아웃은 한 번 인코딩한 bytes를 모든 관전자에게 그대로 write. mask는 클라이언트(업스트림 링크)용"""
+    p = text.encode('utf-8'); n = len(p)
+    h = bytes([0x81]); m = 0x80 if mask else 0
+    if n < 126: h += bytes([m | n])
+    elif n < 65536: h += bytes([m | 126]) + struct.pack('>H', n)
+    else: h += bytes([m | 127]) + struct.pack('>Q', n)
+    if not mask: return h + p
+    k = os.urandom(4)
+    return h + k + bytes(b ^ k[i % 4] for i, b in enumerate(p))
+
+async def ws_read(reader, timeout=30, max_len=65536):
+    """프레임 1개 → (opcode, payload bytes) / 종료·초과·타임아웃이면 None"""
+    try:
+        h = await asyncio.wait_for(reader.readexactly(2), timeout)
+        n = h[1] & 0x7f
+        if n == 126: n = struct.unpack('>H', await asyncio.wait_for(reader.readexactly(2), 10))[0]
+        elif n == 127: n = struct.unpack('>Q', await asyncio.wait_for(reader.readexactly(8), 10))[0]
+        if n > max_len: return None
+        k = await asyncio.wait_for(reader.readexactly(4), 10) if h[1] & 0x80 else None
+        p = await asyncio.wait_for(reader.readexactly(n), 10)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError): return None
+    if k: p = bytes(b ^ k[i % 4] for i, b in enumerate(p))
+    op = h[0] & 0x0f
+    return None if op == 0x8 else (op, p)
+
+def ws_accept(key):
+    return base64.b64encode(hashlib.sha1((key + "258EAFA5-E914-47DA-95CA-5AB5A0F3CEBC").encode()).digest()).decode()
+
+# ══ 테이블 피드 ══
+feeds = {}  # table_id → Feed
+stats = {'viewers_total': 0, 'refused': 0, 'dropped_slow': 0, 'upstream_reconnects': 0}
+
+class Feed:
+    """테이블 1개: 업스트림 링크(게임 프로세스의 relay 모드 WS) + 로컬 관전자 집합 + 릴레이 투표 집계"""
+    def __init__(self, tid):
+        self.tid = tid; self.viewers = set(); self.last = None; self.hand = 0; self.seated = set()
+        self.votes = {}; self.counts = {}; self.votes_dirty = False; self.sent_viewers = -1
+        self.up = None; self.task = None; self.idle_since = time.time(); self.pinged = 0
+        self.frames = 0; self.bytes_out = 0; self._react = deque()
+
+    def add(self, w):
+        self.viewers.add(w); self.idle_since = None
+        if self.last: w.write(self.last)
+        if self.task is None or self.task.done(): self.task = asyncio.create_task(self.run())
+
+    def remove(self, w):
+        self.viewers.discard(w)
+        self.vote(id(w), None)
+        if not self.viewers: self.idle_since = time.time()
+
+    def vote(self, vid, pick):
+        """관전자 1명 표 교체 (pick=None이면 철회) → 이전 표"""
+        old = self.votes.pop(vid, None)
+        if old: self.counts[old] -= 1
+        if pick: self.votes[vid] = pick; self.counts[pick] = self.counts.get(pick, 0) + 1
+        if old != pick: self.votes_dirty = True
+        return old
+
+    def fanout(self, frame, skip=None):
+        """인코딩된 프레임을 관전자 전원에게 — drain을 기다리지 않고 버퍼 크기로 느린 관전자만 끊음"""
+        for w in list(self.viewers):
+            if w is skip: continue
+            tr = w.transport
+            if tr.is_closing(): self.viewers.discard(w); continue
+            if tr.get_write_buffer_size() > RELAY_SLOW_BYTES:
+                self.viewers.discard(w); stats['dropped_slow'] += 1; tr.abort(); continue
+            w.write(frame); self.bytes_out += len(frame)
+
+    def publish(self, text):
+        frame = ws_frame(text); self.frames += 1
+        if text.startswith('{"type": "state"'):
+            try: d = json.loads(text)
+            except ValueError: d = {}
+            self.last = frame; self.seated = {p['name'] for p in d.get('players', []) if not p.get('out')}
+            if d.get('hand', self.hand) != self.hand:  # 새 핸드 → 릴레이 표 초기화 (게임 서버와 같은 규칙)
+                self.hand = d.get('hand', 0); self.votes = {}; self.counts = {}; self.votes_dirty = False
+        self.fanout(frame)
+
+    def send_up(self, obj):
+        """→ 보냈으면 True (링크가 없으면 호출측이 변경 표시를 유지해 재접속 후 다시 보냄)"""
+        if not self.up or self.up.transport.is_closing(): return False
+        self.up.write(ws_frame(json.dumps(obj, ensure_ascii=False), mask=True)); return True
+
+    def ping_up(self):
+        if self.up and not self.up.transport.is_closing():
+            self.up.write(bytes([0x89, 0x80]) + os.urandom(4)); self.pinged = time.time()  # 클라이언트 프레임은 마스크 필수
+
+    def reaction_ok(self):
+        now = time.time(); r = self._react
+        while r and now - r[0] > 1: r.popleft()
+        if len(r) >= REACTION_PER_SEC: return False
+        r.append(now); return True
+
+    async def _connect(self):
+        if RELAY_UPSTREAM.startswith('/'): r, w = await asyncio.open_unix_connection(RELAY_UPSTREAM)
+        else:
+            host, _, port = RELAY_UPSTREAM.rpartition(':')
+            r, w = await asyncio.open_connection(host or '127.0.0.1', int(port))
+        key = base64.b64encode(os.urandom(16)).decode()
+        w.write(f"GET /ws?table_id={quote(self.tid)}&mode=relay&key={quote(RELAY_KEY)} HTTP/1.1\r\nHost: relay\r\n"
+                f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+        status = await asyncio.wait_for(r.readline(), 10)
+        while (await asyncio.wait_for(r.readline(), 10)) not in (b'\r\n', b''): pass
+        if b' 101 ' not in status: w.close(); raise ConnectionError(status.decode(errors='replace').strip())
+        return r, w
+
+    async def run(self):
+        """관전자가 있는 동안(+linger) 업스트림 링크 유지, 끊기면 백오프 재접속"""
+        backoff = 1
+        while self._wanted():
+            try:
+                r, self.up = await self._connect(); backoff = 1
+                self.sent_viewers = -1; self.votes_dirty = True; self.pinged = time.time()  # 서버는 끊긴 링크의 표·관전자 수를 버림 → 재전송
+                while self._wanted() and (f := await ws_read(r, timeout=RELAY_LINGER, max_len=UPSTREAM_MAX_FRAME)) is not None:
+                    if f[0] == 0x1: self.publish(f[1].decode('utf-8', errors='replace'))
+            except (OSError, asyncio.TimeoutError, ConnectionError, ValueError) as e:
+                print(f"⚠️ [RELAY] {self.tid} 업스트림 오류: {e}", flush=True)
+            if self.up: self.up.close(); self.up = None
+            if not self._wanted(): break
+            stats['upstream_reconnects'] += 1
+            await asyncio.sleep(backoff); backoff = min(backoff * 2, 30)
+
+    def _wanted(self):
+        return bool(self.viewers) or (self.idle_since is not None and time.time() - self.idle_since < RELAY_LINGER)
+
+async def _flush_loop():
+    """투표 집계·관전자 수를 업스트림으로 (변경분만), 업스트림 keepalive ping, 관전자 없는 피드 정리"""
+    while True:
+        await asyncio.sleep(RELAY_FLUSH)
+        now = time.time()
+        for tid, f in list(feeds.items()):
+            if f.votes_dirty and f.hand:
+                if f.send_up({'type': 'relay_votes', 'hand': f.hand, 'counts': {k: v for k, v in f.counts.items() if v > 0}}): f.votes_dirty = False
+            if f.up and len(f.viewers) != f.sent_viewers:
+                f.send_up({'type': 'relay_stats', 'viewers': len(f.viewers)}); f.sent_viewers = len(f.viewers)
+            if f.up and now - f.pinged >= RELAY_PING: f.ping_up()
+            if not f.viewers and (f.task is None or f.task.done()): del feeds[tid]
+
+# ══ 관전자 연결 ══
+async def _http(writer, status, body, ct='text/plain; charset=utf-8'):
+    b = body.encode() if isinstance(body, str) else body
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {ct}\r\nContent-Length: {len(b)}\r\nAccess-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n".encode() + b)
+    try: await writer.drain()
+    except ConnectionError: pass
+    writer.close()
+
+def snapshot():
+    return {**stats, 'viewers': sum(len(f.viewers) for f in feeds.values()),
+        'tables': {tid: {'viewers': len(f.viewers), 'link': f.up is not None, 'hand': f.hand, 'frames': f.frames,
+            'bytes_out': f.bytes_out, 'votes': len(f.votes)} for tid, f in feeds.items()}}
+
+async def handle(reader, writer):
+    try:
+        parts = (await asyncio.wait_for(reader.readline(), 10)).decode('utf-8', errors='replace').split()
+        headers = {}
+        for _ in range(50):
+            line = await asyncio.wait_for(reader.readline(), 10)
+            if line in (b'\r\n', b'\n', b''): break
+            k, _, v = line.decode('utf-8', errors='replace').partition(':'); headers[k.strip().lower()] = v.strip()
+    except (asyncio.TimeoutError, ConnectionError): writer.close(); return
+    if len(parts) < 2: writer.close(); return
+    url = urlparse(parts[1]); qs = parse_qs(url.query)
+    if url.path == '/health': await _http(writer, '200 OK', json.dumps(snapshot()), 'application/json'); return
+    if url.path != '/ws' or headers.get('upgrade', '').lower() != 'websocket': await _http(writer, '404 Not Found', '404 Not Found'); return
+    if qs.get('mode', ['spectate'])[0] == 'play': await _http(writer, '400 Bad Request', 'play mode: connect to the game server'); return
+    if sum(len(f.viewers) for f in feeds.values()) >= RELAY_MAX_VIEWERS:
+        stats['refused'] += 1; await _http(writer, '503 Service Unavailable', 'relay full'); return
+    tid = qs.get('table_id', ['mersoom'])[0][:24] or 'mersoom'
+    writer.write(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: {ws_accept(headers.get('sec-websocket-key', ''))}\r\n\r\n".encode())
+    f = feeds.get(tid) or feeds.setdefault(tid, Feed(tid))
+    f.add(writer); stats['viewers_total'] += 1
+    last = time.time()
+    try:
+        while (remaining := WS_IDLE_TIMEOUT - (time.time() - last)) > 0:
+            m = await ws_read(reader, timeout=min(30, remaining))
+            if m is None: break
+            last = time.time()
+            if m[0] == 0x9: writer.write(bytes([0x8A, 0])); continue
+            if m[0] != 0x1: continue
+            try: d = json.loads(m[1])
+            except ValueError: continue
+            if not isinstance(d, dict): continue
+            t = d.get('type')
+            if t == 'vote':
+                pick = str(d.get('pick', ''))[:20]
+                if pick in f.seated: f.vote(id(writer), pick)  # 관전자 ID는 릴레이가 부여 (클라이언트 값 무시)
+            elif t == 'reaction':
+                emoji = str(d.get('emoji', ''))[:2]
+                if not emoji: continue
+                rmsg = {'type': 'reaction', 'emoji': emoji, 'name': str(d.get('name', ''))[:10] or '관객'}
+                f.fanout(ws_frame(json.dumps(rmsg, ensure_ascii=False)), skip=writer)
+                if f.reaction_ok(): f.send_up(rmsg)  # 게임 서버는 릴레이 링크를 제외하고 방송 — 중복 없음
+            elif t == 'chat':
+                f.send_up({'type': 'chat', 'name': str(d.get('name', ''))[:10], 'msg': str(d.get('msg', ''))[:120]})
+            elif t == 'get_state' and f.last: writer.write(f.last)
+    except (ConnectionError, OSError): pass
+    finally:
+        f.remove(writer)
+        try: writer.close()
+        except Exception: pass
+
+async def main():
+    server = await asyncio.start_server(handle, '0.0.0.0', RELAY_PORT, backlog=4096)
+    print(f"📡 관전 릴레이 — ws://0.0.0.0:{RELAY_PORT}/ws ← {RELAY_UPSTREAM}", flush=True)
+    if not RELAY_KEY: print("⚠️ [RELAY] POKER_ADMIN_KEY 미설정 — 게임 서버가 릴레이 링크를 거부함", flush=True)
+    asyncio.create_task(_flush_loop())
+    async with server: await server.serve_forever()
+
+if __name__ == '__main__':
+    asyncio.run(main())
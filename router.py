@@ -0,0 +1,96 @@
+"""머슴포커 — 선언형 라우터 (method+path → handler, 라우트별 미들웨어 체인)"""
+import asyncio, contextvars, time
+from metrics import http_requests, http_latency
+
+# 핸들러가 보낸 HTTP 상태 (send_http에서 set, 라우트 계측에서 read — 연결 태스크 단위)
+response_status = contextvars.ContextVar('response_status', default=0)
+
+class RouteRequest:
+    """핸들러/미들웨어가 공유하는 요청 컨텍스트 (body는 json_body에서 한 번만 파싱)"""
+    __slots__ = ('reader', 'writer', 'method', 'path', 'route', 'qs', 'headers', 'body', 'ip', 'lang', 'json', 'table', 'ctx')
+    def __init__(self, reader, writer, method, path, route, qs, headers, body, ip, lang):
+        self.reader = reader; self.writer = writer; self.method = method; self.path = path
+        self.route = route; self.qs = qs; self.headers = headers; self.body = body
+        self.ip = ip; self.lang = lang; self.json = {}; self.table = None; self.ctx = {}
+
+class Router:
+    """정확 매칭은 dict O(1), prefix 라우트는 긴 것부터 검사. method '*'는 모든 메서드 매칭"""
+    def __init__(self):
+        self.routes = {}      # (method, path) → 체인 적용된 handler
+        self.prefixes = []    # (prefix, method, handler) — 긴 prefix 우선
+        self.labels = set()   # 계측 라벨 ('METHOD path')
+    def route(self, method, paths, *middleware, prefix=False, timed=True):
+        """@route('GET', '/api/x', mw1, mw2) — 앞에 적은 미들웨어가 바깥쪽에서 실행"""
+        if isinstance(paths, str): paths = (paths,)
+        def deco(fn):
+            h = fn
+            for mw in reversed(middleware): h = mw(h)
+            for p in paths:
+                label = f'{method} {p}{"*" if prefix else ""}'
+                hh = self._timed(h, label) if timed else h
+                if prefix:
+                    self.prefixes.append((p, method, hh)); self.prefixes.sort(key=lambda x: -len(x[0]))
+                else: self.routes[(method, p)] = hh
+            return fn
+        return deco
+    def _timed(self, h, label):
+        self.labels.add(label)
+        async def run(req):
+            response_status.set(0); t0 = time.perf_counter()
+            task = asyncio.current_task()
+            if task: task.set_name(label)  # 느린 콜백 로그에 라우트 표시
+            try: return await h(req)
+            finally:
+                http_latency.observe(time.perf_counter() - t0, label)
+                http_requests.inc(label, response_status.get() or 200)  # raw write 응답은 200으로 집계
+        return run
+    def resolve(self, method, path):
+        h = self.routes.get((method, path))
+        if h: return h
+        for p, m, hh in self.prefixes:
+            if (m == method or m == '*') and path.startswith(p): return hh
+        return self.routes.get((method, '*'))
+    async def dispatch(self, req):
+        """매칭된 handler 실행 → True, 없으면 False (호출측에서 404)"""
+        h = self.resolve(req.method, req.route)
+        if not h: return False
+        await h(req); return True
+    def snapshot(self):
+        """라우트별 지연 요약 (ms)"""
+        return {k: http_latency.snapshot(k) for k in sorted(self.labels) if (k,) in http_latency.series}
+
+# ══ 응답 캐시 미들웨어 ══
+class _CaptureWriter:
+    """핸들러 출력을 버퍼에 모으는 writer 대역 (drain/close는 no-op)"""
+    __slots__ = ('_w', 'buf')
+    def __init__(self, w): self._w = w; self.buf = bytearray()
+    def write(self, data): self.buf += data
+    async def drain(self): pass
+    def close(self): pass
+    async def wait_closed(self): pass
+    def get_extra_info(self, *a, **kw): return self._w.get_extra_info(*a, **kw)
+
+route_cache_stats = {'hits': 0, 'misses': 0}
+
+def cached(ttl, key=None, max_entries=256):
+    """200 응답 바이트를 ttl초 캐시. 기본 키: (route, lang, 정렬된 쿼리스트링)"""
+    store = {}
+    def mw(h):
+        async def run(req):
+            k = key(req) if key else (req.route, req.lang, tuple(sorted((a, tuple(b)) for a, b in req.qs.items())))
+            now = time.time(); hit = store.get(k)
+            if hit and now - hit[0] < ttl:
+                route_cache_stats['hits'] += 1; response_status.set(200)
+                req.writer.write(hit[1]); await req.writer.drain(); return
+            route_cache_stats['misses'] += 1
+            real = req.writer; cap = req.writer = _CaptureWriter(real)
+            try: await h(req)
+            finally: req.writer = real
+            data = bytes(cap.buf)
+            if data.startswith(b'HTTP/1.1 200'):
+                if len(store) >= max_entries:
+                    for kk in [kk for kk, v in store.items() if now - v[0] >= ttl] or list(store)[:max_entries // 4]: store.pop(kk, None)
+                store[k] = (now, data)
+            real.write(data); await real.drain()
+        return run
+    return mw
@@ -0,0 +1,70 @@
+"""머슴포커 — 테이블 좌석 (__slots__ 고정 필드 — 좌석당 dict 대신 슬롯, 핫 루프는 속성 접근 s.chips/s.folded)
+JSON·저널·휴면·ranked 계층은 기존처럼 s['chips'], s.get('_auth_id'), {**s}로 씀 (dict 호환 뷰).
+값이 없는 슬롯 = 없는 키 (pop으로 지운 필드는 get 기본값, 'in'은 False)"""
+from collections.abc import MutableMapping
+
+class Seat(MutableMapping):
+    __slots__ = (
+        'name', 'emoji', 'style',                      # str
+        'chips', 'bet', 'rebuys',                      # int
+        'hole',                                        # list[str] — 카드 2장 (핸드 밖이면 [])
+        'folded', 'out', 'is_bot', '_cashed_out',      # bool
+        'bot_ai',                                      # BotAI | None (NPC만)
+        'meta',                                        # dict — version/strategy/repo/bio/...quote
+        'last_note', 'last_reasoning', 'last_mood', '_reasoning_en',  # str — 관전 UI 말풍선
+        'last_action',                                 # str | None
+        'latency_ms',                                  # int | None (-1 = 타임아웃)
+        '_total_invested',                             # int — 이번 핸드 총 투입 (사이드팟 단계)
+        '_turn_start',                                 # float — 턴 시작 시각 (latency 측정, 0 = 내 턴 아님)
+        '_auth_id',                                    # str | None — ranked 머슴 계정
+    )
+
+    def __init__(self, name, emoji='🤖', chips=0, is_bot=False, bot_ai=None, style='player', meta=None):
+        self.name = name; self.emoji = emoji; self.chips = chips; self.style = style
+        self.hole = []; self.folded = False; self.bet = 0; self.out = False
+        self.is_bot = is_bot; self.bot_ai = bot_ai; self.meta = meta if meta is not None else {}
+        self.last_note = ''; self.last_reasoning = ''; self.last_mood = ''; self._reasoning_en = ''
+        self.last_action = None; self.latency_ms = None; self._total_invested = 0
+        self.rebuys = 0; self._cashed_out = False; self._auth_id = None; self._turn_start = 0
+
+    @classmethod
+    def from_dict(cls, d):
+        """저널/휴면 스냅샷 dict → Seat (모르는 키는 무시 — 예전 스냅샷 호환)"""
+        s = cls(d['name'])
+        for k, v in d.items():
+            if k in _FIELDS: setattr(s, k, v)
+        return s
+
+    # ── dict 호환 뷰 ──
+    def __getitem__(self, k):
+        if k in _FIELDS:
+            try: return getattr(self, k)
+            except AttributeError: pass
+        raise KeyError(k)
+
+    def __setitem__(self, k, v):
+        if k not in _FIELDS: raise KeyError(f'unknown seat field: {k}')
+        setattr(self, k, v)
+
+    def __delitem__(self, k):
+        if k not in self: raise KeyError(k)
+        delattr(self, k)
+
+    def __contains__(self, k):
+        return k in _FIELDS and hasattr(self, k)
+
+    def get(self, k, default=None):
+        return getattr(self, k, default) if k in _FIELDS else default
+
+    def __iter__(self):
+        return (k for k in Seat.__slots__ if hasattr(self, k))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    __eq__ = object.__eq__; __hash__ = object.__hash__  # 좌석 동일성 = 객체 동일성 (Mapping의 내용 비교 X)
+
+    def __repr__(self):
+        return f'Seat({dict(self)!r})'
+
+_FIELDS = frozenset(Seat.__slots__)
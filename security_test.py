@@ -91,7 +91,7 @@ check("AUTH", "ranked join 비밀번호 검증",
     "ranked 입장 시 머슴 계정 검증")
 
 check("AUTH", "ranked auth_id 좌석 매핑",
-    has_pattern(r"joined_seat\['_auth_id'\]\s*=\s*auth_id"),
+    has_pattern(r"joined_seat(\['_auth_id'\]|\._auth_id)\s*=\s*auth_id"),
     "좌석에 auth_id 바인딩")
 
 check("AUTH", "reconnect auth_id 검증 (하이잭 방지)",
@@ -166,8 +166,8 @@ check("INPUT", "액션 타입 화이트리스트",
 print("[3/12] 🏎️ 레이스 컨디션 & 동시성")
 
 check("RACE", "더블 캐시아웃 방지 (chips=0 선처리)",
-    has_pattern(r"seat\['chips'\]\s*=\s*0.*ranked_credit") or
-    has_pattern(r"seat\['chips'\] = 0  # ★"),
+    has_pattern(r"seat(\['chips'\]|\.chips)\s*=\s*0.*ranked_credit") or
+    has_pattern(r"seat(\['chips'\]|\.chips) = 0  # ★"),
     "leave 시 칩 즉시 0 → 환전 (재호출 무효)")
 
 check("RACE", "ranked_ingame 삭제 (크래시 복구 이중 크레딧)",
@@ -497,7 +497,7 @@ scenarios = [
      "빈 ADMIN_KEY → None → 항상 거부"),
     
     ("S09: 더블 캐시아웃",
-     r"seat\['chips'\] = 0",
+     r"seat(\['chips'\]|\.chips) = 0",
      "leave 시 chips=0 선처리 → 재호출 시 0pt 환전"),
     
     ("S10: 크래시 복구 이중 크레딧",
@@ -61,7 +61,7 @@ check("INPUT", "메시지 길이 제한", has(r'sanitize_msg.*120'))
 
 # ═══ 3. 레이스 컨디션 ═══
 print("[3] 🏎️ 레이스 컨디션")
-check("RACE", "더블 캐시아웃 방지 chips=0", has(r"seat\['chips'\] = 0  # ★"))
+check("RACE", "더블 캐시아웃 방지 chips=0", has(r"seat(\['chips'\]|\.chips) = 0  # ★"))
 check("RACE", "ranked_ingame 삭제 on leave", has(r'DELETE FROM ranked_ingame WHERE table_id=\? AND auth_id=\?'))
 check("RACE", "ranked_lock 뮤텍스", has(r'_ranked_lock = threading\.Lock\(\)'))
 check("RACE", "ranked_credit 락 사용", has(r'with _ranked_lock'))
@@ -150,7 +150,7 @@ attacks = [
     ("토큰 타이밍 공격", has(r'hmac\.compare_digest\(stored_token')),
     ("Admin 브루트포스", has(r'hmac\.compare_digest\(str\(ADMIN_KEY\)')),
     ("Admin 빈값 우회", has(r'or None.*prevents')),
-    ("더블 캐시아웃", has(r"seat\['chips'\] = 0  # ★")),
+    ("더블 캐시아웃", has(r"seat(\['chips'\]|\.chips) = 0  # ★")),
     ("크래시 복구 이중 크레딧", has(r'DELETE FROM ranked_ingame')),
     ("닉네임 하이잭", has(r'AUTH_MISMATCH')),
     ("음수 레이즈 칩 생성", has(r'amt=max\(0')),
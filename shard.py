@@ -0,0 +1,192 @@
+"""머슴포커 — 멀티 프로세스 테이블 샤딩 (SHARD_WORKERS=N: 프론트가 table_id 해시로 워커를 골라 유닉스 소켓으로 원시 바이트 중계)
+워커 0(집계 워커)은 mersoom·ranked 테이블과 table_id 없는 요청(리더보드/로비/에이전트/잔고)을 맡고,
+다른 워커의 게임 목록·에이전트를 주기적으로 끌어와 합침. 리더보드는 공유 SQLite가 단일 원본"""
+import asyncio, json, os, sys, time, zlib
+from urllib.parse import parse_qs, urlparse
+from ranked import is_ranked_table
+
+SHARD_WORKERS = int(os.environ.get('SHARD_WORKERS', 0) or 0)  # 0 = 단일 프로세스 (기존 동작)
+_idx = os.environ.get('SHARD_INDEX', '')
+SHARD_INDEX = int(_idx) if _idx.isdigit() else None           # 워커 프로세스만 설정 (프론트가 주입)
+SHARD_DIR = os.environ.get('SHARD_DIR', '/tmp')
+SHARD_SYNC_SEC = float(os.environ.get('SHARD_SYNC_SEC', 2))   # 집계 워커 동기화 주기
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 1) or 0)       # 앞단 신뢰 프록시 수 — X-Forwarded-For 뒤에서 이 번째가 클라이언트 (0=XFF 무시, 접속 IP 사용)
+PEER_HEADER = 'X-Shard-Peer'  # 프론트가 실제 접속 IP를 항상 덮어써 넘기는 헤더 (워커는 유닉스 소켓이라 peername 없음)
+AGGREGATOR = 0
+MAX_HEAD = 16 * 1024; MAX_BODY = 64 * 1024
+INTERNAL_PREFIX = '/api/_shard/'  # 워커 간 내부 엔드포인트 — 프론트가 외부 요청을 차단
+
+stats = {'conns': {}, 'rejected': 0, 'errors': 0, 'restarts': 0, 'pulls': 0, 'pull_errors': 0}
+peers = {}  # 집계 워커: 워커 번호 → 마지막 스냅샷 (+ '_ts')
+
+def mode():
+    if SHARD_INDEX is not None: return 'worker'
+    return 'front' if SHARD_WORKERS > 0 else 'single'
+
+def sock_path(i, port=None):
+    return os.path.join(SHARD_DIR, f"poker-shard-{port or os.environ.get('PORT', 8080)}-{i}.sock")
+
+def owner(tid, n=None):
+    """table_id → 워커 번호. mersoom·ranked·미지정은 집계 워커 고정 (랭크 잔고/중복 착석 검사를 한 프로세스에 유지)"""
+    n = SHARD_WORKERS if n is None else n
+    if n <= 1 or not tid or tid == 'mersoom' or is_ranked_table(tid): return AGGREGATOR
+    return zlib.crc32(tid.encode()) % n
+
+def owns(tid):
+    return SHARD_INDEX is None or owner(tid) == SHARD_INDEX
+
+def is_aggregator():
+    return SHARD_INDEX in (None, AGGREGATOR)
+
+def local_id(base):
+    """이 프로세스가 소유하는 자동 생성 table_id (base 그대로 → base-1, base-2 …)"""
+    tid = base; k = 0
+    while not owns(tid): k += 1; tid = f"{base}-{k}"
+    return tid
+
+def internal(writer):
+    """내부 엔드포인트 호출 허용 여부 — 워커의 유닉스 소켓으로 들어온 연결만 (peername 없음)"""
+    return SHARD_INDEX is not None and not writer.get_extra_info('peername')
+
+def table_id_of(path, body=b''):
+    """쿼리 table_id → JSON 바디 table_id → '' (집계 워커)"""
+    tid = parse_qs(urlparse(path).query).get('table_id', [''])[0]
+    if not tid and body[:1] == b'{' and b'table_id' in body:
+        try:
+            d = json.loads(body); tid = d.get('table_id', '') if isinstance(d, dict) else ''
+        except ValueError: pass
+    return tid if isinstance(tid, str) else ''
+
+def client_ip(writer, headers):
+    """요청의 클라이언트 IP — 접속 IP(워커면 프론트가 넣은 X-Shard-Peer)에서 시작해 신뢰 프록시 PROXY_HOPS개만큼 XFF를 거슬러 올라감"""
+    if SHARD_INDEX is not None: peer = headers.get(PEER_HEADER.lower(), '')
+    else: p = writer.get_extra_info('peername'); peer = p[0] if p else ''
+    if PROXY_HOPS <= 0: return peer
+    chain = [x.strip() for x in headers.get('x-forwarded-for', '').split(',') if x.strip()]
+    if len(chain) >= PROXY_HOPS: return chain[-PROXY_HOPS]  # Render 프록시: 마지막 항목이 실제 클라이언트 (앞쪽은 위조 가능)
+    return headers.get('x-real-ip', '') or peer
+
+# ══ 워커 ══
+async def listen(handler, port):
+    """워커면 SHARD_SOCKET 유닉스 소켓, 아니면 TCP 포트"""
+    if SHARD_INDEX is None: return await asyncio.start_server(handler, '0.0.0.0', port)
+    path = os.environ.get('SHARD_SOCKET') or sock_path(SHARD_INDEX)
+    if os.path.exists(path): os.unlink(path)
+    return await asyncio.start_unix_server(handler, path)
+
+async def watch_parent(interval=2):
+    """프론트가 죽으면 (부모 pid 변경) 워커도 종료 — 고아 워커가 소켓을 붙잡지 않게"""
+    ppid = os.getppid()
+    while True:
+        await asyncio.sleep(interval)
+        if os.getppid() != ppid: print(f"⚠️ [SHARD] 워커 {SHARD_INDEX}: 프론트 종료 감지 — 종료", flush=True); os._exit(0)
+
+async def fetch(i, path, timeout=3):
+    """워커 i의 내부 엔드포인트 GET → JSON (유닉스 소켓 직접, Connection: close 응답을 끝까지 읽음)"""
+    r, w = await asyncio.wait_for(asyncio.open_unix_connection(sock_path(i)), timeout)
+    try:
+        w.write(f"GET {path} HTTP/1.1\r\nHost: shard\r\nConnection: close\r\n\r\n".encode()); await w.drain()
+        data = await asyncio.wait_for(r.read(), timeout)
+    finally: w.close()
+    head, _, body = data.partition(b'\r\n\r\n')
+    if not head.startswith(b'HTTP/1.1 200'): raise ValueError(head[:40])
+    return json.loads(body)
+
+async def pull(path):
+    """집계 워커: 다른 모든 워커에서 path 스냅샷 수집 → peers 갱신 (실패한 워커는 이전 값 유지)"""
+    others = [i for i in range(SHARD_WORKERS) if i != SHARD_INDEX]
+    res = await asyncio.gather(*(fetch(i, path) for i in others), return_exceptions=True)
+    for i, r in zip(others, res):
+        if isinstance(r, Exception): stats['pull_errors'] += 1; continue
+        r['_ts'] = time.time(); peers[i] = r; stats['pulls'] += 1
+    return {i: peers[i] for i in others if i in peers}
+
+# ══ 프론트 ══
+async def _pipe(r, w):
+    try:
+        while (buf := await r.read(65536)):
+            w.write(buf); await w.drain()
+    except (ConnectionError, OSError): pass
+
+def _close(w):
+    try: w.close()
+    except Exception: pass
+
+async def _reply(writer, status, msg):
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(msg)}\r\nConnection: close\r\n\r\n{msg}".encode())
+    try: await writer.drain()
+    except (ConnectionError, OSError): pass
+    _close(writer)
+
+async def route(reader, writer):
+    """요청 헤더(+JSON 바디)만 읽어 소유 워커를 고르고, 읽은 바이트를 그대로 보낸 뒤 양방향 중계 (HTTP·WS 공통)"""
+    try: head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError): _close(writer); return
+    lines = head.decode('latin-1').split('\r\n'); parts = lines[0].split()
+    if len(parts) < 2 or len(head) > MAX_HEAD: _close(writer); return
+    path = parts[1]
+    if urlparse(path).path.startswith(INTERNAL_PREFIX): stats['rejected'] += 1; await _reply(writer, '404 Not Found', '404 Not Found'); return
+    hdr = {k.strip().lower(): v.strip() for k, _, v in (l.partition(':') for l in lines[1:] if ':' in l)}
+    body = b''
+    try: cl = int(hdr.get('content-length', 0) or 0)
+    except ValueError: cl = 0
+    if 0 < cl <= MAX_BODY and 'upgrade' not in hdr:  # 초과분은 워커가 413 처리 — 바디 없이 집계 워커로
+        try: body = await asyncio.wait_for(reader.readexactly(cl), 10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError): _close(writer); return
+    i = owner(table_id_of(path, body))
+    # 접속 IP는 전용 헤더로만 전달 (클라이언트가 보낸 같은 이름 헤더는 제거) — X-Forwarded-For 체인은 그대로 통과
+    peer = writer.get_extra_info('peername'); ph = PEER_HEADER.lower() + ':'
+    head = '\r\n'.join(l for l in lines if not l.lower().startswith(ph)).encode('latin-1')
+    head = head[:-2] + f"{PEER_HEADER}: {peer[0] if peer else ''}\r\n\r\n".encode('latin-1')
+    try: r2, w2 = await asyncio.open_unix_connection(sock_path(i))
+    except OSError:
+        stats['errors'] += 1; await _reply(writer, '503 Service Unavailable', f'shard {i} unavailable'); return
+    stats['conns'][i] = stats['conns'].get(i, 0) + 1
+    w2.write(head + body)
+    up = asyncio.create_task(_pipe(reader, w2)); down = asyncio.create_task(_pipe(r2, writer))
+    await asyncio.wait((up, down), return_when=asyncio.FIRST_COMPLETED)
+    for t in (up, down): t.cancel()
+    _close(w2); _close(writer)
+
+async def _supervise(i, script, port):
+    """워커 i 실행 + 비정상 종료 시 1초 뒤 재시작"""
+    env = {**os.environ, 'SHARD_INDEX': str(i), 'SHARD_SOCKET': sock_path(i, port), 'PORT': str(port)}
+    while True:
+        p = await asyncio.create_subprocess_exec(sys.executable, script, env=env)
+        try: rc = await p.wait()
+        except asyncio.CancelledError:
+            if p.returncode is None: p.terminate(); await p.wait()
+            raise
+        stats['restarts'] += 1
+        print(f"⚠️ [SHARD] 워커 {i} 종료 (rc={rc}) — 재시작", flush=True)
+        await asyncio.sleep(1)
+
+async def run_front(port, script):
+    """프론트 프로세스: 워커 N개 기동 후 TCP 포트에서 라우팅만 수행 (게임/DB 없음)"""
+    import signal
+    sups = [asyncio.create_task(_supervise(i, script, port)) for i in range(SHARD_WORKERS)]
+    loop = asyncio.get_running_loop(); me = asyncio.current_task()
+    for sig in (signal.SIGTERM, signal.SIGINT): loop.add_signal_handler(sig, me.cancel)
+    server = await asyncio.start_server(route, '0.0.0.0', port)
+    print(f"🔀 샤드 프론트 — 워커 {SHARD_WORKERS}개 (유닉스 소켓 {sock_path('N', port)})", flush=True)
+    print(f"🌐 http://0.0.0.0:{port}", flush=True)
+    try:
+        async with server:
+            while True:
+                await asyncio.sleep(60)
+                print(f"📊 SHARD | conns {dict(sorted(stats['conns'].items()))} | 503 {stats['errors']} | restarts {stats['restarts']}", flush=True)
+    except asyncio.CancelledError: pass
+    finally:
+        for s in sups: s.cancel()
+        await asyncio.gather(*sups, return_exceptions=True)
+        for i in range(SHARD_WORKERS):
+            try: os.unlink(sock_path(i, port))
+            except OSError: pass
+
+def snapshot():
+    out = {'mode': mode(), 'workers': SHARD_WORKERS, 'index': SHARD_INDEX}
+    if SHARD_INDEX == AGGREGATOR:
+        now = time.time()
+        out['peers'] = {i: {'tables': p.get('tables', 0), 'age_sec': round(now - p['_ts'], 1)} for i, p in peers.items()}
+        out['pulls'] = stats['pulls']; out['pull_errors'] = stats['pull_errors']
+    return out
@@ -1,26 +1,16 @@
 """머슴포커 — 관전자 베팅 시스템"""
-import time
+from ttlcache import TTLCache
 
 SPECTATOR_START_COINS = 1000
 spectator_bets = {}   # table_id -> {hand_num -> {spectator_name -> {'pick','amount'}}}
-spectator_coins = {}  # spectator_name -> coins
-_spectator_last_seen = {}  # name -> timestamp
+# spectator_name -> coins (24h 비활성 만료, 5000명 초과 시 가장 오래 안 온 관전자부터 축출)
+spectator_coins = TTLCache('spectator_coins', ttl=86400, maxlen=5000)
 
 def get_spectator_coins(name):
     if name not in spectator_coins:
-        if len(spectator_coins) > 5000:
-            now = time.time()
-            inactive = [k for k, ts in _spectator_last_seen.items() if now - ts > 86400]
-            for k in inactive:
-                spectator_coins.pop(k, None)
-                _spectator_last_seen.pop(k, None)
-            if len(spectator_coins) > 5000:
-                oldest = sorted(spectator_coins.keys(), key=lambda k: spectator_coins.get(k,0))[:2500]
-                for k in oldest:
-                    del spectator_coins[k]
-                    _spectator_last_seen.pop(k, None)
+        spectator_coins.expire()
         spectator_coins[name]=SPECTATOR_START_COINS
-    _spectator_last_seen[name] = time.time()
+    else: spectator_coins.touch(name)
     return spectator_coins[name]
 
 def place_spectator_bet(table_id, hand_num, spectator, pick, amount):
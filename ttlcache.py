@@ -0,0 +1,91 @@
+"""머슴포커 — TTL+LRU 레지스트리 (OrderedDict 기반: O(1) touch, 앞에서부터 만료/축출, 레지스트리별 게이지)"""
+import sys, time
+from collections import OrderedDict
+from metrics import Gauge
+
+_caches = {}  # 이름 → TTLCache (게이지 수집용)
+
+class TTLCache(OrderedDict):
+    """가장 오래 안 쓴 항목이 앞에 오는 dict. 대입/touch()가 항목을 뒤로 옮기고 시각을 기록.
+    ttl 지난 항목과 maxlen 초과분은 앞에서부터 pop — 항목당 한 번만 지워지므로 분할 상환 O(1).
+    조회(get/[]/in)는 순서를 바꾸지 않음 (통계·스냅샷 읽기가 LRU를 흐트러뜨리지 않게)"""
+    def __init__(self, name, ttl=None, maxlen=None, clock=time.time):
+        super().__init__()
+        self.name = name; self.ttl = ttl; self.maxlen = maxlen; self.clock = clock
+        self._ts = {}; self.evicted = 0; self.expired = 0
+        _caches[name] = self
+
+    def __setitem__(self, k, v):
+        if k in self: self.move_to_end(k)
+        super().__setitem__(k, v); self._ts[k] = self.clock()
+        if self.maxlen and len(self) > self.maxlen: self._trim()
+
+    def __delitem__(self, k):
+        super().__delitem__(k); self._ts.pop(k, None)
+
+    def pop(self, k, *default):
+        self._ts.pop(k, None)
+        return super().pop(k, *default)
+
+    def clear(self):
+        super().clear(); self._ts.clear()
+
+    # OrderedDict 기본 구현은 self[k] 대입으로 동작해 순서/시각을 건드리므로 dict 의미로 고정
+    def setdefault(self, k, default=None):
+        if k not in self: self[k] = default
+        return dict.__getitem__(self, k)
+
+    def touch(self, k):
+        """사용 표시 (뒤로 이동 + 시각 갱신) — 없으면 False"""
+        if k not in self: return False
+        self.move_to_end(k); self._ts[k] = self.clock()
+        return True
+
+    def last_touch(self, k):
+        return self._ts.get(k)
+
+    def _trim(self):
+        while len(self) > self.maxlen:
+            k, _ = self.popitem(last=False); self._ts.pop(k, None); self.evicted += 1
+
+    def expire(self, now=None):
+        """ttl 지난 항목 제거 → 제거 수"""
+        if not self.ttl: return 0
+        cutoff = (now or self.clock()) - self.ttl; n = 0
+        while self:
+            k = next(iter(self))
+            if self._ts.get(k, 0) >= cutoff: break
+            self.popitem(last=False); self._ts.pop(k, None); n += 1
+        self.expired += n
+        return n
+
+    def recent(self, window, now=None):
+        """window초 안에 touch된 항목 (최근 순) — 뒤에서부터 범위 밖이 나오면 중단"""
+        cutoff = (now or self.clock()) - window
+        ts = self._ts
+        for k, v in reversed(self.items()):
+            if ts.get(k, 0) < cutoff: break
+            yield k, v
+
+    def approx_bytes(self, sample=32):
+        """얕은 크기 + 값 표본 평균 × 개수 (스크레이프용 추정치)"""
+        base = sys.getsizeof(self) + sys.getsizeof(self._ts)
+        if not self: return base
+        vals = []
+        for i, (k, v) in enumerate(self.items()):
+            if i >= sample: break
+            vals.append(sys.getsizeof(k) + _sizeof(v))
+        return base + int(sum(vals) / len(vals) * len(self))
+
+def _sizeof(v, depth=2):
+    n = sys.getsizeof(v)
+    if depth <= 0: return n
+    if isinstance(v, dict): n += sum(sys.getsizeof(k) + _sizeof(x, depth - 1) for k, x in v.items())
+    elif isinstance(v, (list, tuple, set)): n += sum(_sizeof(x, depth - 1) for x in v)
+    return n
+
+def stats():
+    return {n: {'entries': len(c), 'evicted': c.evicted, 'expired': c.expired} for n, c in _caches.items()}
+
+Gauge('poker_registry_entries', '인메모리 레지스트리 항목 수', ('registry',), fn=lambda: {(n,): len(c) for n, c in _caches.items()})
+Gauge('poker_registry_bytes', '인메모리 레지스트리 메모리 추정치', ('registry',), fn=lambda: {(n,): c.approx_bytes() for n, c in _caches.items()})
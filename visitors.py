@@ -1,9 +1,12 @@
 """머슴포커 — 스텔스 방문자 추적 시스템"""
 import time
+from collections import deque
+from itertools import islice
+from ttlcache import TTLCache
 
 VISITOR_MAX = 200
-_visitor_log = []
-_visitor_map = {}
+_visitor_log = deque(maxlen=VISITOR_MAX)
+_visitor_map = TTLCache('visitors', maxlen=5000)  # 마스킹 IP → 방문 정보 (최근 방문 순, 초과 시 오래된 쪽부터 축출)
 
 def _mask_ip(ip):
     """IP 마스킹: 마지막 옥텟 제거"""
@@ -19,26 +22,21 @@ def _track_visitor(ip, ua, route, referer=''):
     now = time.time()
     if masked_ip in _visitor_map:
         v = _visitor_map[masked_ip]
-        v['last_seen'] = now
+        v['last_seen'] = now; _visitor_map.touch(masked_ip)
         v['hits'] += 1
         v['ua'] = ua
         if route not in v['routes']: v['routes'].append(route)
         if referer and not v.get('referer'): v['referer'] = referer
     else:
         _visitor_map[masked_ip] = {'ua': ua, 'routes': [route], 'first_seen': now, 'last_seen': now, 'hits': 1, 'referer': referer}
-    if len(_visitor_map) > 5000:
-        oldest = sorted(_visitor_map.keys(), key=lambda k: _visitor_map[k]['last_seen'])[:2500]
-        for k in oldest: del _visitor_map[k]
     _visitor_log.append({'ip': masked_ip, 'ua': ua[:100], 'route': route, 'ts': now, 'referer': referer[:200] if referer else ''})
-    if len(_visitor_log) > VISITOR_MAX: _visitor_log.pop(0)
 
 def _get_visitor_stats():
     now = time.time()
-    active = {ip: v for ip, v in _visitor_map.items() if now - v['last_seen'] < 3600}
-    daily = {ip: v for ip, v in _visitor_map.items() if now - v['last_seen'] < 86400}
+    recent = list(_visitor_map.recent(86400, now))  # 최근 방문 순 — 정렬 불필요
     return {
-        'active_1h': len(active),
-        'active_24h': len(daily),
+        'active_1h': sum(1 for _, v in recent if now - v['last_seen'] < 3600),
+        'active_24h': len(recent),
         'total_unique': len(_visitor_map),
         'visitors': [
             {
@@ -50,7 +48,7 @@ def _get_visitor_stats():
                 'ago_min': round((now - v['last_seen']) / 60, 1),
                 'referer': v.get('referer', '')
             }
-            for ip, v in sorted(_visitor_map.items(), key=lambda x: x[1]['last_seen'], reverse=True)
+            for ip, v in reversed(_visitor_map.items())
         ],
-        'recent_log': _visitor_log[-30:]
+        'recent_log': list(islice(_visitor_log, max(0, len(_visitor_log) - 30), None))
     }